@@ -15,13 +15,15 @@
 class Api:
     """
     API interface
+    Slots are used to keep many APIs small.
     """
+    __slots__ = ('api_json', 'folder_name', 'assertions')
     version = 0
-    api_json = None
-    folder_name = None
-    def __init__(self, api_json, folder_name):
+    def __init__(self, api_json, folder_name, assertions=None):
         self.api_json = api_json
         self.folder_name = folder_name
+        # Assertion spec parsed from the test script when the catalog is built.
+        self.assertions = assertions
             
     def get_name(self):
         """
@@ -58,12 +60,25 @@ class Api:
         Gets folder name.
         """
         return self.folder_name
+
+    def get_test_script(self):
+        """
+        Gets the Postman test script.
+        """
+        return ''
+
+    def get_assertions(self):
+        """
+        Gets the assertion spec converted from the test script, or None.
+        """
+        return self.assertions
     
 
 class ApiV1(Api):
     """
     Postman API version 1
     """
+    __slots__ = ()
     def __init__(self, api_json, folder_name):
         Api.__init__(self, api_json, folder_name)
 
@@ -78,11 +93,15 @@ class ApiV1(Api):
             
     def get_request_body_sample(self):
         return self.api_json['rawModeData']
+
+    def get_test_script(self):
+        return self.api_json.get('tests') or ''
     
 class ApiV2(Api):
     """
     Postman API version 2 or 2.1
     """
+    __slots__ = ()
     def __init__(self, api_json, folder_name):
         Api.__init__(self, api_json, folder_name)
 
@@ -104,4 +123,43 @@ class ApiV2(Api):
         return headers
             
     def get_request_body_sample(self):
-        return self.api_json['request']['body']['raw']
\ No newline at end of file
+        if 'body' in self.api_json['request']:
+            return self.api_json['request']['body'].get('raw', '')
+        return ''
+
+    def get_test_script(self):
+        lines = []
+        for event in self.api_json.get('event', []):
+            if event.get('listen') == 'test':
+                lines.extend(event.get('script', {}).get('exec', []))
+        return '\n'.join(lines)
+
+
+class ApiRecord(Api):
+    """
+    API loaded from the compiled catalog.
+    The record is (name, folder name, method, URI, headers, body sample, assertions).
+    """
+    __slots__ = ('name', 'method', 'uri', 'headers', 'body')
+    def __init__(self, record):
+        Api.__init__(self, None, record[1], record[6])
+        self.name = record[0]
+        self.method = record[2]
+        self.uri = record[3]
+        self.headers = record[4]
+        self.body = record[5]
+
+    def get_name(self):
+        return self.name
+
+    def get_method(self):
+        return self.method
+
+    def get_uri(self):
+        return self.uri
+
+    def get_headers(self):
+        return dict(self.headers)
+
+    def get_request_body_sample(self):
+        return self.body
@@ -0,0 +1,179 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+from catalog import get_catalog_key, load_file, save_file
+
+# Increase it when the index layout is changed.
+ARCHIVE_INDEX_VERSION = 1
+ARCHIVE_INDEX_SUFFIX = '.index'
+
+# A record is the meta length, the body length, the meta JSON and the body.
+RECORD_HEADER = struct.Struct('>II')
+
+# Headers which are not kept, because the body is kept decoded and whole.
+SKIPPED_HEADERS = ('content-length', 'transfer-encoding', 'content-encoding', 'connection',
+                   'keep-alive')
+
+# Appending records by threads of this process.
+append_lock = threading.Lock()
+
+
+def get_template_path(uri, end_point_var, path_vars=None):
+    """
+    Gets the path template of the API URI without the end point and the query.
+    Variables of path_vars, a dictionary or JSON text, are replaced first.
+    They can have the host.
+    """
+    uri = uri.replace(end_point_var, '')
+    if path_vars:
+        if isinstance(path_vars, str):
+            path_vars = json.loads(path_vars)
+        for key, value in path_vars.items():
+            uri = uri.replace(key, value)
+    if '://' in uri:
+        parts = urlsplit(uri)
+        uri = parts.path
+    uri = uri.split('?')[0]
+    if not uri.startswith('/'):
+        uri = '/' + uri
+    return uri
+
+
+def get_route(method, template_path):
+    """
+    Gets the route key of the API.
+    """
+    return '%s %s' % (method, template_path)
+
+
+def get_target(uri):
+    """
+    Gets the path with the query of the URI.
+    """
+    parts = urlsplit(uri)
+    if parts.query:
+        return '%s?%s' % (parts.path or '/', parts.query)
+    return parts.path or '/'
+
+
+def get_kept_headers(headers):
+    """
+    Gets headers to keep with the decoded body as a list of [name, value].
+    """
+    return [[key, value] for key, value in headers.items()
+            if key.lower() not in SKIPPED_HEADERS]
+
+
+def append_record(path, method, uri, route, status, headers, body):
+    """
+    Appends a request and response pair to the archive.
+    uri is the path with the query, and route is the API of the request, 'METHOD template'.
+    A record is written at once, so records of processes are not mixed.
+    """
+    meta = json.dumps({'method': method, 'uri': uri, 'route': route, 'status': status,
+                       'headers': get_kept_headers(headers), 'time': time.time()},
+                      separators=(',', ':')).encode('utf-8')
+    body = body or b''
+    with append_lock:
+        with open(path, 'ab') as handle:
+            handle.write(RECORD_HEADER.pack(len(meta), len(body)) + meta + body)
+
+
+def read_meta(handle):
+    """
+    Reads the meta of the next record and skips its body.
+    Returns None at the end. The body of the last record can be partially written,
+    so the position after it is checked by the caller.
+    """
+    header = handle.read(RECORD_HEADER.size)
+    if len(header) < RECORD_HEADER.size:
+        return None
+    meta_size, body_size = RECORD_HEADER.unpack(header)
+    data = handle.read(meta_size)
+    if len(data) < meta_size:
+        return None
+    handle.seek(body_size, 1)
+    return json.loads(data.decode('utf-8'))
+
+
+def build_index(path):
+    """
+    Builds the index of the latest record offsets.
+    {'uris': {'METHOD uri': offset}, 'routes': {'METHOD template': offset}}
+    """
+    index = {'uris': {}, 'routes': {}}
+    with open(path, 'rb') as handle:
+        end = handle.seek(0, 2)
+        handle.seek(0)
+        while True:
+            offset = handle.tell()
+            meta = read_meta(handle)
+            if meta is None or handle.tell() > end:
+                break
+            index['uris']['%s %s' % (meta['method'], meta['uri'])] = offset
+            if meta.get('route'):
+                index['routes'][meta['route']] = offset
+    return index
+
+
+def load_index(path):
+    """
+    Loads the index of the archive.
+    The index is cached next to the archive and built again when the archive is changed.
+    """
+    key = (ARCHIVE_INDEX_VERSION,) + get_catalog_key(path)
+    cache_path = path + ARCHIVE_INDEX_SUFFIX
+    index = load_file(cache_path, key)
+    if index is None:
+        index = build_index(path)
+        save_file(cache_path, key, index)
+    return index
+
+
+def read_record(handle, offset):
+    """
+    Reads the meta and the body of the record at the offset.
+    """
+    handle.seek(offset)
+    meta_size, body_size = RECORD_HEADER.unpack(handle.read(RECORD_HEADER.size))
+    meta = json.loads(handle.read(meta_size).decode('utf-8'))
+    return meta, handle.read(body_size)
+
+
+def load_latest_records(path):
+    """
+    Loads the latest records of each request URI and of each API.
+    Returns ({'METHOD uri': (meta, body)}, {'METHOD template': (meta, body)}).
+    Older records of the same request are not read.
+    """
+    index = load_index(path)
+    records = {}
+    uris = {}
+    routes = {}
+    with open(path, 'rb') as handle:
+        for key, offset in index['uris'].items():
+            if offset not in records:
+                records[offset] = read_record(handle, offset)
+            uris[key] = records[offset]
+        for key, offset in index['routes'].items():
+            if offset not in records:
+                records[offset] = read_record(handle, offset)
+            routes[key] = records[offset]
+    return uris, routes
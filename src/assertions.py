@@ -0,0 +1,498 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import re
+
+from catalog import get_catalog_key, load_file, save_file
+
+# Increase it when the parsed layout of assertion files or their checks are changed.
+ASSERTIONS_VERSION = 2
+ASSERTIONS_CACHE_SUFFIX = '.cache'
+# Key of the assertions of all APIs without their own.
+DEFAULT_KEY = '*'
+SPEC_KEYS = ('status', 'headers', 'json', 'schema')
+# Expected status codes if the status isn't asserted.
+DEFAULT_STATUS = frozenset(range(100, 400))
+
+# A value not found in the response.
+MISSING = object()
+
+JSON_PATH_PATTERN = re.compile(r'\.?([^.\[\]]+)|\[(\d+)\]')
+
+# Assertions of Postman test scripts. Other statements are ignored.
+POSTMAN_STATUS_PATTERNS = (
+    re.compile(r'pm\.response\.to\.have\.status\(\s*(\d{3})\s*\)'),
+    re.compile(r'pm\.expect\(\s*pm\.response\.code\s*\)\.to\.(?:be\.)?(?:eql|equal)\(\s*(\d{3})\s*\)'),
+    re.compile(r'responseCode\.code\s*===?\s*(\d{3})'))
+POSTMAN_STATUS_LIST_PATTERN = re.compile(
+    r'pm\.expect\(\s*pm\.response\.code\s*\)\.to\.be\.oneOf\(\s*\[([\d,\s]+)\]\s*\)')
+POSTMAN_SUCCESS_PATTERN = re.compile(r'pm\.response\.to\.be\.(?:ok|success)\b')
+POSTMAN_HEADER_PATTERN = re.compile(
+    r'pm\.response\.to\.have\.header\(\s*([\'"])(.+?)\1\s*(?:,\s*([\'"])(.*?)\3\s*)?\)')
+POSTMAN_JSON_VAR_PATTERN = re.compile(r'(?:var|let|const)\s+(\w+)\s*=\s*pm\.response\.json\(\)')
+POSTMAN_EXPECT_PATTERN = re.compile(
+    r'pm\.expect\(\s*(pm\.response\.json\(\)|\w+)((?:\.\w+|\[\d+\])+)\s*\)'
+    r'\.to\.(?:be\.)?(?:deep\.)?(?:eql|equal)\(\s*(.+?)\s*\)\s*;?\s*$')
+
+
+def parse_postman_value(text):
+    """
+    Parses a JavaScript literal of a Postman test. Returns MISSING if it is not a literal.
+    """
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return text[1:-1]
+    try:
+        return json.loads(text)
+    except ValueError:
+        return MISSING
+
+
+def parse_postman_tests(script):
+    """
+    Converts common assertions of a Postman test script to an assertion spec.
+    Returns None if the script has no assertion which can be checked.
+    """
+    if not script:
+        return None
+
+    spec = {}
+    json_vars = set(POSTMAN_JSON_VAR_PATTERN.findall(script))
+    for line in script.splitlines():
+        line = line.strip()
+        for pattern in POSTMAN_STATUS_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                spec.setdefault('status', int(match.group(1)))
+        match = POSTMAN_STATUS_LIST_PATTERN.search(line)
+        if match:
+            spec.setdefault('status', [int(code) for code in match.group(1).split(',')
+                                       if code.strip()])
+        if POSTMAN_SUCCESS_PATTERN.search(line):
+            spec.setdefault('status', '2xx')
+
+        for match in POSTMAN_HEADER_PATTERN.finditer(line):
+            if match.group(3) is None:
+                spec.setdefault('headers', {})[match.group(2)] = {'exists': True}
+            else:
+                spec.setdefault('headers', {})[match.group(2)] = match.group(4)
+
+        match = POSTMAN_EXPECT_PATTERN.search(line)
+        if match and (match.group(1) in json_vars or match.group(1) == 'pm.response.json()'):
+            value = parse_postman_value(match.group(3))
+            if value is not MISSING:
+                spec.setdefault('json', {})['$' + match.group(2)] = value
+    return spec or None
+
+
+def compile_json_path(path):
+    """
+    Compiles a JSON path, $.a.b[0] or a.b.0, to keys and indexes.
+    """
+    if path.startswith('$'):
+        path = path[1:]
+    keys = []
+    for name, index in JSON_PATH_PATTERN.findall(path):
+        if index:
+            keys.append(int(index))
+        else:
+            keys.append(name)
+    return tuple(keys)
+
+
+def find_json_value(value, keys):
+    """
+    Finds the value of the compiled JSON path. Returns MISSING if it is not found.
+    """
+    for key in keys:
+        if isinstance(value, dict):
+            value = value.get(str(key), MISSING)
+        elif isinstance(value, list):
+            try:
+                value = value[int(key)]
+            except (ValueError, IndexError):
+                return MISSING
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def compile_matcher(expected):
+    """
+    Compiles an expected value to a function returning the failure or None.
+      A value: Equal to it.
+      {"regex": PATTERN}: The pattern is found in the value as text.
+      {"exists": true or false}: The value exists or not.
+    """
+    if isinstance(expected, dict) and 'regex' in expected:
+        pattern = re.compile(expected['regex'])
+        def match(found):
+            if found is MISSING:
+                return "not found"
+            text = found if isinstance(found, str) else json.dumps(found)
+            if pattern.search(text) is None:
+                return "%s doesn't match %s" % (json.dumps(found), expected['regex'])
+            return None
+        return match
+
+    if isinstance(expected, dict) and 'exists' in expected:
+        exists = bool(expected['exists'])
+        def match(found):
+            if (found is not MISSING) != exists:
+                return "expected to %s" % ('exist' if exists else 'be absent')
+            return None
+        return match
+
+    def match(found):
+        if found is MISSING:
+            return "not found"
+        if found != expected:
+            return "expected %s, found %s" % (json.dumps(expected), json.dumps(found))
+        return None
+    return match
+
+
+def compile_status(expected):
+    """
+    Compiles the expected status, a code, a list of codes, or a class like 2xx, to a set of codes.
+    """
+    if isinstance(expected, list):
+        codes = set()
+        for code in expected:
+            codes |= compile_status(code)
+        return frozenset(codes)
+    text = str(expected)
+    if re.match(r'^[1-5]xx$', text, re.IGNORECASE):
+        first = int(text[0]) * 100
+        return frozenset(range(first, first + 100))
+    return frozenset([int(text)])
+
+
+SCHEMA_TYPES = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool)
+                             or isinstance(value, float) and value.is_integer(),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+# Keywords which don't validate.
+SCHEMA_ANNOTATIONS = ('$schema', '$id', 'id', 'title', 'description', 'default', 'examples',
+                      'format', '$comment', 'readOnly', 'writeOnly', 'deprecated')
+
+
+def compile_schema(schema):
+    """
+    Compiles a JSON Schema to a function returning the first failure or None.
+    Supported keywords are type, enum, const, required, properties, additionalProperties,
+    items, minItems, maxItems, minimum, maximum, exclusiveMinimum, exclusiveMaximum,
+    minLength, maxLength, pattern, allOf and anyOf.
+    """
+    if schema is True or schema == {}:
+        return lambda value, path: None
+    if schema is False:
+        return lambda value, path: "%s is not allowed" % (path)
+    if not isinstance(schema, dict):
+        raise ValueError("The JSON Schema must be an object! schema: %s" % (json.dumps(schema)))
+    checks = []
+
+    def add(check):
+        checks.append(check)
+
+    for keyword in schema:
+        if keyword in SCHEMA_ANNOTATIONS:
+            continue
+        value = schema[keyword]
+        if keyword == 'type':
+            names = value if isinstance(value, list) else [value]
+            tests = [SCHEMA_TYPES[name] for name in names]
+            def check(found, path, names=names, tests=tests):
+                if not any(test(found) for test in tests):
+                    return "%s is not %s" % (path, ' or '.join(names))
+            add(check)
+        elif keyword == 'enum':
+            def check(found, path, values=value):
+                if found not in values:
+                    return "%s is not one of %s" % (path, json.dumps(values))
+            add(check)
+        elif keyword == 'const':
+            def check(found, path, expected=value):
+                if found != expected:
+                    return "%s is not %s" % (path, json.dumps(expected))
+            add(check)
+        elif keyword == 'required':
+            def check(found, path, names=value):
+                if isinstance(found, dict):
+                    for name in names:
+                        if name not in found:
+                            return "%s.%s is required" % (path, name)
+            add(check)
+        elif keyword == 'properties':
+            properties = [(name, compile_schema(value[name])) for name in value]
+            def check(found, path, properties=properties):
+                if isinstance(found, dict):
+                    for name, validate in properties:
+                        if name in found:
+                            failure = validate(found[name], path + '.' + name)
+                            if failure:
+                                return failure
+            add(check)
+        elif keyword == 'additionalProperties':
+            known = set(schema.get('properties', {}))
+            validate = compile_schema(value)
+            def check(found, path, known=known, validate=validate):
+                if isinstance(found, dict):
+                    for name in found:
+                        if name not in known:
+                            failure = validate(found[name], path + '.' + name)
+                            if failure:
+                                return failure
+            add(check)
+        elif keyword == 'items':
+            validate = compile_schema(value)
+            def check(found, path, validate=validate):
+                if isinstance(found, list):
+                    for i, item in enumerate(found):
+                        failure = validate(item, '%s[%d]' % (path, i))
+                        if failure:
+                            return failure
+            add(check)
+        elif keyword in ('minItems', 'maxItems', 'minLength', 'maxLength'):
+            kind = list if keyword.endswith('Items') else str
+            least = keyword.startswith('min')
+            def check(found, path, kind=kind, least=least, limit=value, keyword=keyword):
+                if isinstance(found, kind) and (len(found) < limit if least else len(found) > limit):
+                    return "%s fails %s %s" % (path, keyword, limit)
+            add(check)
+        elif keyword in ('minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum'):
+            compare = {'minimum': lambda a, b: a >= b, 'maximum': lambda a, b: a <= b,
+                       'exclusiveMinimum': lambda a, b: a > b,
+                       'exclusiveMaximum': lambda a, b: a < b}[keyword]
+            def check(found, path, compare=compare, limit=value, keyword=keyword):
+                if SCHEMA_TYPES['number'](found) and not compare(found, limit):
+                    return "%s fails %s %s" % (path, keyword, limit)
+            add(check)
+        elif keyword == 'pattern':
+            pattern = re.compile(value)
+            def check(found, path, pattern=pattern):
+                if isinstance(found, str) and pattern.search(found) is None:
+                    return "%s doesn't match %s" % (path, pattern.pattern)
+            add(check)
+        elif keyword in ('allOf', 'anyOf'):
+            validates = [compile_schema(item) for item in value]
+            if keyword == 'allOf':
+                def check(found, path, validates=validates):
+                    for validate in validates:
+                        failure = validate(found, path)
+                        if failure:
+                            return failure
+            else:
+                def check(found, path, validates=validates):
+                    failures = [validate(found, path) for validate in validates]
+                    if all(failures):
+                        return failures[0]
+            add(check)
+        elif keyword == 'definitions' or keyword == '$defs':
+            continue
+        else:
+            raise ValueError("The JSON Schema keyword is not supported! keyword: %s" % (keyword))
+
+    def validate(found, path):
+        for check in checks:
+            failure = check(found, path)
+            if failure:
+                return failure
+        return None
+    return validate
+
+
+class Validator:
+    """
+    Assertions of a API compiled once to check many responses.
+    The spec has status, headers, json (JSON path to expected value) and schema.
+    The status is expected to be below 400 if it isn't asserted.
+    """
+    def __init__(self, spec, base_dir=''):
+        for key in spec:
+            if key not in SPEC_KEYS:
+                raise ValueError("The assertion is not supported! key: %s" % (key))
+        self.status = DEFAULT_STATUS
+        if spec.get('status') is not None:
+            self.status = compile_status(spec['status'])
+        self.header_checks = [(name, name.lower(), compile_matcher(expected))
+                              for name, expected in (spec.get('headers') or {}).items()]
+        self.json_checks = [(path, compile_json_path(path), compile_matcher(expected))
+                            for path, expected in (spec.get('json') or {}).items()]
+        self.schema = None
+        schema = spec.get('schema')
+        if isinstance(schema, str):
+            with open(os.path.join(base_dir, schema)) as handle:
+                schema = json.load(handle)
+        if schema is not None:
+            self.schema = compile_schema(schema)
+
+    def has_body_checks(self):
+        return bool(self.json_checks) or self.schema is not None
+
+    def iter_failures(self, status, headers, get_body=None):
+        """
+        Checks a response and yields (assertion, failure) of failed assertions.
+        get_body() returns the parsed JSON body. If it is None, the body isn't checked.
+        """
+        if status not in self.status:
+            yield 'status', "%s is not expected" % (status)
+        for name, lower_name, match in self.header_checks:
+            failure = match(headers.get(lower_name, MISSING))
+            if failure:
+                yield 'header ' + name, failure
+
+        if get_body is None or not self.has_body_checks():
+            return
+        try:
+            body = get_body()
+        except ValueError:
+            yield 'body', "not JSON"
+            return
+        for path, keys, match in self.json_checks:
+            failure = match(find_json_value(body, keys))
+            if failure:
+                yield 'json ' + path, failure
+        if self.schema is not None:
+            failure = self.schema(body, '$')
+            if failure:
+                yield 'schema', failure
+
+    def check(self, status, headers, get_body=None):
+        """
+        Checks a response and returns failure messages.
+        """
+        return ["%s: %s" % failure for failure in self.iter_failures(status, headers, get_body)]
+
+
+def is_failed(result):
+    """
+    Checks the result of a request failed.
+    If the response was checked by assertions, it failed if any assertion failed.
+    Otherwise it failed if the status is 400 or higher.
+    """
+    if 'error' in result:
+        return True
+    if 'assertions' in result:
+        return len(result['assertions']) > 0
+    return result['status'] >= 400
+
+
+def check_response(validator, response, result):
+    """
+    Checks the response by the validator and sets failures to the assertions of the result.
+    The JSON body parsed to check is kept as the body of the result.
+    """
+    if validator is None or response is None:
+        return
+
+    def get_body():
+        result['body'] = response.json()
+        return result['body']
+    result['assertions'] = validator.check(response.status_code, response.headers, get_body)
+
+
+class AssertionRules:
+    """
+    Assertions of APIs by API ID or name, and '*' for the others.
+    Postman tests are used for APIs without assertions if use_postman_tests is set.
+    Validators are compiled when they are first used.
+    """
+    def __init__(self, specs=None, base_dir='', use_postman_tests=False):
+        self.specs = specs or {}
+        self.base_dir = base_dir
+        self.use_postman_tests = use_postman_tests
+        self.validators = {}
+
+    def get_validator(self, api_id, api):
+        """
+        Gets the compiled validator of the API, or None if it has no assertions.
+        """
+        if api_id in self.validators:
+            return self.validators[api_id]
+
+        spec = self.specs.get(str(api_id))
+        if spec is None:
+            spec = self.specs.get(api.get_name())
+        if spec is None and self.use_postman_tests:
+            spec = api.get_assertions()
+        if spec is None:
+            spec = self.specs.get(DEFAULT_KEY)
+        validator = None
+        if spec is not None:
+            validator = Validator(spec, self.base_dir)
+        self.validators[api_id] = validator
+        return validator
+
+
+def load_rules(path=None, use_postman_tests=False):
+    """
+    Loads the YAML or JSON assertions file.
+    Parsed assertions are cached next to the file to not parse it every time.
+    """
+    if not path:
+        return AssertionRules(None, '', use_postman_tests)
+
+    key = (ASSERTIONS_VERSION,) + get_catalog_key(path)
+    cache_path = path + ASSERTIONS_CACHE_SUFFIX
+    base_dir = os.path.dirname(os.path.abspath(path))
+    specs = load_file(cache_path, key)
+    if specs is None:
+        with open(path) as handle:
+            if path.lower().endswith('.json'):
+                try:
+                    specs = json.load(handle)
+                except ValueError as e:
+                    raise ValueError("The assertions file is not valid JSON! path: %s, %s"
+                                     % (path, e))
+            else:
+                import yaml
+                try:
+                    specs = yaml.load(handle, Loader=yaml.FullLoader)
+                except yaml.YAMLError as e:
+                    raise ValueError("The assertions file is not valid YAML! path: %s, %s"
+                                     % (path, e))
+        specs = check_specs(specs or {}, path, base_dir)
+        save_file(cache_path, key, specs)
+    return AssertionRules(specs, base_dir, use_postman_tests)
+
+
+def check_specs(specs, path, base_dir):
+    """
+    Checks assertions of the file by compiling them, so a bad file fails before requests.
+    Returns specs by API keys as strings. Raises ValueError with the file name.
+    """
+    if not isinstance(specs, dict):
+        raise ValueError("The assertions file is not a mapping of APIs! path: %s" % (path))
+    checked = {}
+    for api_key, spec in specs.items():
+        if not isinstance(spec, dict):
+            raise ValueError("The assertions of %s are not a mapping! path: %s" % (api_key, path))
+        try:
+            Validator(spec, base_dir)
+        except (OSError, ValueError, TypeError, AttributeError, KeyError, re.error) as e:
+            raise ValueError("The assertions of %s are not valid! path: %s, %s"
+                             % (api_key, path, e))
+        checked[str(api_key)] = spec
+    return checked
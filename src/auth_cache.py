@@ -0,0 +1,149 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+from datetime import datetime
+import hashlib
+import json
+import os
+import time
+
+# Tokens expiring within this seconds are not used.
+EXPIRY_MARGIN = 30
+
+
+def get_token_key(end_point, auth_uri, auth_body_file):
+    """
+    Gets the cache key of the token.
+    The body file content is included to not use a token of other user.
+    """
+    digest = hashlib.sha256()
+    for value in (end_point, auth_uri, auth_body_file):
+        digest.update(str(value).encode('utf-8') + b'\0')
+    with open(auth_body_file, 'rb') as handle:
+        digest.update(handle.read())
+    return digest.hexdigest()
+
+
+def get_jwt_expiry(token):
+    """
+    Gets the exp claim of a JWT token, or None if it is not a JWT token.
+    """
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + '=' * (-len(parts[1]) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims['exp'])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def parse_expiry(value):
+    """
+    Parses an expiry header value.
+    Epoch seconds, ISO 8601 and HTTP date are supported.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        pass
+    # email is slow to import and rarely used.
+    from email.utils import parsedate_to_datetime
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def get_expiry(token, ttl, expiry_value=None):
+    """
+    Gets the expiry time of the token.
+    The expiry header value is used first, then JWT exp claim, then the TTL.
+    """
+    expiry = parse_expiry(expiry_value)
+    if expiry is None:
+        expiry = get_jwt_expiry(token)
+    if expiry is None:
+        expiry = time.time() + ttl
+    return expiry
+
+
+def read_tokens(path):
+    """
+    Reads all cached tokens.
+    """
+    try:
+        with open(path, 'r') as handle:
+            tokens = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(tokens, dict):
+        return {}
+    return tokens
+
+
+def write_tokens(path, tokens):
+    """
+    Writes tokens only readable by the owner.
+    """
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(tokens, handle)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_token(path, key):
+    """
+    Loads the token not expired.
+    """
+    entry = read_tokens(path).get(key)
+    if not entry or entry.get('expiry', 0) - EXPIRY_MARGIN <= time.time():
+        return None
+    return entry.get('token')
+
+
+def save_token(path, key, token, expiry):
+    """
+    Saves the token and removes expired tokens.
+    """
+    now = time.time()
+    tokens = {k: v for k, v in read_tokens(path).items()
+              if isinstance(v, dict) and v.get('expiry', 0) > now}
+    tokens[key] = {'token': token, 'expiry': expiry}
+    write_tokens(path, tokens)
+
+
+def remove_token(path, key):
+    """
+    Removes the token.
+    """
+    tokens = read_tokens(path)
+    if key in tokens:
+        del tokens[key]
+        write_tokens(path, tokens)
@@ -0,0 +1,249 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+from stats import get_bucket, histogram_from_dict, Histogram
+
+# Increase it when the baseline file layout is changed.
+BASELINE_VERSION = 1
+DEFAULT_BASELINE_FILE = 'baseline.json'
+# Percent of the p50 or p99 increase which is a regression.
+DEFAULT_THRESHOLD = 20
+# Significance level of the statistical tests.
+SIGNIFICANCE = 0.01
+# Latencies needed in both the baseline and the run to test them.
+MIN_TEST_SAMPLES = 10
+
+
+def get_api_key(collection, folder, name):
+    """
+    Gets the key of a API in baselines. Indexes are not used, because they are changed
+    when APIs are added to the Postman file.
+    """
+    return '%s/%s/%s' % (collection, folder, name)
+
+
+class LatencySamples:
+    """
+    Latency histograms of APIs requested by a run. Requests of the same API are merged.
+    """
+    histograms = None
+    lock = None
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, key, seconds):
+        """
+        Records a latency of the API.
+        """
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.record(seconds)
+
+    def merge(self, key, other):
+        """
+        Adds latencies of a load test of the API.
+        """
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.merge(other)
+
+
+def load_baseline(path):
+    """
+    Loads latency histograms of the baseline file as {API key: Histogram}.
+    Returns an empty dictionary if the file doesn't exist.
+    """
+    try:
+        with open(path, 'r') as handle:
+            data = json.load(handle)
+    except FileNotFoundError:
+        return {}
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError("The baseline file version is not supported! path: %s" % (path))
+    return {key: histogram_from_dict(item['latency']) for key, item in data['apis'].items()}
+
+
+def save_baseline(path, samples):
+    """
+    Saves latencies of the run to the baseline file.
+    APIs not requested by the run keep their baselines. A broken file is kept as .bad,
+    and a new file is started, so latencies of the run are not lost.
+    """
+    try:
+        with open(path, 'r') as handle:
+            data = json.load(handle)
+    except FileNotFoundError:
+        data = None
+    except ValueError as e:
+        sys.stderr.write("The baseline file is broken, so a new file is started! path: %s, %s\n"
+                         % (path, e))
+        os.replace(path, path + '.bad')
+        data = None
+    if not isinstance(data, dict) or data.get('version') != BASELINE_VERSION:
+        data = {'version': BASELINE_VERSION, 'apis': {}}
+
+    saved = round(time.time(), 3)
+    for key, histogram in samples.histograms.items():
+        data['apis'][key] = {'saved': saved, 'latency': histogram.to_dict()}
+
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as handle:
+        json.dump(data, handle, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def mann_whitney_p_value(baseline, current):
+    """
+    Tests whether current latencies are greater than the baseline by the one-sided
+    Mann-Whitney U test with the normal approximation. Latencies of a bucket are ties.
+    Returns the p-value.
+    """
+    n1 = current.count
+    n2 = baseline.count
+    u = 0.0
+    below = 0
+    ties = 0
+    for lower in sorted(set(current.counts) | set(baseline.counts)):
+        a = current.counts.get(lower, 0)
+        b = baseline.counts.get(lower, 0)
+        u += a * (below + b / 2.0)
+        below += b
+        ties += (a + b) ** 3 - (a + b)
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1.0)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def get_binomial_tail(n, k, p):
+    """
+    Gets P(X >= k) of the binomial distribution of n trials with the probability p.
+    """
+    if k <= 0:
+        return 1.0
+    mean = n * p
+    if mean >= 20:
+        z = (k - 0.5 - mean) / math.sqrt(mean * (1 - p))
+        return 0.5 * math.erfc(z / math.sqrt(2))
+    term = (1 - p) ** n
+    total = 0.0
+    for i in range(min(k, n + 1)):
+        total += term
+        term *= (n - i) / (i + 1.0) * p / (1 - p)
+    return max(1.0 - total, 0.0)
+
+
+def tail_exceed_p_value(baseline, current, percentile=99):
+    """
+    Tests whether more current latencies than expected are over the baseline percentile
+    by the one-sided binomial test. Returns the p-value.
+    """
+    limit = get_bucket(int(baseline.get_percentile(percentile) * 1000000))[0]
+    over = sum(count for lower, count in current.counts.items() if lower > limit)
+    return get_binomial_tail(current.count, over, 1 - percentile / 100.0)
+
+
+def get_change(baseline, current):
+    """
+    Gets the percent change from the baseline.
+    """
+    if baseline <= 0:
+        return 0.0
+    return (current - baseline) * 100.0 / baseline
+
+
+def compare_latency(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares latencies of the run with the baseline of a API.
+    p50 regressed if it increased over the threshold percent and the Mann-Whitney U test is
+    significant. p99 regressed if it increased over the threshold and significantly more
+    latencies than 1% are over the baseline p99.
+    With too few latencies to test, the run regressed if its p50 is over the baseline p99
+    by the threshold, so a single request can be compared.
+    """
+    p50 = current.get_percentile(50)
+    p99 = current.get_percentile(99)
+    baseline_p50 = baseline.get_percentile(50)
+    baseline_p99 = baseline.get_percentile(99)
+    comparison = {'count': current.count, 'baseline_count': baseline.count,
+                  'p50_ms': round(p50 * 1000, 3), 'baseline_p50_ms': round(baseline_p50 * 1000, 3),
+                  'p99_ms': round(p99 * 1000, 3), 'baseline_p99_ms': round(baseline_p99 * 1000, 3),
+                  'p50_change': round(get_change(baseline_p50, p50), 1),
+                  'p99_change': round(get_change(baseline_p99, p99), 1)}
+
+    if min(current.count, baseline.count) < MIN_TEST_SAMPLES:
+        comparison['regressed'] = p50 > baseline_p99 * (1 + threshold / 100.0)
+        return comparison
+
+    comparison['p50_p_value'] = mann_whitney_p_value(baseline, current)
+    comparison['p99_p_value'] = tail_exceed_p_value(baseline, current)
+    comparison['regressed'] = (
+        comparison['p50_change'] > threshold and comparison['p50_p_value'] < SIGNIFICANCE
+        or comparison['p99_change'] > threshold and comparison['p99_p_value'] < SIGNIFICANCE)
+    return comparison
+
+
+def compare_baseline(baseline, samples, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares latencies of APIs of the run with the baseline.
+    Returns a list of (API key, comparison) in key order. APIs without baselines are None.
+    """
+    comparisons = []
+    for key in sorted(samples.histograms):
+        histogram = samples.histograms[key]
+        if key not in baseline or baseline[key].count == 0 or histogram.count == 0:
+            comparisons.append((key, None))
+            continue
+        comparisons.append((key, compare_latency(baseline[key], histogram, threshold)))
+    return comparisons
+
+
+def print_comparisons(comparisons):
+    """
+    Prints comparisons with the baseline to the standard error.
+    Returns the number of regressed APIs.
+    """
+    regressed = 0
+    for key, comparison in comparisons:
+        if comparison is None:
+            sys.stderr.write("NEW        %s\n" % (key))
+            continue
+        state = 'OK'
+        if comparison['regressed']:
+            state = 'REGRESSED'
+            regressed += 1
+        sys.stderr.write("%-10s %s\n  p50 %.3f -> %.3f ms (%+.1f%%), p99 %.3f -> %.3f ms (%+.1f%%),"
+                         " %d -> %d requests\n"
+                         % (state, key, comparison['baseline_p50_ms'], comparison['p50_ms'],
+                            comparison['p50_change'], comparison['baseline_p99_ms'],
+                            comparison['p99_ms'], comparison['p99_change'],
+                            comparison['baseline_count'], comparison['count']))
+    sys.stderr.write("Baseline: %d APIs compared, %d regressed\n"
+                     % (sum(1 for key, comparison in comparisons if comparison is not None),
+                        regressed))
+    return regressed
@@ -0,0 +1,297 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import rtr
+from postman import create_postman
+from search import SEARCH_INDEX_SUFFIX
+from benchmark.stub_server import StubServer, AUTH_URI, AUTH_TOKEN_TITLE
+from benchmark.synthetic import make_apis, write_collection, END_POINT_VAR
+
+# Increase it when the result layout is changed.
+RESULT_VERSION = 1
+GROUPS = ('catalog', 'search', 'request')
+UNIT_SCALES = {'ms': 1000.0, 'us': 1000000.0}
+GET_API_LOOKUPS = 10000
+
+# (case, key) of find_by_* benchmarks.
+SEARCH_CASES = (('find_by_name', 'tenant detail'),
+                ('find_by_uri', 'network'),
+                ('find_by_all', 'router'))
+
+# Defines arguments.
+parser = argparse.ArgumentParser(prog='python -m benchmark',
+                                 description='REST Tester benchmarks')
+parser.add_argument("--sizes", default='100,1000,10000',
+                    help="Numbers of APIs of synthetic collections. Ex: 100,1000,10000,50000")
+parser.add_argument("--versions", default='1,2',
+                    help="Postman format versions of synthetic collections.")
+parser.add_argument("--only",
+                    help="Run only the groups. Ex: catalog,search,request")
+parser.add_argument("--repeat", type=int, default=10,
+                    help="Runs of each catalog and search case. Fewer for large collections.")
+parser.add_argument("--requests", type=int, default=100,
+                    help="Requests of each request case.")
+parser.add_argument("-o", "--output", default='benchmark.json',
+                    help="Save results to the JSON file.")
+parser.add_argument("--compare",
+                    help="Compare the median of each case with the results file.")
+parser.add_argument("--threshold", type=float, default=1.25,
+                    help="Ratio to the compared median counted as a regression.")
+
+
+def get_repeat(repeat, size):
+    """
+    Gets the number of runs of the collection size. Large collections run at least 3 times.
+    """
+    if size <= 1000:
+        return repeat
+    return max(3, repeat * 1000 // size)
+
+
+def measure(function, repeat, inner=1, setup=None):
+    """
+    Runs the function repeatedly and returns seconds of each run divided by inner.
+    setup is called before each run and isn't measured.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) / inner)
+    return samples
+
+
+def summarize(case, params, samples, unit='ms'):
+    """
+    Makes a result of the samples in seconds.
+    """
+    scale = UNIT_SCALES[unit]
+    samples = sorted(samples)
+
+    def percentile(percent):
+        return round(samples[min(len(samples) - 1, len(samples) * percent // 100)] * scale, 3)
+
+    return {'case': case, 'params': params, 'unit': unit, 'count': len(samples),
+            'min': round(samples[0] * scale, 3),
+            'mean': round(sum(samples) / len(samples) * scale, 3),
+            'p50': percentile(50), 'p90': percentile(90),
+            'max': round(samples[-1] * scale, 3)}
+
+
+def bench_catalog(results, path, params, repeat):
+    """
+    Measures loading the Postman file and getting APIs by index.
+    """
+    results.append(summarize('create_postman.parse', params,
+                             measure(lambda: create_postman(path, False), repeat)))
+    results.append(summarize('create_postman.build_cache', params,
+                             measure(lambda: create_postman(path, True, True), repeat)))
+    results.append(summarize('create_postman.cached', params,
+                             measure(lambda: create_postman(path), repeat)))
+
+    postman = create_postman(path)
+    generator = random.Random(params['size'])
+    indexes = [generator.randrange(params['size']) for _ in range(GET_API_LOOKUPS)]
+
+    def get_apis():
+        for index in indexes:
+            postman.get_api(index)
+    results.append(summarize('get_api', params,
+                             measure(get_apis, repeat, len(indexes)), 'us'))
+
+
+def bench_search(results, path, params, repeat):
+    """
+    Measures the find_by_* functions with the built and the cached search index.
+    """
+    rtr.config = {'end_point_var': END_POINT_VAR}
+    postmans = []
+
+    def remove_index():
+        if os.path.exists(path + SEARCH_INDEX_SUFFIX):
+            os.remove(path + SEARCH_INDEX_SUFFIX)
+        postmans[:] = [create_postman(path)]
+
+    def load_index():
+        postmans[:] = [create_postman(path)]
+
+    def find():
+        rtr.find_by_all(postmans[0], SEARCH_CASES[-1][1])
+
+    results.append(summarize('find_by_all.build_index', params,
+                             measure(find, repeat, setup=remove_index)))
+    results.append(summarize('find_by_all.load_index', params,
+                             measure(find, repeat, setup=load_index)))
+
+    postman = postmans[0]
+    for case, key in SEARCH_CASES:
+        function = getattr(rtr, case)
+        results.append(summarize(case, params,
+                                 measure(lambda: function(postman, key), repeat)))
+
+
+def bench_request(results, directory, count):
+    """
+    Measures request() against the local stub server.
+    """
+    server = StubServer().start()
+    apis = [('Stub', 'Fixed 0', 'GET', END_POINT_VAR + '/fixed/0', ''),
+            ('Stub', 'Fixed 10', 'GET', END_POINT_VAR + '/fixed/10', ''),
+            ('Stub', 'Variable 10', 'GET', END_POINT_VAR + '/variable/10', ''),
+            ('Stub', 'Large 1024', 'GET', END_POINT_VAR + '/large/1024', ''),
+            ('Stub', 'Create', 'POST', END_POINT_VAR + '/fixed/0', '{"name": "sample"}')]
+    path = os.path.join(directory, 'stub.json')
+    write_collection(path, 2, apis)
+    auth_path = os.path.join(directory, 'auth.json')
+    body_path = os.path.join(directory, 'body.json')
+    with open(auth_path, 'w') as handle:
+        json.dump({'auth': {'user': 'benchmark', 'password': 'benchmark'}}, handle)
+    with open(body_path, 'w') as handle:
+        handle.write(apis[-1][4])
+
+    rtr.config = {'end_point': server.get_end_point(), 'end_point_var': END_POINT_VAR,
+                  'auth_uri': AUTH_URI, 'auth_body_file': auth_path,
+                  'auth_token_value': None, 'auth_token_title': AUTH_TOKEN_TITLE,
+                  'path_vars': None}
+    rtr.transport = None
+    rtr.auth_tokens.clear()
+    postman = create_postman(path)
+
+    # (case, parameters, stream)
+    cases = (('request.fixed_0ms', ['0'], False),
+             ('request.fixed_10ms', ['1'], False),
+             ('request.variable_10ms', ['2'], False),
+             ('request.large_1mb', ['3'], False),
+             ('request.large_1mb_stream', ['3'], True),
+             ('request.post_body', ['4', body_path], False))
+    try:
+        for case, parameters, stream in cases:
+            def send():
+                rtr.request(postman, list(parameters), None, False, stream)
+            send()
+            results.append(summarize(case, {}, measure(send, count)))
+
+        def send_auth():
+            rtr.request(postman, ['0'], None, False)
+        results.append(summarize('request.auth', {},
+                                 measure(send_auth, count, setup=rtr.auth_tokens.clear)))
+    finally:
+        rtr.transport.close()
+        rtr.transport = None
+        server.stop()
+
+
+def run(args, directory):
+    """
+    Runs the benchmarks of the arguments.
+    """
+    groups = args.only.split(',') if args.only else GROUPS
+    sizes = [int(size) for size in args.sizes.split(',')]
+    versions = [int(version) for version in args.versions.split(',')]
+    results = []
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if 'catalog' in groups or 'search' in groups:
+            for size in sizes:
+                apis = make_apis(size)
+                for version in versions:
+                    path = os.path.join(directory, 'v%d_%d.json' % (version, size))
+                    write_collection(path, version, apis)
+                    params = {'version': version, 'size': size}
+                    repeat = get_repeat(args.repeat, size)
+                    if 'catalog' in groups:
+                        bench_catalog(results, path, params, repeat)
+                    if 'search' in groups:
+                        bench_search(results, path, params, repeat)
+                    sys.stderr.write("Finished: v%d %d APIs\n" % (version, size))
+
+        if 'request' in groups:
+            bench_request(results, directory, args.requests)
+    return results
+
+
+def format_params(params):
+    return ' '.join('%s=%s' % (key, params[key]) for key in params)
+
+
+def print_results(results):
+    """
+    Prints the results as a table.
+    """
+    print("%-28s %-20s %10s %10s %10s %4s" % ('Case', 'Params', 'p50', 'p90', 'Mean', ''))
+    for result in results:
+        print("%-28s %-20s %10.3f %10.3f %10.3f %4s"
+              % (result['case'], format_params(result['params']), result['p50'],
+                 result['p90'], result['mean'], result['unit']))
+
+
+def compare_results(baseline, results, threshold):
+    """
+    Prints the ratio of each median to the baseline.
+    Returns the number of cases slower than the threshold.
+    """
+    def get_key(result):
+        return result['case'], json.dumps(result['params'], sort_keys=True)
+
+    baseline_results = {get_key(result): result for result in baseline['results']}
+    regressions = 0
+    for result in results:
+        base = baseline_results.get(get_key(result))
+        if base is None or base['p50'] <= 0:
+            continue
+        ratio = result['p50'] / base['p50']
+        mark = ''
+        if ratio > threshold:
+            mark = 'REGRESSION'
+            regressions += 1
+        print("%-28s %-20s %10.3f -> %10.3f %5.2fx %s"
+              % (result['case'], format_params(result['params']), base['p50'],
+                 result['p50'], ratio, mark))
+    return regressions
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix='rtr-benchmark-')
+    try:
+        results = run(args, directory)
+    finally:
+        shutil.rmtree(directory)
+
+    print_results(results)
+    with open(args.output, 'w') as handle:
+        json.dump({'version': RESULT_VERSION, 'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'results': results}, handle, indent=2)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        print()
+        if compare_results(baseline, results, args.threshold) > 0:
+            sys.exit(1)
@@ -0,0 +1,129 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AUTH_URI = '/auth/tokens'
+AUTH_TOKEN_TITLE = 'X-Auth-Token'
+
+
+def make_large_body(size):
+    """
+    Makes a JSON array body of about the size in bytes.
+    """
+    item = json.dumps({'id': '0123456789', 'name': 'tenant name',
+                       'values': [1, 2, 3], 'nested': {'enabled': None}})
+    count = max(1, size // (len(item) + 1))
+    return ('[' + ','.join([item] * count) + ']').encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Responds the paths below. All paths but the authentication need the token.
+      POST /auth/tokens: Issues a token in the X-Auth-Token header.
+      /fixed/MS: Responds after MS milliseconds.
+      /variable/MS: Responds after 0 to 2 * MS milliseconds.
+      /large/KB: Responds a JSON array of KB kilobytes.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, code, body=b'', headers=None):
+        self.send_response(code)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > 0:
+            self.rfile.read(length)
+
+        if self.path == AUTH_URI:
+            token = self.server.issue_token()
+            self.reply(201, b'{}', {AUTH_TOKEN_TITLE: token, 'Content-Type': 'application/json'})
+            return
+        if not self.server.is_valid(self.headers.get(AUTH_TOKEN_TITLE)):
+            self.reply(401, b'{"error": "Unauthorized"}', {'Content-Type': 'application/json'})
+            return
+
+        parts = self.path.split('?')[0].strip('/').split('/')
+        kind = parts[0]
+        value = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        if kind == 'fixed':
+            time.sleep(value / 1000.0)
+        elif kind == 'variable':
+            time.sleep(random.uniform(0, 2 * value) / 1000.0)
+        elif kind == 'large':
+            self.reply(200, self.server.get_large_body(value * 1024),
+                       {'Content-Type': 'application/json'})
+            return
+        else:
+            self.reply(404, b'{"error": "Not Found"}', {'Content-Type': 'application/json'})
+            return
+        self.reply(200, json.dumps({'path': self.path, 'method': self.command}).encode(),
+                   {'Content-Type': 'application/json'})
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local HTTP server of the benchmark running in a thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), StubHandler)
+        self.lock = threading.Lock()
+        self.tokens = set()
+        self.large_bodies = {}
+        self.thread = None
+
+    def get_end_point(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def issue_token(self):
+        with self.lock:
+            token = 'token%d' % len(self.tokens)
+            self.tokens.add(token)
+        return token
+
+    def is_valid(self, token):
+        return token in self.tokens
+
+    def get_large_body(self, size):
+        with self.lock:
+            if size not in self.large_bodies:
+                self.large_bodies[size] = make_large_body(size)
+            return self.large_bodies[size]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
@@ -0,0 +1,96 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+END_POINT_VAR = '{{END_POINT}}'
+
+SERVICES = ('Compute', 'Identity', 'Network', 'Storage', 'Image', 'Volume',
+            'Orchestration', 'Telemetry')
+RESOURCES = ('Server', 'Tenant', 'User', 'Port', 'Subnet', 'Router', 'Snapshot',
+             'Flavor', 'Keypair', 'Container')
+# (name, method, URI suffix)
+ACTIONS = (('List', 'GET', ''),
+           ('Detail', 'GET', '/{id}'),
+           ('Create', 'POST', ''),
+           ('Update', 'PUT', '/{id}'),
+           ('Delete', 'DELETE', '/{id}'))
+
+
+def make_apis(count):
+    """
+    Makes synthetic APIs as tuples (folder, name, method, uri, body).
+    Every five APIs are the actions of a resource.
+    """
+    apis = []
+    for i in range(count):
+        group, action_index = divmod(i, len(ACTIONS))
+        folder = SERVICES[group % len(SERVICES)]
+        resource = '%s%d' % (RESOURCES[group // len(SERVICES) % len(RESOURCES)], group)
+        action, method, suffix = ACTIONS[action_index]
+
+        uri = '%s/%s/v2/%ss%s' % (END_POINT_VAR, folder.lower(), resource.lower(), suffix)
+        body = ''
+        if method in ('POST', 'PUT'):
+            body = json.dumps({resource.lower(): {'name': 'sample', 'description': 'API %d' % i}},
+                              indent=2)
+        apis.append((folder, '[%s] %s' % (resource, action), method, uri, body))
+    return apis
+
+
+def make_v1(apis):
+    """
+    Makes a Postman collection of the old format.
+    """
+    folder_ids = {}
+    requests = []
+    for i, (folder, name, method, uri, body) in enumerate(apis):
+        folder_id = folder_ids.setdefault(folder, 'folder-%d' % len(folder_ids))
+        requests.append({'id': 'request-%d' % i, 'folder': folder_id, 'name': name,
+                         'method': method, 'url': uri, 'headers': '',
+                         'dataMode': 'raw', 'rawModeData': body})
+
+    folders = [{'id': folder_id, 'name': folder} for folder, folder_id in folder_ids.items()]
+    return {'id': 'synthetic', 'name': 'Synthetic', 'folders': folders, 'requests': requests}
+
+
+def make_v2(apis):
+    """
+    Makes a Postman collection of the 2.1 format.
+    APIs are grouped by folders in the order of the first API of each folder.
+    """
+    folders = {}
+    for folder, name, method, uri, body in apis:
+        request = {'method': method,
+                   'header': [{'key': 'Content-Type', 'value': 'application/json'}],
+                   'url': {'raw': uri}}
+        if body:
+            request['body'] = {'mode': 'raw', 'raw': body}
+        folders.setdefault(folder, []).append({'name': name, 'request': request})
+
+    return {'info': {'name': 'Synthetic',
+                     'schema': 'https://schema.getpostman.com/json/collection/v2.1.0/collection.json'},
+            'item': [{'name': folder, 'item': items} for folder, items in folders.items()]}
+
+
+def write_collection(path, version, apis):
+    """
+    Writes the APIs as a Postman file of the version, 1 or 2.
+    """
+    if version == 1:
+        collection = make_v1(apis)
+    else:
+        collection = make_v2(apis)
+    with open(path, 'w') as handle:
+        json.dump(collection, handle)
@@ -0,0 +1,107 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import sys
+
+# Increase it when the record layout is changed.
+CATALOG_VERSION = 2
+CATALOG_SUFFIX = '.cache'
+
+
+def get_catalog_path(postman_path):
+    """
+    Gets the compiled catalog path next to the Postman file.
+    """
+    return postman_path + CATALOG_SUFFIX
+
+
+def get_catalog_key(postman_path):
+    """
+    Gets the key to check the catalog is up to date with the Postman file.
+    """
+    stat = os.stat(postman_path)
+    return (CATALOG_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+def intern_text(value):
+    """
+    Interns the string to share repeated strings.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def to_record(api):
+    """
+    Converts a API to a catalog record.
+    Repeated strings, folder names, methods and headers, are interned,
+    so they are shared in memory and in the saved catalog.
+    """
+    headers = tuple((intern_text(key), intern_text(value))
+                    for key, value in api.get_headers().items())
+    return (api.get_name(), intern_text(api.get_folder_name()),
+            intern_text(api.get_method()), api.get_uri(), headers,
+            api.get_request_body_sample(), api.get_assertions())
+
+
+def load_file(path, key):
+    """
+    Loads a cached data.
+    Returns None if the file doesn't exist or its key is not matched.
+    """
+    try:
+        with open(path, 'rb') as handle:
+            cached_key, data = pickle.load(handle)
+    except (OSError, EOFError, TypeError, ValueError, pickle.UnpicklingError):
+        return None
+
+    if key != cached_key:
+        return None
+    return data
+
+
+def save_file(path, key, data):
+    """
+    Saves a cached data with the key.
+    The cache is only for speed, so failing to write is ignored.
+    """
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as handle:
+            pickle.dump((key, data), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_catalog(postman_path, key):
+    """
+    Loads catalog records.
+    Returns None if the catalog doesn't exist or its key is not matched.
+    """
+    return load_file(get_catalog_path(postman_path), key)
+
+
+def save_catalog(postman_path, key, apis):
+    """
+    Saves APIs as catalog records with the key.
+    """
+    records = [to_record(api) for api in apis]
+    save_file(get_catalog_path(postman_path), key, records)
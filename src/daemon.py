@@ -0,0 +1,232 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+import socket
+import struct
+import sys
+import traceback
+
+SOCKET_SUFFIX = '.sock'
+
+# A frame is a channel byte, a payload length and the payload.
+FRAME_HEADER = struct.Struct('>cI')
+CHANNEL_REQUEST = b'a'
+CHANNEL_STDOUT = b'1'
+CHANNEL_STDERR = b'2'
+CHANNEL_EXIT = b'x'
+
+
+def get_socket_path(config_path):
+    """
+    Gets the daemon socket path next to the configuration file.
+    """
+    return os.path.abspath(config_path) + SOCKET_SUFFIX
+
+
+def write_frame(sock, channel, payload):
+    """
+    Sends a frame to the socket.
+    """
+    sock.sendall(FRAME_HEADER.pack(channel, len(payload)) + payload)
+
+
+def read_frame(reader):
+    """
+    Reads a frame from the file of the socket.
+    Returns (None, None) if the connection is closed.
+    """
+    header = reader.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None, None
+    channel, length = FRAME_HEADER.unpack(header)
+    payload = reader.read(length)
+    if len(payload) < length:
+        return None, None
+    return channel, payload
+
+
+def get_exit_status(code):
+    """
+    Converts the code of SystemExit to a exit status.
+    """
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    sys.stderr.write("%s\n" % code)
+    return 1
+
+
+class FrameWriter(io.RawIOBase):
+    """
+    Writes bytes as frames of the channel.
+    """
+    def __init__(self, sock, channel):
+        self.sock = sock
+        self.channel = channel
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if len(data) > 0:
+            write_frame(self.sock, self.channel, bytes(data))
+        return len(data)
+
+
+def open_channel(sock, channel):
+    """
+    Opens a text file which is written to the channel like sys.stdout.
+    """
+    return io.TextIOWrapper(io.BufferedWriter(FrameWriter(sock, channel)),
+                            encoding='utf-8', line_buffering=True)
+
+
+def handle_connection(sock, handle):
+    """
+    Runs a forwarded command with stdout and stderr sent to the client.
+    The command runs in the directory of the client, and the directory of the daemon
+    is restored after it.
+    """
+    reader = sock.makefile('rb')
+    channel, payload = read_frame(reader)
+    if channel != CHANNEL_REQUEST:
+        return
+    command = json.loads(payload.decode('utf-8'))
+
+    cwd = os.getcwd()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = open_channel(sock, CHANNEL_STDOUT)
+    sys.stderr = open_channel(sock, CHANNEL_STDERR)
+    try:
+        try:
+            os.chdir(command['cwd'])
+            handle(command['argv'])
+            status = 0
+        except SystemExit as e:
+            status = get_exit_status(e.code)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+    write_frame(sock, CHANNEL_EXIT, str(status).encode())
+
+
+def create_server(socket_path, handle):
+    """
+    Creates the daemon server which runs commands one by one with handle(argv).
+    """
+    import socketserver
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            try:
+                handle_connection(self.request, handle)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    if os.path.exists(socket_path):
+        if is_running(socket_path):
+            raise FileExistsError("The daemon is already running: %s" % socket_path)
+        os.remove(socket_path)
+
+    # Only the owner can connect to the socket.
+    umask = os.umask(0o177)
+    try:
+        return socketserver.UnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(umask)
+
+
+def serve(socket_path, handle):
+    """
+    Runs the daemon until it is interrupted or terminated.
+    """
+    import signal
+    server = create_server(socket_path, handle)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print("Daemon is listening on %s" % socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+def connect(socket_path):
+    """
+    Connects to the daemon.
+    Returns None if no daemon is running.
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def is_running(socket_path):
+    """
+    Checks the daemon is listening on the socket.
+    """
+    sock = connect(socket_path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def forward(socket_path, argv, stdout=None, stderr=None):
+    """
+    Runs the command in the daemon and writes its output.
+    Returns the exit status or None if no daemon is running.
+    """
+    sock = connect(socket_path)
+    if sock is None:
+        return None
+    stdout = stdout or sys.stdout.buffer
+    stderr = stderr or sys.stderr.buffer
+
+    with sock:
+        command = {'argv': argv, 'cwd': os.getcwd()}
+        write_frame(sock, CHANNEL_REQUEST, json.dumps(command).encode('utf-8'))
+        reader = sock.makefile('rb')
+        while True:
+            channel, payload = read_frame(reader)
+            if channel == CHANNEL_STDOUT:
+                stdout.write(payload)
+                stdout.flush()
+            elif channel == CHANNEL_STDERR:
+                stderr.write(payload)
+                stderr.flush()
+            elif channel == CHANNEL_EXIT:
+                return int(payload)
+            else:
+                stderr.write(b"The daemon closed the connection.\n")
+                return 1
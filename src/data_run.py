@@ -0,0 +1,189 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import csv
+import json
+import re
+from urllib.parse import quote
+
+from assertions import is_failed
+
+# Path variables in URIs. Ex: {user_id} or {{TENANT_ID}}
+PATH_VAR_PATTERN = re.compile(r'{{?([^/{}]+)}}?')
+# Template variables in request bodies. Ex: {{name}}
+BODY_VAR_PATTERN = re.compile(r'{{([^{}]+)}}')
+# Columns of a row which are not variables.
+QUERY_COLUMN = 'query'
+BODY_COLUMN = 'body'
+
+# Errors of a row which are written as its result.
+ROW_ERRORS = (OSError, ValueError, KeyError, TypeError, RuntimeError)
+
+
+def to_text(value):
+    """
+    Converts a row value to text. JSON values but strings are dumped.
+    """
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ''
+    return json.dumps(value)
+
+
+def read_rows(path):
+    """
+    Reads rows of the CSV or JSON lines file one by one.
+    The CSV file must have the header line. Yields the row number from 1 and the row.
+    """
+    with open(path, 'r', newline='') as handle:
+        if path.lower().endswith('.csv'):
+            for row_number, row in enumerate(csv.DictReader(handle), 1):
+                yield row_number, row
+            return
+
+        row_number = 0
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            row_number += 1
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("A row must be a JSON object! row: %d" % (row_number))
+            yield row_number, row
+
+
+def find_last_row(path):
+    """
+    Finds the last row number written to the results file to resume.
+    A line partially written by an interrupted run is truncated.
+    Returns 0 if the file doesn't exist.
+    """
+    last_row = 0
+    end = 0
+    try:
+        handle = open(path, 'rb+')
+    except FileNotFoundError:
+        return 0
+    with handle:
+        for line in handle:
+            try:
+                last_row = json.loads(line)['row']
+            except (ValueError, KeyError, TypeError):
+                break
+            end += len(line)
+        handle.truncate(end)
+    return last_row
+
+
+def compile_template(text, pattern):
+    """
+    Splits the text to literal parts and variable names once to render it many times.
+    Even items are literals and odd items are (name, placeholder).
+    """
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(text[position:match.start()])
+        parts.append((match.group(1), match.group(0)))
+        position = match.end()
+    parts.append(text[position:])
+    return parts
+
+
+def render_template(parts, row, convert):
+    """
+    Renders the compiled template with row values.
+    Variables not in the row are kept as they are.
+    """
+    values = []
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            values.append(part)
+            continue
+        name, placeholder = part
+        if name in row:
+            values.append(convert(row[name]))
+        else:
+            values.append(placeholder)
+    return ''.join(values)
+
+
+class RequestTemplate:
+    """
+    URI and body of a API with variables replaced by each row.
+      Path variables, {name} or {{name}} in the URI, are replaced by the columns of the names.
+      The query column is added to the query string.
+      The body column is the request body. Otherwise {{name}} in the body template is replaced.
+    """
+    def __init__(self, uri, body_template=None):
+        self.uri_parts = compile_template(uri, PATH_VAR_PATTERN)
+        self.body_parts = None
+        if body_template is not None:
+            self.body_parts = compile_template(body_template, BODY_VAR_PATTERN)
+
+    def render(self, row):
+        """
+        Renders the URI and the body of the row. The body is None if there is not.
+        """
+        uri = render_template(self.uri_parts, row, lambda value: quote(to_text(value), safe=''))
+        query = to_text(row.get(QUERY_COLUMN)).lstrip('?')
+        if query:
+            uri += ('&' if '?' in uri else '?') + query
+
+        body = None
+        if row.get(BODY_COLUMN) not in (None, ''):
+            body = to_text(row[BODY_COLUMN])
+        elif self.body_parts is not None:
+            body = render_template(self.body_parts, row, to_text)
+        return uri, body
+
+
+def run_rows(rows, send, write, concurrency=1, window=None):
+    """
+    Calls send(row) for rows by concurrent workers and write(result) in the row order.
+    At most window rows are in flight, so memory doesn't grow with the number of rows.
+    send() returns a dictionary of the result, and raised errors are written as the error.
+    Returns the number of rows and failed rows.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    window = window or concurrency * 2
+    pending = collections.deque()
+    counts = {'rows': 0, 'failures': 0}
+
+    def call(row_number, row):
+        result = {'row': row_number}
+        try:
+            result.update(send(row))
+        except ROW_ERRORS as e:
+            result['error'] = str(e)
+        return result
+
+    def write_next():
+        result = pending.popleft().result()
+        counts['rows'] += 1
+        if is_failed(result):
+            counts['failures'] += 1
+        write(result)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for row_number, row in rows:
+            if len(pending) >= window:
+                write_next()
+            pending.append(executor.submit(call, row_number, row))
+        while pending:
+            write_next()
+    return counts['rows'], counts['failures']
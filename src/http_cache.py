@@ -0,0 +1,216 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import re
+import time
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+META_SUFFIX = '.meta'
+BODY_SUFFIX = '.body'
+
+MAX_AGE_PATTERN = re.compile(r'max-age\s*=\s*(\d+)', re.IGNORECASE)
+
+
+def get_cache_key(uri, headers):
+    """
+    Gets the cache key of the URI and request headers.
+    """
+    digest = hashlib.sha256(uri.encode('utf-8'))
+    for key in sorted(headers or {}, key=str.lower):
+        digest.update(('\n%s: %s' % (key.lower(), headers[key])).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def parse_cache_control(value):
+    """
+    Parses Cache-Control to max-age, no-cache, and no-store.
+    """
+    value = (value or '').lower()
+    match = MAX_AGE_PATTERN.search(value)
+    max_age = int(match.group(1)) if match else None
+    return max_age, 'no-cache' in value, 'no-store' in value
+
+
+class CacheEntry:
+    """
+    A cached GET response.
+    """
+    meta = None
+    body_path = None
+    def __init__(self, meta, body_path):
+        self.meta = meta
+        self.body_path = body_path
+
+    def is_fresh(self):
+        """
+        Checks the response can be used without revalidation.
+        """
+        max_age = self.meta.get('max_age')
+        if max_age is None or self.meta.get('no_cache'):
+            return False
+        return time.time() < self.meta['stored_at'] + max_age
+
+    def get_validators(self):
+        """
+        Gets conditional request headers.
+        """
+        headers = {}
+        if self.meta.get('etag'):
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified'):
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+
+    def get_size(self):
+        return self.meta['size']
+
+    def to_response(self, url):
+        """
+        Makes a response from the cached one.
+        """
+        r = Response()
+        r.status_code = self.meta['status']
+        r.headers = CaseInsensitiveDict(self.meta['headers'])
+        r.url = url
+        with open(self.body_path, 'rb') as handle:
+            r._content = handle.read()
+        r._content_consumed = True
+        r.encoding = self.meta.get('encoding')
+        return r
+
+
+class ResponseCache:
+    """
+    On-disk cache of GET responses.
+    Entries are evicted by the least recently used order
+    if the total size is larger than max_size bytes.
+    """
+    path = None
+    max_size = 0
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+
+    def get_paths(self, key):
+        base = os.path.join(self.path, key)
+        return base + META_SUFFIX, base + BODY_SUFFIX
+
+    def lookup(self, key):
+        """
+        Gets the cached entry, or None. The entry is marked as recently used.
+        """
+        meta_path, body_path = self.get_paths(key)
+        try:
+            with open(meta_path, 'r') as handle:
+                meta = json.load(handle)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        return CacheEntry(meta, body_path)
+
+    def store(self, key, response):
+        """
+        Stores the response if it can be revalidated or has max-age.
+        """
+        max_age, no_cache, no_store = parse_cache_control(response.headers.get('Cache-Control'))
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if no_store or response.status_code != 200:
+            return False
+        if not etag and not last_modified and not max_age:
+            return False
+        if len(response.content) > self.max_size:
+            return False
+
+        meta = {'status': response.status_code,
+                'headers': dict(response.headers),
+                'encoding': response.encoding,
+                'etag': etag,
+                'last_modified': last_modified,
+                'max_age': max_age,
+                'no_cache': no_cache,
+                'stored_at': time.time(),
+                'size': len(response.content)}
+        meta_path, body_path = self.get_paths(key)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(body_path, 'wb') as handle:
+                handle.write(response.content)
+            with open(meta_path, 'w') as handle:
+                json.dump(meta, handle)
+        except OSError:
+            return False
+        self.evict()
+        return True
+
+    def refresh(self, entry, response):
+        """
+        Updates the entry by a 304 response.
+        """
+        meta = entry.meta
+        for name in ('ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date'):
+            if name in response.headers:
+                meta['headers'][name] = response.headers[name]
+        max_age, no_cache, no_store = parse_cache_control(meta['headers'].get('Cache-Control'))
+        meta['etag'] = meta['headers'].get('ETag')
+        meta['last_modified'] = meta['headers'].get('Last-Modified')
+        meta['max_age'] = max_age
+        meta['no_cache'] = no_cache
+        meta['stored_at'] = time.time()
+        try:
+            with open(entry.body_path[:-len(BODY_SUFFIX)] + META_SUFFIX, 'w') as handle:
+                json.dump(meta, handle)
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Removes least recently used entries until the total size fits.
+        """
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(META_SUFFIX):
+                continue
+            meta_path = os.path.join(self.path, name)
+            body_path = meta_path[:-len(META_SUFFIX)] + BODY_SUFFIX
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+                used = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((used, size, meta_path, body_path))
+            total += size
+
+        entries.sort()
+        for used, size, meta_path, body_path in entries:
+            if total <= self.max_size:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
@@ -0,0 +1,290 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import json
+import re
+
+STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+SCALAR = r'(?:%s|[^{}\[\],:"\s]+)' % (STRING)
+# Tokens are grouped as many as possible to reduce the loop count.
+# A key with its scalar value, a scalar value, a bracket, each with a following comma,
+# or a single comma or colon, or white spaces.
+TOKEN_PATTERN = re.compile(
+    r'(?P<key>%s)\s*:\s*(?:(?P<member>%s)\s*(?P<member_comma>,)?)?'
+    r'|(?P<value>%s)\s*(?P<value_comma>,)?'
+    r'|(?P<open>[{\[])'
+    r'|(?P<close>[}\]])\s*(?P<close_comma>,)?'
+    r'|(?P<comma>,)|(?P<colon>:)|\s+'
+    % (STRING, SCALAR, SCALAR))
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+# A key with the colon, and a separator or a bracket.
+KEY_PATTERN = re.compile(r'[ \t\n\r]*(%s)[ \t\n\r]*:' % (STRING))
+CHAR_PATTERN = re.compile(r'[ \t\n\r]*(.)')
+LITERAL_PATTERN = re.compile(r'[^,\]}\s]*')
+READ_SIZE = 1024 * 1024
+
+
+class JsonPrettyPrinter:
+    """
+    Pretty-prints JSON text fed by chunks without building the object tree.
+    Values are written as they are, and only white spaces are changed.
+    """
+    write = None
+    indent = 2
+    depth = 0
+    # A bracket is opened and its first item is not written yet.
+    opened = False
+    rest = ''
+    def __init__(self, write, indent=2):
+        self.write = write
+        self.indent = indent
+        self.depth = 0
+        self.opened = False
+        self.rest = ''
+
+    def feed(self, text, final=False):
+        """
+        Feeds a chunk of JSON text.
+        A token not completed at the end of the chunk is kept to the next chunk.
+        """
+        text = self.rest + text
+        length = len(text)
+        depth = self.depth
+        opened = self.opened
+        indent = ' ' * self.indent
+        output = []
+        append = output.append
+        pos = 0
+        for match in TOKEN_PATTERN.finditer(text):
+            start, end = match.span()
+            if start != pos:
+                # An incomplete string is skipped by finditer.
+                break
+            if end == length and not final:
+                # The token can be continued in the next chunk.
+                break
+            pos = end
+
+            kind = match.lastgroup
+            if kind is None:
+                # White spaces
+                continue
+
+            if kind == 'open':
+                if opened:
+                    append('\n' + indent * depth)
+                append(match.group('open'))
+                depth += 1
+                opened = True
+                continue
+
+            if kind == 'close' or kind == 'close_comma':
+                depth -= 1
+                if opened:
+                    opened = False
+                else:
+                    append('\n' + indent * depth)
+                append(match.group('close'))
+                if kind == 'close_comma':
+                    append(',\n' + indent * depth)
+                continue
+
+            if opened:
+                opened = False
+                append('\n' + indent * depth)
+            if kind == 'comma':
+                append(',\n' + indent * depth)
+            elif kind == 'colon':
+                append(': ')
+            elif kind == 'value' or kind == 'value_comma':
+                append(match.group('value'))
+                if kind == 'value_comma':
+                    append(',\n' + indent * depth)
+            else:
+                append(match.group('key'))
+                append(': ')
+                if kind != 'key':
+                    append(match.group('member'))
+                    if kind == 'member_comma':
+                        append(',\n' + indent * depth)
+
+        self.depth = depth
+        self.opened = opened
+        self.rest = text[pos:]
+        self.write(''.join(output))
+
+    def close(self):
+        """
+        Writes the rest text.
+        """
+        self.feed('', True)
+        if self.rest:
+            # Not a valid JSON. Writes as it is.
+            self.write(self.rest)
+            self.rest = ''
+        self.write('\n')
+
+
+def pretty_print_chunks(chunks, write, encoding='utf-8', indent=2):
+    """
+    Pretty-prints JSON bytes chunks.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    printer = JsonPrettyPrinter(write, indent)
+    for chunk in chunks:
+        printer.feed(decoder.decode(chunk))
+    printer.feed(decoder.decode(b'', True))
+    printer.close()
+
+
+class JsonReader:
+    """
+    Reads a JSON file incrementally.
+    Objects and arrays are iterated, and each value is read or skipped
+    so that only needed values are built.
+    """
+    handle = None
+    read_size = READ_SIZE
+    buffer = ''
+    pos = 0
+    eof = False
+    def __init__(self, handle, read_size=READ_SIZE):
+        self.handle = handle
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size=None):
+        """
+        Reads more text after the rest of the buffer.
+        Returns False at the end of the file.
+        """
+        if self.eof:
+            return False
+        chunk = self.handle.read(size or self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def match(self, pattern):
+        """
+        Matches the pattern at the position.
+        More text is read if it isn't matched before the end of the buffer.
+        """
+        while True:
+            match = pattern.match(self.buffer, self.pos)
+            if match is not None and match.end() < len(self.buffer):
+                return match
+            if not self.fill():
+                return match
+
+    def peek(self):
+        """
+        Skips white spaces and returns the next character, or '' at the end.
+        """
+        match = self.match(CHAR_PATTERN)
+        if match is None:
+            self.pos = len(self.buffer)
+            return ''
+        self.pos = match.start(1)
+        return match.group(1)
+
+    def expect(self, chars):
+        """
+        Consumes the next character which must be one of chars.
+        """
+        match = self.match(CHAR_PATTERN)
+        char = match.group(1) if match else ''
+        if not char or char not in chars:
+            raise ValueError("Expecting one of '%s' but '%s' is found." % (chars, char))
+        self.pos = match.end()
+        return char
+
+    def read_key(self):
+        """
+        Reads a key of an object with the following colon.
+        """
+        match = self.match(KEY_PATTERN)
+        if match is None:
+            raise ValueError("Expecting a key at '%s'." % self.buffer[self.pos:self.pos + 20])
+        self.pos = match.end()
+        key = match.group(1)
+        if '\\' in key:
+            return json.loads(key)
+        return key[1:-1]
+
+    def read_value(self):
+        """
+        Reads the next value.
+        """
+        if self.peek() not in '"{[':
+            # Reads the whole number or literal which may be continued in the next chunk.
+            self.match(LITERAL_PATTERN)
+        size = self.read_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may be continued in the next chunk.
+                if not self.fill(size):
+                    raise
+                size *= 2
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        """
+        Skips the next value.
+        The value is decoded by the C decoder and dropped at once,
+        which is faster than scanning it in Python.
+        """
+        self.read_value()
+
+    def iter_object(self):
+        """
+        Iterates keys of the next object.
+        The value of each key must be read or skipped before the next key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            yield self.read_key()
+            if self.expect(',}') == '}':
+                return
+
+    def iter_array(self):
+        """
+        Iterates indexes of items of the next array.
+        Each item must be read or skipped before the next index.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.expect(',]') == ']':
+                return
@@ -0,0 +1,491 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import itertools
+import math
+import sys
+import threading
+import time
+
+from retry import format_retry_stats, merge_counts
+from stats import Histogram
+
+# A request of the open-loop test is late if it is sent this much after its intended time.
+LATE_SECONDS = 0.01
+# Seconds between progress reports of a running load test.
+REPORT_SECONDS = 1.0
+# Seconds for forked processes to get ready before an open-loop test starts.
+PROCESS_START_DELAY = 0.2
+
+
+class LoadResult:
+    """
+    Result of a load test.
+    """
+    histogram = None
+    # {status code: count}
+    statuses = None
+    # {error name: count}
+    errors = None
+    # Responses failed assertions, and {assertion: count}
+    assertion_failures = 0
+    assertions = None
+    elapsed = 0
+    # Open-loop tests only. Latencies from the send time, and late and dropped requests.
+    service_histogram = None
+    late = 0
+    dropped = 0
+    # Counts of retries and hedged requests if the retry policy is used.
+    retries = None
+    def __init__(self):
+        self.histogram = Histogram()
+        self.statuses = {}
+        self.errors = {}
+        self.assertion_failures = 0
+        self.assertions = {}
+        self.elapsed = 0
+        self.service_histogram = None
+        self.late = 0
+        self.dropped = 0
+        self.retries = None
+
+    def add_status(self, status, seconds):
+        """
+        Adds a responded request.
+        """
+        self.histogram.record(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def add_error(self, error):
+        """
+        Adds a failed request.
+        """
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def add_assertion_failures(self, names):
+        """
+        Adds a response which failed the assertions of the names.
+        """
+        self.assertion_failures += 1
+        for name in names:
+            self.assertions[name] = self.assertions.get(name, 0) + 1
+
+    def merge(self, other):
+        """
+        Adds the result of another process. The elapsed time is the longest one.
+        """
+        self.histogram.merge(other.histogram)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        for name, count in other.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        self.assertion_failures += other.assertion_failures
+        for name, count in other.assertions.items():
+            self.assertions[name] = self.assertions.get(name, 0) + count
+        self.elapsed = max(self.elapsed, other.elapsed)
+        if other.service_histogram is not None:
+            if self.service_histogram is None:
+                self.service_histogram = Histogram()
+            self.service_histogram.merge(other.service_histogram)
+        self.late += other.late
+        self.dropped += other.dropped
+        if other.retries is not None:
+            self.retries = merge_counts(self.retries or {}, other.retries)
+
+    def count_requests(self):
+        """
+        Counts all requests including failed ones.
+        """
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    def get_throughput(self):
+        """
+        Gets requests per second.
+        """
+        if self.elapsed <= 0:
+            return 0
+        return self.count_requests() / self.elapsed
+
+    def to_dict(self):
+        """
+        Converts to a JSON serializable dictionary.
+        """
+        data = {'requests': self.count_requests(),
+                'elapsed': round(self.elapsed, 3),
+                'throughput': round(self.get_throughput(), 3),
+                'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+                'errors': self.errors,
+                'assertion_failures': self.assertion_failures,
+                'assertions': self.assertions,
+                'latency_ms': self.histogram.summarize()}
+        if self.service_histogram is not None:
+            data['late'] = self.late
+            data['dropped'] = self.dropped
+            data['service_time_ms'] = self.service_histogram.summarize()
+        if self.retries is not None:
+            data['retries'] = self.retries
+        return data
+
+
+def get_status(status):
+    """
+    Splits the returned status of send() to the status code and names of failed assertions.
+    """
+    if isinstance(status, tuple):
+        return status
+    return status, None
+
+
+def wait_workers(workers, result, lock, start, report=None):
+    """
+    Waits for worker threads and sets the elapsed time of the result.
+    If report is given, it is called with a copy of the result every REPORT_SECONDS.
+    """
+    next_report = time.perf_counter() + REPORT_SECONDS
+    for worker in workers:
+        while True:
+            worker.join(max(next_report - time.perf_counter(), 0) if report else None)
+            if not worker.is_alive():
+                break
+            with lock:
+                result.elapsed = time.perf_counter() - start
+                snapshot = copy.deepcopy(result)
+            report(snapshot)
+            next_report += REPORT_SECONDS
+    result.elapsed = time.perf_counter() - start
+
+
+def run_closed_loop(send, count=None, concurrency=1, duration=None, report=None):
+    """
+    Calls send() by concurrent workers as fast as possible.
+    Stops after count calls or duration seconds.
+    send() returns the status code, or the status code and names of failed assertions.
+    Raised errors are counted. report() is called with the progress if it is given.
+    """
+    result = LoadResult()
+    lock = threading.Lock()
+    state = {'issued': 0}
+    deadline = None
+    if duration:
+        deadline = time.perf_counter() + duration
+
+    def next_request():
+        with lock:
+            if count is not None and state['issued'] >= count:
+                return False
+            state['issued'] += 1
+            return True
+
+    def work():
+        while next_request():
+            start = time.perf_counter()
+            if deadline is not None and start >= deadline:
+                break
+            try:
+                status = send()
+            except Exception as e:
+                with lock:
+                    result.add_error(e)
+                continue
+            seconds = time.perf_counter() - start
+            status, failures = get_status(status)
+            with lock:
+                result.add_status(status, seconds)
+                if failures:
+                    result.add_assertion_failures(failures)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=work, daemon=True) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    wait_workers(workers, result, lock, start, report)
+    return result
+
+
+def parse_stages(text):
+    """
+    Parses ramp-up stages, 'SECONDS:RPS,SECONDS:RPS,...', to a list of (seconds, rate).
+    """
+    stages = []
+    for item in text.split(','):
+        seconds, _, rate = item.strip().partition(':')
+        try:
+            seconds = float(seconds)
+            rate = float(rate)
+        except ValueError:
+            raise ValueError("Invalid stage! It must be SECONDS:RPS. stage: %s" % (item))
+        if seconds <= 0 or rate < 0:
+            raise ValueError("Invalid stage! stage: %s" % (item))
+        stages.append((seconds, rate))
+    return stages
+
+
+def make_schedule(stages=None, rate=None, duration=None):
+    """
+    Makes the arrival schedule, a list of (seconds, start rate, end rate).
+    A stage changes the rate linearly from the rate of the previous stage, or 0, to its rate.
+    The constant rate for the duration follows the stages.
+    """
+    schedule = []
+    previous = 0.0
+    for seconds, target in stages or ():
+        schedule.append((seconds, previous, target))
+        previous = target
+    if rate:
+        if rate < 0 or not duration or duration <= 0:
+            raise ValueError("The rate needs the duration! rate: %s, duration: %s"
+                             % (rate, duration))
+        schedule.append((duration, rate, rate))
+    if not schedule:
+        raise ValueError("No rate is given!")
+    return schedule
+
+
+def iter_arrivals(schedule):
+    """
+    Yields intended send times of requests in seconds from the start.
+    The n-th request is sent when n requests are arrived by the rate of the schedule,
+    so the timeline doesn't depend on responses.
+    """
+    offset = 0.0
+    arrived = 0.0
+    n = 0
+    for seconds, start_rate, end_rate in schedule:
+        slope = (end_rate - start_rate) / seconds
+        total = arrived + (start_rate + end_rate) * seconds / 2.0
+        while n < total:
+            count = n - arrived
+            if slope == 0:
+                yield offset + count / start_rate
+            else:
+                root = math.sqrt(max(start_rate * start_rate + 2 * slope * count, 0))
+                yield offset + (root - start_rate) / slope
+            n += 1
+        offset += seconds
+        arrived = total
+
+
+def run_open_loop(send, schedule, concurrency=1, count=None, start=None, part=None,
+                  report=None):
+    """
+    Calls send() on the fixed arrival timeline of the schedule by at most concurrency workers.
+    Latencies are measured from the intended send times, so stalls of the server are counted
+    for all requests which should have been sent, not only the stalled ones.
+    Requests sent LATE_SECONDS after their times are late, and requests not sent
+    until the end of the schedule are dropped. Stops after count requests if it is given.
+    The timeline begins at start, perf_counter() seconds, or now.
+    part, (index, parts), sends only every parts-th request from the index,
+    so processes can share the timeline.
+    """
+    result = LoadResult()
+    result.service_histogram = Histogram()
+    lock = threading.Lock()
+    arrivals = iter_arrivals(schedule)
+    if count:
+        arrivals = itertools.islice(arrivals, count)
+    if part:
+        arrivals = itertools.islice(arrivals, part[0], None, part[1])
+    if start is None:
+        start = time.perf_counter()
+    end = start + sum(seconds for seconds, _, _ in schedule)
+
+    def work():
+        while True:
+            with lock:
+                intended = next(arrivals, None)
+            if intended is None:
+                break
+            intended += start
+            now = time.perf_counter()
+            if now >= end:
+                with lock:
+                    result.dropped += 1
+                continue
+            if intended > now:
+                time.sleep(intended - now)
+            sent = time.perf_counter()
+            late = sent - intended > LATE_SECONDS
+            try:
+                status = send()
+            except Exception as e:
+                with lock:
+                    result.add_error(e)
+                    result.late += late
+                continue
+            done = time.perf_counter()
+            status, failures = get_status(status)
+            with lock:
+                result.add_status(status, done - intended)
+                result.service_histogram.record(done - sent)
+                result.late += late
+                if failures:
+                    result.add_assertion_failures(failures)
+
+    workers = [threading.Thread(target=work, daemon=True) for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    wait_workers(workers, result, lock, start, report)
+    return result
+
+
+def split_count(total, parts, index):
+    """
+    Gets the share of the index when the total is split to parts.
+    """
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def can_fork():
+    """
+    Checks load tests can be shared by forked processes. Windows can't fork.
+    """
+    import multiprocessing
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def run_child(run, index, connection):
+    """
+    Runs a process of run_processes() and sends its progress and result to the parent.
+    """
+    try:
+        result = run(index, lambda snapshot: connection.send(('progress', snapshot)))
+        connection.send(('result', result))
+    except Exception as e:
+        connection.send(('error', "%s: %s" % (type(e).__name__, e)))
+    finally:
+        connection.close()
+
+
+def run_processes(run, processes, report=None):
+    """
+    Calls run(index, report) in forked processes, and merges their results.
+    run() runs a load test by its own connections and returns the result.
+    Processes send their progress while running, and the merged progress is passed to
+    report() every REPORT_SECONDS. Raises RuntimeError if a process failed,
+    or processes can't be forked.
+    """
+    import multiprocessing
+    from multiprocessing.connection import wait
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        raise RuntimeError("Processes can't be forked on this platform! Use --processes 1.")
+    # Buffered output is not written again by processes.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    connections = {}
+    children = []
+    for index in range(processes):
+        receiver, sender = context.Pipe(duplex=False)
+        child = context.Process(target=run_child, args=(run, index, sender), daemon=True)
+        child.start()
+        sender.close()
+        connections[receiver] = index
+        children.append(child)
+
+    results = [LoadResult() for i in range(processes)]
+    errors = []
+    next_report = time.perf_counter() + REPORT_SECONDS
+    while connections:
+        for connection in wait(list(connections), REPORT_SECONDS):
+            index = connections[connection]
+            try:
+                kind, value = connection.recv()
+            except EOFError:
+                kind, value = 'error', "The process %d exited without the result." % (index)
+            if kind == 'progress':
+                results[index] = value
+                continue
+            if kind == 'result':
+                results[index] = value
+            else:
+                errors.append(value)
+            del connections[connection]
+            connection.close()
+        if report and connections and time.perf_counter() >= next_report:
+            progress = merge_results(results)
+            if progress.count_requests():
+                report(progress)
+            next_report += REPORT_SECONDS
+
+    for child in children:
+        child.join()
+    if errors:
+        raise RuntimeError("Load test process failed! %s" % (errors[0]))
+    return merge_results(results)
+
+
+def merge_results(results):
+    """
+    Merges results of processes to one.
+    """
+    merged = LoadResult()
+    for result in results:
+        merged.merge(result)
+    return merged
+
+
+def print_progress(result):
+    """
+    Prints the progress of a running load test to the standard error.
+    """
+    latency = result.histogram.summarize()
+    line = "Progress: %d requests, %.1f req/s" % (result.count_requests(),
+                                                 result.get_throughput())
+    if latency['count']:
+        line += ", p50 %.3f ms, p99 %.3f ms" % (latency['p50'], latency['p99'])
+    sys.stderr.write(line + "\n")
+    sys.stderr.flush()
+
+
+def print_latency(title, latency):
+    """
+    Prints the latency summary in milliseconds.
+    """
+    if latency['count']:
+        print("%s: min %.3f, mean %.3f, p50 %.3f, p90 %.3f, p99 %.3f, max %.3f"
+              % (title, latency['min'], latency['mean'], latency['p50'],
+                 latency['p90'], latency['p99'], latency['max']))
+
+
+def print_load_result(result):
+    """
+    Prints the load test result.
+    """
+    data = result.to_dict()
+    print("Requests: %d, Elapsed: %.3f s, Throughput: %.1f req/s"
+          % (data['requests'], data['elapsed'], data['throughput']))
+    print("Status Codes:")
+    for status, count in data['statuses'].items():
+        print("  %s: %d" % (status, count))
+    if data['errors']:
+        print("Errors:")
+        for name, count in data['errors'].items():
+            print("  %s: %d" % (name, count))
+    if data['assertion_failures']:
+        print("Assertion Failures: %d" % (data['assertion_failures']))
+        for name, count in data['assertions'].items():
+            print("  %s: %d" % (name, count))
+    retries = format_retry_stats(data.get('retries'))
+    if retries:
+        print(retries)
+    if 'service_time_ms' not in data:
+        print_latency("Latency (ms)", data['latency_ms'])
+        return
+    print("Late: %d, Dropped: %d" % (data['late'], data['dropped']))
+    print_latency("Latency (ms, from intended time)", data['latency_ms'])
+    print_latency("Service Time (ms)", data['service_time_ms'])
@@ -0,0 +1,340 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import random
+import re
+import signal
+import socket
+import sys
+from http.client import responses as REASONS
+
+from archive import get_route, get_template_path, SKIPPED_HEADERS
+from load import can_fork
+
+# Variables in URI templates. Ex: {user_id} or {{TENANT_ID}}
+VARIABLE_PATTERN = re.compile(r'{{?[^/{}]*}}?')
+# Bytes of request headers which a request can have.
+MAX_HEAD_SIZE = 64 * 1024
+NOT_FOUND_BODY = b'{"error": "No API is matched."}'
+MOCK_TOKEN = 'mock-token'
+
+
+def make_response(status, headers, body):
+    """
+    Encodes a response once to send it many times.
+    Returns the head without the last line and the body.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    lines = ['HTTP/1.1 %d %s' % (status, REASONS.get(status, 'Unknown'))]
+    for key, value in headers:
+        if key and key.lower() not in SKIPPED_HEADERS:
+            lines.append('%s: %s' % (key, value))
+    lines.append('Content-Length: %d' % (len(body)))
+    return ('\r\n'.join(lines) + '\r\n').encode('latin-1'), body
+
+
+class MockRouter:
+    """
+    Responses matched by the method and the URI.
+    Recorded URIs are matched first, then API templates.
+    A template with more fixed segments is matched first.
+    """
+    def __init__(self):
+        # {'METHOD uri': response}
+        self.exact = {}
+        # {(method, segment count): [(segments, response)]} Variable segments are None.
+        self.templates = {}
+        self.not_found = make_response(404, [('Content-Type', 'application/json')],
+                                       NOT_FOUND_BODY)
+
+    def add_exact(self, method, uri, response):
+        self.exact['%s %s' % (method, uri)] = response
+
+    def add_template(self, method, template_path, response):
+        """
+        Adds the response of the API. A template without variables is matched exactly.
+        """
+        if not VARIABLE_PATTERN.search(template_path):
+            self.exact.setdefault('%s %s' % (method, template_path), response)
+            return
+        segments = tuple(None if VARIABLE_PATTERN.search(segment) else segment
+                         for segment in template_path.split('/'))
+        candidates = self.templates.setdefault((method, len(segments)), [])
+        if any(segments == added for added, _ in candidates):
+            return
+        candidates.append((segments, response))
+        candidates.sort(key=lambda candidate: -sum(1 for s in candidate[0] if s is not None))
+
+    def match(self, method, target):
+        """
+        Matches the request and returns the response (head, body).
+        """
+        response = self.exact.get('%s %s' % (method, target))
+        if response is not None:
+            return response
+        path = target.split('?')[0]
+        response = self.exact.get('%s %s' % (method, path))
+        if response is not None:
+            return response
+
+        segments = path.split('/')
+        for template, response in self.templates.get((method, len(segments)), ()):
+            for expected, segment in zip(template, segments):
+                if expected is not None and expected != segment:
+                    break
+            else:
+                return response
+        return self.not_found
+
+
+def build_router(apis, examples, end_point_var, path_vars=None, archive_path=None,
+                 auth_uri=None, token_title=None):
+    """
+    Builds the router of APIs.
+    A API responds its latest recording in the archive, its saved example,
+    or 200 with an empty JSON object.
+    """
+    from archive import load_latest_records
+
+    uris, routes = {}, {}
+    if archive_path:
+        uris, routes = load_latest_records(archive_path)
+
+    router = MockRouter()
+    for key, (meta, body) in uris.items():
+        method, uri = key.split(' ', 1)
+        router.add_exact(method, uri, make_response(meta['status'], meta['headers'], body))
+
+    if auth_uri and token_title:
+        router.add_exact('POST', get_template_path(auth_uri, ''),
+                         make_response(201, [('Content-Type', 'application/json'),
+                                             (token_title, MOCK_TOKEN)], '{}'))
+
+    for index, api in enumerate(apis):
+        method = api.get_method()
+        template_path = get_template_path(api.get_uri(), end_point_var, path_vars)
+        route = get_route(method, template_path)
+        example = examples[index] if index < len(examples) else None
+        if route in routes:
+            meta, body = routes[route]
+            response = make_response(meta['status'], meta['headers'], body)
+        elif example is not None:
+            response = make_response(*example)
+        else:
+            response = make_response(200, [('Content-Type', 'application/json')], '{}')
+        router.add_template(method, template_path, response)
+    return router
+
+
+def parse_latency(value):
+    """
+    Parses the latency, MS or MIN-MAX milliseconds, to (min, max) seconds.
+    """
+    if not value:
+        return None
+    low, _, high = str(value).partition('-')
+    low = float(low) / 1000.0
+    high = float(high) / 1000.0 if high else low
+    if low < 0 or high < low:
+        raise ValueError("Invalid latency! latency: %s" % (value))
+    return low, high
+
+
+class MockProtocol(asyncio.Protocol):
+    """
+    HTTP/1.1 connection of the mock server.
+    Keep-alive and pipelined requests are supported. Responses are sent in the request order.
+    """
+    def __init__(self, router, latency=None, generator=None):
+        self.router = router
+        self.latency = latency
+        self.generator = generator
+        self.transport = None
+        self.buffer = bytearray()
+        self.ready_at = 0
+        self.closed = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.closed = True
+
+    def data_received(self, data):
+        self.buffer += data
+        while not self.closed:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end < 0:
+                if len(self.buffer) > MAX_HEAD_SIZE:
+                    self.reject()
+                return
+            try:
+                request = self.parse_head(end)
+            except ValueError:
+                self.reject()
+                return
+            if request is None:
+                return
+            method, target, close = request
+            self.respond(method, target, close)
+
+    def parse_head(self, end):
+        """
+        Parses the request at the start of the buffer and removes it.
+        Returns the method, the target and whether to close, or None if the body is not received.
+        """
+        lines = bytes(self.buffer[:end]).decode('latin-1').split('\r\n')
+        method, target, version = lines[0].split(' ')
+        close = version == 'HTTP/1.0'
+        length = 0
+        chunked = False
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding':
+                chunked = 'chunked' in value
+            elif name == 'connection':
+                close = value == 'close' or close and value != 'keep-alive'
+
+        start = end + 4
+        if chunked:
+            size = self.find_chunked_end(start)
+            if size is None:
+                return None
+        else:
+            if len(self.buffer) < start + length:
+                return None
+            size = start + length
+        del self.buffer[:size]
+        return method, target, close
+
+    def find_chunked_end(self, position):
+        """
+        Finds the end of the chunked body from the position, or None if it is not received.
+        """
+        while True:
+            line_end = self.buffer.find(b'\r\n', position)
+            if line_end < 0:
+                return None
+            chunk_size = int(bytes(self.buffer[position:line_end]).split(b';')[0], 16)
+            if chunk_size == 0:
+                end = self.buffer.find(b'\r\n\r\n', line_end)
+                if end < 0:
+                    return None
+                return end + 4
+            position = line_end + 2 + chunk_size + 2
+            if position > len(self.buffer):
+                return None
+
+    def respond(self, method, target, close):
+        head, body = self.router.match(method, target)
+        data = head + (b'Connection: close\r\n\r\n' if close else b'\r\n')
+        if method != 'HEAD':
+            data += body
+
+        loop = asyncio.get_event_loop()
+        if self.latency is not None:
+            self.ready_at = max(self.ready_at, loop.time() + self.generator.uniform(*self.latency))
+        if self.ready_at > loop.time():
+            # Keeps the order of pipelined responses.
+            loop.call_at(self.ready_at, self.send, data, close)
+        else:
+            self.send(data, close)
+        if close:
+            self.closed = True
+
+    def send(self, data, close):
+        if self.transport.is_closing():
+            return
+        self.transport.write(data)
+        if close:
+            self.transport.close()
+
+    def reject(self):
+        head, body = make_response(400, [], b'')
+        self.send(head + b'Connection: close\r\n\r\n', True)
+        self.closed = True
+
+
+def run_worker(sock, router, latency, seed):
+    """
+    Serves connections accepted from the listening socket until it is stopped.
+    """
+    generator = random.Random(seed)
+
+    async def serve():
+        loop = asyncio.get_event_loop()
+        server = await loop.create_server(lambda: MockProtocol(router, latency, generator),
+                                          sock=sock)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def create_socket(host, port):
+    """
+    Creates the listening socket shared by workers.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def serve_mock(router, host='127.0.0.1', port=8080, latency=None, workers=1):
+    """
+    Serves the router by worker processes sharing the listening socket.
+    Where processes can't be forked, one worker serves it.
+    """
+    if workers > 1 and not can_fork():
+        sys.stderr.write("Processes can't be forked on this platform. "
+                         "The mock server runs in one process.\n")
+        workers = 1
+    sock = create_socket(host, port)
+    sys.stderr.write("Mock server: http://%s:%d (%d workers)\n"
+                     % (host, sock.getsockname()[1], workers))
+    children = []
+    for i in range(1, workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            run_worker(sock, router, latency, i)
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        run_worker(sock, router, latency, 0)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        sock.close()
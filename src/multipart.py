@@ -0,0 +1,120 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import binascii
+import os
+import time
+
+# Bytes to read at once by iterating.
+READ_SIZE = 64 * 1024
+
+
+class MultipartFile:
+    """
+    Multipart body of a file read from the disk by chunks.
+    The length is known before sending, so Content-Length is set
+    and the whole file is never loaded in memory.
+    """
+    boundary = None
+    parts = None
+    length = 0
+    handle = None
+    start = None
+    end = None
+    def __init__(self, title, path, content_type="application/x-binary"):
+        self.boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
+        head = ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                'Content-Type: %s\r\n\r\n'
+                % (self.boundary, title, path, content_type)).encode('utf-8')
+        tail = ('\r\n--%s--\r\n' % (self.boundary)).encode('utf-8')
+
+        size = 0
+        if path:
+            self.handle = open(path, 'rb')
+            size = os.fstat(self.handle.fileno()).st_size
+        self.length = len(head) + size + len(tail)
+        # Parts not read yet.
+        self.parts = [head, self.handle, tail]
+        self.start = None
+        self.end = None
+
+    def get_content_type(self):
+        """
+        Gets Content-Type header value having the boundary.
+        """
+        return 'multipart/form-data; boundary=%s' % (self.boundary)
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        """
+        Reads next bytes of the body.
+        """
+        if self.start is None:
+            self.start = time.perf_counter()
+        if size is None or size < 0:
+            size = self.length
+
+        chunks = []
+        while size > 0 and self.parts:
+            part = self.parts[0]
+            if part is None:
+                self.parts.pop(0)
+                continue
+            if isinstance(part, bytes):
+                chunk = part[:size]
+                if len(chunk) < len(part):
+                    self.parts[0] = part[len(chunk):]
+                else:
+                    self.parts.pop(0)
+            else:
+                chunk = part.read(size)
+                if not chunk:
+                    self.parts.pop(0)
+                    continue
+            chunks.append(chunk)
+            size -= len(chunk)
+
+        if not self.parts and self.end is None:
+            self.end = time.perf_counter()
+        return b''.join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def get_elapsed(self):
+        """
+        Gets seconds taken to read all the body.
+        """
+        if self.start is None:
+            return 0
+        return (self.end or time.perf_counter()) - self.start
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        if self.handle is not None:
+            self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
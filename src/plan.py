@@ -0,0 +1,264 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import re
+
+# Path parameters filled by command line parameters in order. Ex: {user_id}
+PATH_PARAMETER_PATTERN = re.compile(r'({[^/]*})')
+# Bytes of a request body file kept in memory. A larger file is streamed from the disk.
+BODY_SIZE_LIMIT = 1024 * 1024
+# Bytes of a request body file read at once when it is streamed.
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+def load_environment(path):
+    """
+    Loads variables of the Postman environment file as {name: value}.
+    Disabled variables are skipped. A JSON object of names and values is also accepted.
+    """
+    with open(path, 'r', encoding='utf-8') as handle:
+        environment = json.load(handle)
+    if 'values' not in environment:
+        return {str(key): value for key, value in environment.items()}
+    return {item['key']: item.get('value', '') for item in environment['values']
+            if item.get('enabled', True) and item.get('key')}
+
+
+def load_variables(config):
+    """
+    Loads variables of the configuration as {placeholder: value}.
+    Variables of the environment_file are {{name}}, and keys of path_vars are used as they are.
+    path_vars override the environment, and end_point_var is always the end point.
+    """
+    values = {}
+    if config.get('environment_file'):
+        for name, value in load_environment(config['environment_file']).items():
+            values['{{%s}}' % (name)] = value
+    if config.get('path_vars'):
+        values.update(json.loads(config['path_vars']))
+    if config.get('end_point_var'):
+        values[config['end_point_var']] = config['end_point']
+    return Variables({key: value if isinstance(value, str) else json.dumps(value)
+                      for key, value in values.items()})
+
+
+class Variables:
+    """
+    Values of variables by placeholders. All placeholders are substituted by one pass.
+    """
+    values = None
+    pattern = None
+    bytes_values = None
+    bytes_pattern = None
+    # Bytes of the longest placeholder.
+    max_length = 0
+    def __init__(self, values):
+        self.values = values
+        self.pattern = None
+        self.bytes_values = {key.encode('utf-8'): value.encode('utf-8')
+                             for key, value in values.items()}
+        self.bytes_pattern = None
+        self.max_length = max([len(key) for key in self.bytes_values] or [0])
+        if values:
+            # The longest placeholder is matched first.
+            keys = sorted(values, key=len, reverse=True)
+            self.pattern = re.compile('|'.join(re.escape(key) for key in keys))
+            keys = sorted(self.bytes_values, key=len, reverse=True)
+            self.bytes_pattern = re.compile(b'|'.join(re.escape(key) for key in keys))
+
+    def substitute(self, text):
+        """
+        Substitutes placeholders in the text.
+        """
+        if self.pattern is None or not text:
+            return text
+        return self.pattern.sub(lambda match: self.values[match.group(0)], text)
+
+    def substitute_bytes(self, data):
+        """
+        Substitutes placeholders in bytes. Bytes which are not UTF-8 are kept as they are.
+        """
+        if self.bytes_pattern is None or not data:
+            return data
+        return self.bytes_pattern.sub(lambda match: self.bytes_values[match.group(0)], data)
+
+    def substitute_chunks(self, chunks):
+        """
+        Substitutes placeholders in chunks of bytes.
+        The tail of a chunk which can be the start of a placeholder is carried over to the
+        next chunk, so the result is the same as substituting the whole bytes.
+        """
+        if self.bytes_pattern is None:
+            yield from chunks
+            return
+        # Bytes carried over. A placeholder starting before them is in the chunk entirely.
+        keep = self.max_length - 1
+        rest = b''
+        for chunk in chunks:
+            data = rest + chunk
+            cut = len(data) - keep
+            parts = []
+            position = 0
+            for match in self.bytes_pattern.finditer(data):
+                if match.start() >= cut:
+                    break
+                parts.append(data[position:match.start()])
+                parts.append(self.bytes_values[match.group(0)])
+                position = match.end()
+            end = max(position, cut)
+            parts.append(data[position:end])
+            rest = data[end:]
+            data = b''.join(parts)
+            if data:
+                yield data
+        if rest:
+            yield self.substitute_bytes(rest)
+
+
+class RequestPlan:
+    """
+    Request of a API compiled once to send it many times.
+    Variables are substituted in the URI and headers, and the URI is split to literal parts
+    and path parameter slots, so resolving a request parses and substitutes nothing.
+    It has the methods of Api used to request, so it can be used in place of the API.
+    """
+    __slots__ = ('api', 'method', 'uri_parts', 'headers', 'route')
+    def __init__(self, api, variables):
+        self.api = api
+        self.method = api.get_method()
+        uri = variables.substitute(api.get_uri().split('?')[0])
+        # Even items are literals and odd items are path parameters.
+        self.uri_parts = PATH_PARAMETER_PATTERN.split(uri)
+        self.headers = {key: variables.substitute(value)
+                        for key, value in api.get_headers().items()}
+        self.route = None
+
+    def get_name(self):
+        return self.api.get_name()
+
+    def get_method(self):
+        return self.method
+
+    def get_uri(self):
+        return self.api.get_uri()
+
+    def get_headers(self):
+        """
+        Gets a copy of headers to add the token.
+        """
+        return dict(self.headers)
+
+    def get_folder_name(self):
+        return self.api.get_folder_name()
+
+    def get_route(self):
+        """
+        Gets the route of the API in archives, 'METHOD template'.
+        """
+        if self.route is None:
+            from archive import get_route, get_template_path
+            self.route = get_route(self.method, get_template_path(''.join(self.uri_parts), ''))
+        return self.route
+
+    def resolve(self, parameters):
+        """
+        Fills path parameters by parameters in order.
+        The next parameter is the query if it has '=', and the next one is the body file.
+        Returns the URI and the body file.
+        """
+        count = min(len(parameters), len(self.uri_parts) // 2)
+        if count:
+            parts = list(self.uri_parts)
+            for i in range(count):
+                parts[i * 2 + 1] = parameters[i]
+            uri = ''.join(parts)
+        else:
+            uri = ''.join(self.uri_parts)
+
+        if len(parameters) > count and parameters[count].find('=') > 0:
+            uri += '?' + parameters[count]
+            count += 1
+
+        body_file = None
+        if len(parameters) > count:
+            body_file = parameters[count]
+        return uri, body_file
+
+
+class RequestPlans:
+    """
+    Request plans of APIs and request bodies compiled by the configuration.
+    They are compiled at the first use and reused by all requests.
+    """
+    config = None
+    variables = None
+    postman = None
+    # {API index: RequestPlan}
+    plans = None
+    # {absolute path: ((size, mtime), body)}
+    bodies = None
+    def __init__(self, config):
+        self.config = config
+        self.variables = load_variables(config)
+        self.postman = None
+        self.plans = {}
+        self.bodies = {}
+
+    def get_plan(self, postman, api_id):
+        """
+        Gets the plan of the API ID. Plans are cached by the index of the API,
+        and compiled again for another Postman.
+        """
+        if postman is not self.postman:
+            self.postman = postman
+            self.plans = {}
+        index = postman.find_index(api_id)
+        if index == -1:
+            # Prints the error and exits.
+            postman.get_api(api_id)
+        plan = self.plans.get(index)
+        if plan is None:
+            plan = RequestPlan(postman.get_api(index), self.variables)
+            self.plans[index] = plan
+        return plan
+
+    def get_body(self, path):
+        """
+        Gets the request body file with variables substituted as bytes.
+        It is read again only if the file is changed.
+        Returns None if the file is larger than BODY_SIZE_LIMIT, so it is streamed by iter_body().
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        cached = self.bodies.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if stat.st_size > BODY_SIZE_LIMIT:
+            return None
+        with open(path, 'rb') as handle:
+            body = self.variables.substitute_bytes(handle.read())
+        self.bodies[path] = (key, body)
+        return body
+
+    def iter_body(self, path, chunk_size=BODY_CHUNK_SIZE):
+        """
+        Reads the request body file by chunks with variables substituted.
+        It is used for a file too large to keep in memory.
+        """
+        with open(path, 'rb') as handle:
+            yield from self.variables.substitute_chunks(
+                iter(lambda: handle.read(chunk_size), b''))
@@ -12,93 +12,462 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
+import bisect
+import glob
+import hashlib
+import os
+import re
 import sys
 
-from api import ApiV1, ApiV2
+from api import ApiV1, ApiV2, ApiRecord
+from catalog import (get_catalog_key, get_catalog_path, load_catalog, load_file, save_catalog,
+                     save_file, to_record)
+from json_stream import JsonReader
 
-def create_postman(path):
+# Fields read for APIs. The others like example responses and scripts are skipped.
+FOLDER_FIELDS = ('id', 'name')
+REQUEST_V1_FIELDS = ('name', 'method', 'url', 'rawModeData', 'folder', 'tests')
+ITEM_FIELDS = ('name', 'request', 'item', 'event')
+
+GLOB_PATTERN = re.compile(r'[*?[]')
+# API IDs of merged collections. Ex: compute:12
+API_ID_PATTERN = re.compile(r'^(.+):(\d+)$')
+
+def create_postman(path, use_cache=True, rebuild_cache=False):
     """
     Creates a Postman instance.
+    Uses the compiled catalog next to the Postman file if it is up to date.
     """
-    # Opens root_json file
+    key = None
+    if use_cache:
+        key = get_catalog_key(path)
+        if not rebuild_cache:
+            records = load_catalog(path, key)
+            if records is not None:
+                return PostmanCatalog(records, path, key)
+
+    # Reads only the fields used by APIs.
     with open(path, 'r') as handle:
-        root_json = json.load(handle)
-        
+        root_json = read_root_json(handle)
+
     if 'requests' in root_json:
-        return PostmanV1(root_json)
+        postman = PostmanV1(root_json)
     else: 
-        return PostmanV2(root_json)
+        postman = PostmanV2(root_json)
+    postman.path = path
+    postman.catalog_key = key
+
+    if use_cache:
+        save_catalog(path, key, postman)
+    return postman
+
+
+def is_postman_group(postman_file):
+    """
+    Checks the postman_file configuration is a list or a glob pattern of Postman files.
+    """
+    return isinstance(postman_file, list) or GLOB_PATTERN.search(postman_file) is not None
+
+
+def find_postman_files(postman_file):
+    """
+    Finds Postman files of the postman_file configuration.
+    It is a path, a glob pattern or a list of them. Matched files are sorted by name.
+    """
+    patterns = postman_file if isinstance(postman_file, list) else [postman_file]
+    paths = []
+    for pattern in patterns:
+        if GLOB_PATTERN.search(pattern):
+            matched = sorted(glob.glob(pattern))
+        else:
+            matched = [pattern]
+        for path in matched:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def get_postman_key(postman_file):
+    """
+    Gets the key to check the Postman files of the postman_file configuration are changed.
+    """
+    return tuple((path, get_catalog_key(path)) for path in find_postman_files(postman_file))
+
+
+def get_collection_names(paths):
+    """
+    Gets unique collection names of API IDs from the file names.
+    Ex: compute.postman_collection.json is compute.
+    """
+    names = []
+    for path in paths:
+        base = os.path.basename(path).split('.')[0] or 'collection'
+        name = base
+        suffix = 2
+        while name in names:
+            name = '%s%d' % (base, suffix)
+            suffix += 1
+        names.append(name)
+    return names
+
+
+def get_group_path(paths):
+    """
+    Gets the base path of the merged catalog and the search index of the Postman files.
+    """
+    absolute_paths = [os.path.abspath(path) for path in paths]
+    digest = hashlib.sha1('\n'.join(absolute_paths).encode()).hexdigest()[:12]
+    return os.path.join(os.path.dirname(absolute_paths[0]), '.postman-%s' % digest)
+
+
+def compile_records(path, use_cache=True):
+    """
+    Parses the Postman file to catalog records.
+    The records are saved as the catalog of the file if use_cache.
+    """
+    key = get_catalog_key(path)
+    records = [to_record(api) for api in create_postman(path, False)]
+    if use_cache:
+        save_file(get_catalog_path(path), key, records)
+    return records
+
+
+def load_record_lists(paths, use_cache=True, rebuild_cache=False):
+    """
+    Loads catalog records of each Postman file.
+    Only files without the up to date catalog are parsed, in parallel processes if many.
+    """
+    record_lists = [None] * len(paths)
+    stale = []
+    for i, path in enumerate(paths):
+        if use_cache and not rebuild_cache:
+            record_lists[i] = load_catalog(path, get_catalog_key(path))
+        if record_lists[i] is None:
+            stale.append(i)
+
+    stale_paths = [paths[i] for i in stale]
+    compiled = None
+    workers = min(len(stale), os.cpu_count() or 1)
+    if workers > 1:
+        # Parsing is CPU bound, so processes are used instead of threads.
+        from concurrent.futures import ProcessPoolExecutor
+        try:
+            with ProcessPoolExecutor(workers) as executor:
+                compiled = list(executor.map(compile_records, stale_paths,
+                                             [use_cache] * len(stale)))
+        except (OSError, NotImplementedError):
+            # Processes are not available on the platform.
+            compiled = None
+    if compiled is None:
+        compiled = [compile_records(path, use_cache) for path in stale_paths]
+
+    for i, records in zip(stale, compiled):
+        record_lists[i] = records
+    return record_lists
+
+
+def load_postman(postman_file, use_cache=True, rebuild_cache=False):
+    """
+    Loads the Postman files of the postman_file configuration.
+    A list or a glob pattern of files is merged into a PostmanGroup.
+    The merged catalog is cached, so only changed collections are parsed again.
+    """
+    if not is_postman_group(postman_file):
+        return create_postman(postman_file, use_cache, rebuild_cache)
+
+    paths = find_postman_files(postman_file)
+    if len(paths) == 0:
+        print("No Postman file is FOUND! postman_file: %s" % (postman_file,))
+        sys.exit(1)
+
+    names = get_collection_names(paths)
+    group_path = get_group_path(paths)
+    key = None
+    if use_cache:
+        key = tuple(zip(names, [get_catalog_key(path) for path in paths]))
+        if not rebuild_cache:
+            record_lists = load_file(get_catalog_path(group_path), key)
+            if record_lists is not None:
+                return PostmanGroup(names, record_lists, group_path, key)
+
+    record_lists = load_record_lists(paths, use_cache, rebuild_cache)
+    if use_cache:
+        save_file(get_catalog_path(group_path), key, record_lists)
+    return PostmanGroup(names, record_lists, group_path, key)
+
+
+def prune(value, fields):
+    """
+    Keeps only the fields of the object.
+    """
+    if not isinstance(value, dict):
+        return value
+    return {key: value[key] for key in fields if key in value}
+
+
+def prune_item(item):
+    """
+    Keeps only the name, the request, events and sub items of the version 2 item.
+    """
+    pruned = prune(item, ITEM_FIELDS)
+    if 'item' in pruned:
+        pruned['item'] = [prune_item(child) for child in pruned['item']]
+    return pruned
+
+
+def read_folders(reader):
+    """
+    Reads the version 2 folders.
+    Each item in the folders is read at once and pruned,
+    so only a item with its example responses is in memory at a time.
+    """
+    folders = []
+    for _ in reader.iter_array():
+        folder = {}
+        for key in reader.iter_object():
+            if key == 'item':
+                folder['item'] = [prune_item(reader.read_value()) for _ in reader.iter_array()]
+            elif key in ITEM_FIELDS:
+                folder[key] = reader.read_value()
+            else:
+                reader.skip_value()
+        folders.append(folder)
+    return folders
+
+
+def read_root_json(handle):
+    """
+    Reads the Postman JSON file incrementally.
+    Only the fields used by APIs are kept, so example responses don't take memory.
+    """
+    reader = JsonReader(handle)
+    root_json = {}
+    for key in reader.iter_object():
+        if key == 'folders':
+            root_json['folders'] = [prune(reader.read_value(), FOLDER_FIELDS)
+                                    for _ in reader.iter_array()]
+        elif key == 'requests':
+            root_json['requests'] = [prune(reader.read_value(), REQUEST_V1_FIELDS)
+                                     for _ in reader.iter_array()]
+        elif key == 'item':
+            root_json['item'] = read_folders(reader)
+        else:
+            reader.skip_value()
+    return root_json
+
+def to_example(response):
+    """
+    Converts a saved example response of version 1 or 2 to (status, headers, body).
+    """
+    if not isinstance(response, dict):
+        return None
+    status = response.get('code')
+    if status is None:
+        status = (response.get('responseCode') or {}).get('code', 200)
+    headers = [(header.get('key', header.get('name')), header.get('value'))
+               for header in response.get('header') or response.get('headers') or []
+               if isinstance(header, dict)]
+    body = response.get('body')
+    if body is None:
+        body = response.get('text')
+    return int(status), headers, body or ''
+
+
+def read_examples(handle):
+    """
+    Reads the first saved example response of each API in the index order.
+    Examples are read one by one, so only one API is in memory at a time.
+    """
+    reader = JsonReader(handle)
+    examples = []
+    for key in reader.iter_object():
+        if key == 'requests':
+            for _ in reader.iter_array():
+                responses = reader.read_value().get('responses') or [None]
+                examples.append(to_example(responses[0]))
+        elif key == 'item':
+            for _ in reader.iter_array():
+                for folder_key in reader.iter_object():
+                    if folder_key != 'item':
+                        reader.skip_value()
+                        continue
+                    for _ in reader.iter_array():
+                        responses = reader.read_value().get('response') or [None]
+                        examples.append(to_example(responses[0]))
+        else:
+            reader.skip_value()
+    return examples
+
+
+def load_examples(postman_file):
+    """
+    Loads saved example responses of the Postman files in the index order of load_postman().
+    """
+    examples = []
+    paths = [postman_file]
+    if is_postman_group(postman_file):
+        paths = find_postman_files(postman_file)
+    for path in paths:
+        with open(path, 'r') as handle:
+            examples.extend(read_examples(handle))
+    return examples
+
 
 class Postman:
     """
     Postman interface.
+    Flattens all APIs once so that lookups by index are O(1).
     """
-    def get_api(self, index):
+    apis = None
+    # The Postman file and its catalog key. The key is None if not cached.
+    path = None
+    catalog_key = None
+    # Built by search.get_search_index() when it is needed.
+    search_index = None
+    def __init__(self):
+        self.apis = []
+
+    def find_index(self, api_id):
         """
-        Gets a API by index number.
+        Finds the index of the API ID. Returns -1 if it is not found.
         """
-        pass
-            
+        try:
+            index = int(api_id)
+        except (TypeError, ValueError):
+            return -1
+        if 0 <= index < len(self.apis):
+            return index
+        return -1
+
+    def get_id(self, index):
+        """
+        Gets the API ID of the index shown to users.
+        """
+        return index
+
+    def get_collection_name(self, index):
+        """
+        Gets the collection name of the API. It is the name of the Postman file.
+        """
+        if not self.path:
+            return ''
+        return get_collection_names([self.path])[0]
+
+    def get_api(self, api_id):
+        """
+        Gets a API by the API ID or the index number.
+        """
+        index = self.find_index(api_id)
+        if index == -1:
+            print("The index is not FOUND! Total: %s" %(len(self.apis)))
+            sys.exit(1)
+        return self.apis[index]
+
     def count_apis(self):
         """
         Counts APIs.
         """
-        pass
+        return len(self.apis)
+
+    def __iter__(self):
+        """
+        Iterates APIs in index order.
+        """
+        return iter(self.apis)
+
+    def __len__(self):
+        return len(self.apis)
     
 
             
 class PostmanV1(Postman):
     """
     Postman version 1
+    APIs are kept as records, not the JSON. Test scripts are parsed to assertions once.
     """
-    root_json = None
     def __init__(self, root_json):
-        self.root_json = root_json
-    
-    def get_api(self, index):
-        index = int(index)
-        if len(self.root_json['requests']) >= index:
-            request = self.root_json['requests'][index]
-            if 'folder' in request:
-                for folder in self.root_json['folders']:
-                    if folder['id'] == request['folder']:
-                        folder_name = folder['name']
-            return ApiV1(request, folder_name)
-        else:
-            print("The index is not FOUND! index: %s" %(index))
-            sys.exit(1)
-            
-    def count_apis(self):
-        return len(self.root_json['requests'])
+        Postman.__init__(self)
+        from assertions import parse_postman_tests
+
+        # Resolves folder names once.
+        folder_names = {}
+        for folder in root_json.get('folders', []):
+            folder_names[folder['id']] = folder['name']
+
+        for request in root_json['requests']:
+            folder_name = folder_names.get(request.get('folder'), '')
+            api = ApiV1(request, folder_name)
+            api.assertions = parse_postman_tests(api.get_test_script())
+            self.apis.append(ApiRecord(to_record(api)))
     
 class PostmanV2(Postman):
     """
     Postman version 2
+    APIs are kept as records, not the JSON. Test scripts are parsed to assertions once.
     """
-    root_json = None
-    count = 0
     def __init__(self, root_json):
-        self.root_json = root_json
-        # Counts APIs.
-        self.count = 0
-        for i in range(0, len(self.root_json['item'])):
-            folder = self.root_json['item'][i]
-            self.count += len(folder['item'])
-    
-    def get_api(self, index):
-        index = int(index)
-        if index >= self.count:
-            print("The index is not FOUND! Total: %s" %(self.count))
-            sys.exit(1)
-        else:
-            cnt = 0
-            for i in range(0, len(self.root_json['item'])):
-                folder = self.root_json['item'][i]
-                for j in range(0, len(folder['item'])):
-                    if cnt == index:
-                        return ApiV2(folder['item'][j], folder['name'])
-                    cnt += 1
-            
-    def count_apis(self):
-        return self.count
\ No newline at end of file
+        Postman.__init__(self)
+        from assertions import parse_postman_tests
+
+        # Flattens folders and items.
+        for folder in root_json['item']:
+            for item in folder['item']:
+                api = ApiV2(item, folder['name'])
+                api.assertions = parse_postman_tests(api.get_test_script())
+                self.apis.append(ApiRecord(to_record(api)))
+
+
+class PostmanCatalog(Postman):
+    """
+    Postman loaded from the compiled catalog.
+    """
+    def __init__(self, records, path=None, catalog_key=None):
+        Postman.__init__(self)
+        self.apis = [ApiRecord(record) for record in records]
+        self.path = path
+        self.catalog_key = catalog_key
+
+
+class PostmanGroup(Postman):
+    """
+    Postman files merged into one catalog.
+    APIs are indexed in file order, and their IDs are collection:index.
+    """
+    def __init__(self, names, record_lists, path=None, catalog_key=None):
+        Postman.__init__(self)
+        self.names = names
+        # (start, count) of each collection.
+        self.ranges = {}
+        self.starts = []
+        for name, records in zip(names, record_lists):
+            self.ranges[name] = (len(self.apis), len(records))
+            self.starts.append(len(self.apis))
+            self.apis.extend(ApiRecord(record) for record in records)
+        self.path = path
+        self.catalog_key = catalog_key
+
+    def find_index(self, api_id):
+        match = API_ID_PATTERN.match(str(api_id))
+        if match is None:
+            return Postman.find_index(self, api_id)
+        name, local_index = match.group(1), int(match.group(2))
+        if name not in self.ranges:
+            return -1
+        start, count = self.ranges[name]
+        if local_index >= count:
+            return -1
+        return start + local_index
+
+    def find_collection(self, index):
+        """
+        Finds the position of the collection having the index.
+        """
+        # The last collection starting at or before the index. Empty ones are skipped.
+        return bisect.bisect_right(self.starts, index) - 1
+
+    def get_id(self, index):
+        i = self.find_collection(index)
+        return '%s:%d' % (self.names[i], index - self.starts[i])
+
+    def get_collection_name(self, index):
+        return self.names[self.find_collection(index)]
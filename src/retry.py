@@ -0,0 +1,313 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import threading
+import time
+
+from stats import Histogram
+
+# Methods retried by default. Others can change the server state twice.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+DEFAULT_RETRY_STATUSES = (429, 502, 503, 504)
+DEFAULT_BACKOFF_MS = 100
+DEFAULT_MAX_BACKOFF_MS = 10000
+# Seconds of Retry-After to wait at most. A response asking longer is returned.
+DEFAULT_MAX_RETRY_AFTER = 30
+DEFAULT_HEDGE_PERCENTILE = 95
+# Latencies of a URI needed to hedge by its percentile.
+HEDGE_MIN_SAMPLES = 20
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parses the Retry-After header, seconds or a HTTP date, to seconds to wait.
+    Returns None if it is not valid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    from email.utils import parsedate_to_datetime
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    return max(date.timestamp() - (now if now is not None else time.time()), 0.0)
+
+
+def merge_counts(counts, other):
+    """
+    Adds counts of the other dictionary. Nested dictionaries are added too.
+    """
+    for key, value in other.items():
+        if isinstance(value, dict):
+            merge_counts(counts.setdefault(key, {}), value)
+        else:
+            counts[key] = counts.get(key, 0) + value
+    return counts
+
+
+class RetryStats:
+    """
+    Counts of retries and hedged requests.
+      retried_requests: Requests retried at least once.
+      retries: Retries by the reason, a status code or an error name.
+      exhausted: Requests failed after all attempts.
+      hedges: Hedged requests sent, and hedges_won: hedged responses received first.
+      hedge_saved_ms: Milliseconds until the first request responded after the hedged one won.
+      hedges_measured: Won hedges whose first request responded, counted in hedge_saved_ms.
+    """
+    counts = None
+    lock = None
+    def __init__(self):
+        self.counts = {'retried_requests': 0, 'retries': {}, 'exhausted': 0,
+                       'hedges': 0, 'hedges_won': 0, 'hedge_saved_ms': 0, 'hedges_measured': 0}
+        self.lock = threading.Lock()
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+    def add_retry(self, reason, first):
+        with self.lock:
+            if first:
+                self.counts['retried_requests'] += 1
+            self.counts['retries'][reason] = self.counts['retries'].get(reason, 0) + 1
+
+    def to_dict(self):
+        """
+        Converts to a JSON serializable dictionary.
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            counts['retries'] = dict(counts['retries'])
+        counts['hedge_saved_ms'] = round(counts['hedge_saved_ms'], 3)
+        return counts
+
+
+def format_retry_stats(counts):
+    """
+    Formats counts of RetryStats to a line. Returns None if nothing was retried or hedged.
+    """
+    if not counts or not counts['retries'] and not counts['hedges']:
+        return None
+    parts = []
+    if counts['retries']:
+        parts.append("Retries: %d requests retried %d times (%s), %d exhausted"
+                     % (counts['retried_requests'], sum(counts['retries'].values()),
+                        ', '.join('%s: %d' % (reason, count)
+                                  for reason, count in sorted(counts['retries'].items())),
+                        counts['exhausted']))
+    if counts['hedges']:
+        # First requests still running when the stats are printed are not measured.
+        saved = ''
+        if counts.get('hedges_measured'):
+            saved = (", %.3f ms saved on average"
+                     % (counts['hedge_saved_ms'] / counts['hedges_measured']))
+        parts.append("Hedges: %d sent, %d won%s" % (counts['hedges'], counts['hedges_won'], saved))
+    return '; '.join(parts)
+
+
+class RetryPolicy:
+    """
+    Retries failed requests with exponential backoff and jitter, and hedges slow GET requests.
+    Connection errors, timeouts, and the retry statuses are retried.
+    A hedged request is sent if the first one doesn't respond in the percentile latency
+    of the URI, and the first response is used.
+    """
+    def __init__(self, errors, attempts=1, backoff=DEFAULT_BACKOFF_MS / 1000.0,
+                 max_backoff=DEFAULT_MAX_BACKOFF_MS / 1000.0, statuses=DEFAULT_RETRY_STATUSES,
+                 all_methods=False, max_retry_after=DEFAULT_MAX_RETRY_AFTER, hedge=False,
+                 hedge_percentile=DEFAULT_HEDGE_PERCENTILE, hedge_delay=None, workers=10,
+                 generator=None):
+        self.errors = errors
+        self.attempts = max(int(attempts), 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.all_methods = all_methods
+        self.max_retry_after = max_retry_after
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.workers = workers
+        self.generator = generator or random.Random()
+        self.stats = RetryStats()
+        self.lock = threading.Lock()
+        # {'METHOD uri': Histogram} of the first requests.
+        self.latencies = {}
+        self.executor = None
+
+    def get_backoff(self, attempt):
+        """
+        Gets seconds to wait before the next attempt by exponential backoff with full jitter.
+        """
+        return self.generator.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def get_wait(self, response, attempt):
+        """
+        Gets seconds to wait before retrying the response.
+        Retry-After is honored, and None is returned if it is longer than max_retry_after.
+        """
+        wait = self.get_backoff(attempt)
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None:
+            return wait
+        if retry_after > self.max_retry_after:
+            return None
+        return max(wait, retry_after)
+
+    def call(self, method, key, send, rewind=None, hedgeable=True):
+        """
+        Calls send() and retries it by the policy. Returns the response or raises the last error.
+        rewind() is called before retrying to send the body again.
+        The request is not retried if rewind is None, and not hedged if hedgeable is False.
+        """
+        retriable = (rewind is not None and self.attempts > 1
+                     and (self.all_methods or method in IDEMPOTENT_METHODS))
+        hedge = self.hedge and hedgeable and method == 'GET'
+        attempt = 1
+        while True:
+            try:
+                response = self.send_hedged(key, send) if hedge else send()
+            except self.errors as e:
+                if not retriable or attempt >= self.attempts:
+                    if attempt > 1:
+                        self.stats.add('exhausted')
+                    raise
+                reason = type(e).__name__
+                wait = self.get_backoff(attempt)
+            else:
+                if not retriable or response.status_code not in self.statuses:
+                    return response
+                wait = None
+                if attempt < self.attempts:
+                    wait = self.get_wait(response, attempt)
+                if wait is None:
+                    if attempt > 1:
+                        self.stats.add('exhausted')
+                    return response
+                reason = str(response.status_code)
+                response.close()
+
+            self.stats.add_retry(reason, attempt == 1)
+            time.sleep(wait)
+            rewind()
+            attempt += 1
+
+    def record_latency(self, key, seconds):
+        with self.lock:
+            histogram = self.latencies.get(key)
+            if histogram is None:
+                histogram = self.latencies[key] = Histogram()
+            histogram.record(seconds)
+
+    def get_hedge_delay(self, key):
+        """
+        Gets seconds to wait before hedging the request, or None not to hedge.
+        The percentile latency of the URI is used if it has enough latencies,
+        or the hedge_delay otherwise.
+        """
+        with self.lock:
+            histogram = self.latencies.get(key)
+            if histogram is not None and histogram.count >= HEDGE_MIN_SAMPLES:
+                return histogram.get_percentile(self.hedge_percentile)
+        return self.hedge_delay
+
+    def send_hedged(self, key, send):
+        """
+        Sends the request, and a hedged one if it doesn't respond in the hedge delay.
+        The first response is returned, and the other one is closed when it is received.
+        Latencies of first requests are recorded to get the hedge delay.
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED, ThreadPoolExecutor
+
+        delay = self.get_hedge_delay(key)
+        start = time.perf_counter()
+        if delay is None:
+            response = send()
+            self.record_latency(key, time.perf_counter() - start)
+            return response
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers * 2)
+        state = {'winner_done': None}
+
+        def on_first_done(future):
+            if future.exception() is None:
+                self.record_latency(key, time.perf_counter() - start)
+                if state['winner_done'] is not None:
+                    self.stats.add('hedge_saved_ms',
+                                   (time.perf_counter() - state['winner_done']) * 1000)
+                    self.stats.add('hedges_measured')
+
+        first = self.executor.submit(send)
+        first.add_done_callback(on_first_done)
+        done, pending = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self.stats.add('hedges')
+        second = self.executor.submit(send)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = first if first in done else second
+        if winner.exception() is not None and pending:
+            # The other one can still respond.
+            winner = pending.pop()
+            winner.exception()
+        loser = second if winner is first else first
+        if winner is second:
+            state['winner_done'] = time.perf_counter()
+            self.stats.add('hedges_won')
+        loser.add_done_callback(close_response)
+        return winner.result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+def close_response(future):
+    """
+    Closes the response of the request which was not used.
+    """
+    if future.exception() is None:
+        future.result().close()
+
+
+def load_retry_policy(config, errors, pool_size):
+    """
+    Loads the retry policy of the configuration.
+    Returns None if requests are neither retried nor hedged.
+    """
+    attempts = int(config.get('retry_attempts') or 1)
+    hedge = config.get('hedge') is True
+    if attempts <= 1 and not hedge:
+        return None
+    hedge_delay = config.get('hedge_delay_ms')
+    return RetryPolicy(
+        errors, attempts,
+        float(config.get('retry_backoff_ms') or DEFAULT_BACKOFF_MS) / 1000.0,
+        float(config.get('retry_max_backoff_ms') or DEFAULT_MAX_BACKOFF_MS) / 1000.0,
+        config.get('retry_statuses') or DEFAULT_RETRY_STATUSES,
+        config.get('retry_all_methods') is True,
+        float(config.get('retry_max_after') or DEFAULT_MAX_RETRY_AFTER),
+        hedge, float(config.get('hedge_percentile') or DEFAULT_HEDGE_PERCENTILE),
+        float(hedge_delay) / 1000.0 if hedge_delay not in (None, '') else None,
+        pool_size)
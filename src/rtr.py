@@ -16,16 +16,57 @@
 # limitations under the License.
 
 import argparse
+import itertools
 import json
-import re
+import os
+import shlex
 import sys
+import threading
+import time
 
-import requests
-from requests.exceptions import ConnectionError
-import yaml
+# The HTTP stack (requests) and yaml are imported only when they are used,
+# so that commands without requests start fast.
+from auth_cache import get_expiry, get_token_key, load_token, remove_token, save_token, EXPIRY_MARGIN
+from catalog import get_catalog_key, load_file, save_file
+from json_stream import pretty_print_chunks
+from load import make_schedule, parse_stages, print_load_result, print_progress, run_closed_loop, \
+    run_open_loop, run_processes, split_count, can_fork, PROCESS_START_DELAY
+from multipart import MultipartFile
+from postman import get_postman_key, load_postman
+from search import search_apis, ALL_FIELDS, FIELD_NAME, FIELD_URI
 
-from postman import create_postman
+# Seconds to cache a token if its expiry is unknown.
+DEFAULT_AUTH_TOKEN_TTL = 600
 
+# Methods safe to request concurrently.
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+# Default concurrency to run a folder or data rows.
+DEFAULT_RUN_CONCURRENCY = 8
+# Maximum requests in flight of an open-loop load test.
+DEFAULT_OPEN_LOOP_CONCURRENCY = 32
+
+# Bytes of a chunk to stream responses.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Directory and megabytes of the GET response cache.
+DEFAULT_RESPONSE_CACHE_DIR = '.response_cache'
+DEFAULT_RESPONSE_CACHE_SIZE = 100
+
+# Suffix of the parsed configuration cache.
+CONFIG_CACHE_SUFFIX = '.cache'
+
+# Loaded by main() or the daemon.
+config = None
+# Created by get_transport().
+transport = None
+# Authentication tokens of this process. {key: (token, expiry)}
+auth_tokens = {}
+# Assertions of APIs loaded by get_assertion_rules().
+assertion_rules = None
+# Request plans compiled by get_request_plans().
+request_plans = None
+# Latencies of APIs collected for the baseline by run_command().
+latency_samples = None
 
 # Defines arguments.
 parser = argparse.ArgumentParser(description='REST Tester')
@@ -49,8 +90,62 @@ parser.add_argument("-m", "--multipart",
                     help="Request as multipart with the title.")
 parser.add_argument("-v", "--verbose", action='store_true',
                     help="Show all headers.")
+parser.add_argument("-s", "--stream", action='store_true',
+                    help="Print the response body while it is received.")
+parser.add_argument("-o", "--output",
+                    help="Save the response body to the file as it is.")
+parser.add_argument("--cache", action='store_true',
+                    help="Use the cache of GET responses revalidated by ETag or Last-Modified.")
 parser.add_argument("-c", "--config",
                     help="Use the configuration file.")
+parser.add_argument("--rebuild-cache", action='store_true',
+                    help="Rebuild the compiled catalog of the Postman file.")
+parser.add_argument("--batch",
+                    help="Request APIs of all lines in the file and print results as JSON lines.")
+parser.add_argument("--load", type=int,
+                    help="Request the API the number of times as a load test.")
+parser.add_argument("--duration", type=float,
+                    help="Request the API for the seconds as a load test.")
+parser.add_argument("--rate", type=float, metavar='RPS',
+                    help="Send requests of the load test at the fixed rate for the --duration.")
+parser.add_argument("--stages", metavar='SECONDS:RPS,...',
+                    help="Ramp the rate of the load test linearly by stages before the --rate.")
+parser.add_argument("--processes", type=int, default=1,
+                    help="Processes of the load test sharing the requests. 0 is the number of CPUs.")
+parser.add_argument("--concurrency", type=int,
+                    help="Number of concurrent workers of the load test or running APIs.")
+parser.add_argument("--data",
+                    help="Request the API for each row of the CSV or JSON lines file and write results as JSON lines.")
+parser.add_argument("--resume", action='store_true',
+                    help="Resume the data run after the last row in the --output file.")
+parser.add_argument("--run-folder",
+                    help="Request all APIs in the folder.")
+parser.add_argument("--run-all", action='store_true',
+                    help="Request all APIs in the collection.")
+parser.add_argument("--parallel-all", action='store_true',
+                    help="Request all methods concurrently when running APIs. By default only GET and HEAD.")
+parser.add_argument("--timing", action='store_true',
+                    help="Print DNS, connect, TLS, TTFB and download time of each request to the standard error.")
+parser.add_argument("--timing-format", choices=('text', 'json'), default='text',
+                    help="Print timings as text or JSON lines.")
+parser.add_argument("--baseline", choices=('save', 'compare'),
+                    help="Save latencies of APIs of the command as the baseline, or compare them with it.")
+parser.add_argument("--baseline-file",
+                    help="The baseline file. The default is baseline_file of the configuration or baseline.json.")
+parser.add_argument("--record",
+                    help="Record requests and responses to the archive file.")
+parser.add_argument("--mock", type=int, metavar='PORT',
+                    help="Serve the APIs as a mock server on the port.")
+parser.add_argument("--replay",
+                    help="Respond recordings of the archive file by the mock server.")
+parser.add_argument("--mock-latency",
+                    help="Latency of the mock server responses. MS or MIN-MAX milliseconds.")
+parser.add_argument("--mock-workers", type=int, default=1,
+                    help="Processes of the mock server.")
+parser.add_argument("--daemon", action='store_true',
+                    help="Keep the configuration, APIs, tokens and connections loaded and run commands of clients.")
+parser.add_argument("--no-daemon", action='store_true',
+                    help="Run the command in this process even if a daemon is running.")
 parser.add_argument('parameters', metavar='parameter', nargs='*',
                     help="[index] | [keyword] [path_var1 path_var2 ...] [query_params] [request_file] Index 0 is calling root.")
 
@@ -70,59 +165,58 @@ def find_by_name(postman, key):
     """
     Finds APIs by the name.
     """
-    for i in range(0, postman.count_apis()):
-        api = postman.get_api(i)
-        if re.search(key, api.get_name(), re.IGNORECASE):
-            print_api(i, api)
+    for i in search_apis(postman, key, (FIELD_NAME,), config['end_point_var']):
+        print_api(postman.get_id(i), postman.get_api(i))
 
 def find_index_by_name(postman, key):
     """
-    Finds APIs by the name.
+    Finds the best matched API by the name.
+    The API of the same name is matched first.
     """
-    for i in range(0, postman.count_apis()):
-        api = postman.get_api(i)
-        if re.search(key, api.get_name(), re.IGNORECASE):
+    lower_key = key.lower()
+    for i, api in enumerate(postman):
+        if api.get_name().lower() == lower_key:
             return i
+
+    indexes = search_apis(postman, key, (FIELD_NAME,), config['end_point_var'])
+    if indexes:
+        return indexes[0]
     return -1
         
 def find_by_uri(postman, key):
     """
     Finds APIs by the URI.
     """
-    for i in range(0, postman.count_apis()):
-        api = postman.get_api(i)
-        uri = api.get_uri().replace(config['end_point_var'], '');
-        if re.search(key, uri, re.IGNORECASE):
-            print_api(i, api)
+    for i in search_apis(postman, key, (FIELD_URI,), config['end_point_var']):
+        print_api(postman.get_id(i), postman.get_api(i))
 
         
 def find_by_all(postman, key):
     """
     Finds APIs by the all.
     """
-    for i in range(0, postman.count_apis()):
-        api = postman.get_api(i)
-        uri = api.get_uri().replace(config['end_point_var'], '');
-        if (re.search(key, uri, re.IGNORECASE) 
-            or re.search(key, api.get_name(), re.IGNORECASE) 
-            or re.search(key, api.get_request_body_sample(), re.IGNORECASE)
-            or re.search(key, api.get_folder_name(), re.IGNORECASE)):
-            print_api(i, api)
+    for i in search_apis(postman, key, ALL_FIELDS, config['end_point_var']):
+        print_api(postman.get_id(i), postman.get_api(i))
 
         
 def print_all_apis(postman):
     """
     Prints all APIs.
     """
-    for i in range(0, postman.count_apis()):
-        api = postman.get_api(i)
-        print_api(i, api)
+    for i, api in enumerate(postman):
+        print_api(postman.get_id(i), api)
 
         
-def print_response(response, verbose=False):
+def print_response(response, verbose=False, stream=False, output=None, cache_state=None):
     """
     Prints responded body.
+    If stream is set, the body is printed while it is received.
+    If output is set, the body is saved to the file as it is.
+    If cache_state is set, the cached response is marked with saved bytes.
     """
+    if cache_state:
+        sys.stderr.write("Cache: %s (%d bytes saved)\n" % (cache_state, len(response.content)))
+
     if response.status_code and verbose:
         print("Response Code: %s" % (str(response.status_code)))
         
@@ -130,6 +224,13 @@ def print_response(response, verbose=False):
         print("Response Headers:")
         for key in response.headers:
             print("%s: %s" % (key, response.headers[key]))
+
+    if output is not None:
+        save_response(response, output)
+        return
+    if stream:
+        stream_response(response, verbose)
+        return
         
     if response.text:
         if verbose:
@@ -141,237 +242,414 @@ def print_response(response, verbose=False):
         else:
             print(response.text);
 
-    
-def get_cert():
+
+def save_response(response, output):
     """
-    Returns CRT file if HTTPS is used.
+    Saves responded body to the file by chunks.
+    """
+    size = 0
+    start = time.perf_counter()
+    with open(output, 'wb') as handle:
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            handle.write(chunk)
+            size += len(chunk)
+    elapsed = time.perf_counter() - start
+    print("Saved %d bytes to %s (%.1f KB/s)"
+          % (size, output, size / 1024.0 / elapsed if elapsed > 0 else 0))
+
+
+def stream_response(response, verbose=False):
     """
-    if config['crt_file'] and config['key_file']:
-        return (config['crt_file'], config['key_file'])
+    Prints responded body by chunks.
+    JSON is pretty-printed incrementally, and others are written as they are.
+    """
+    chunks = response.iter_content(STREAM_CHUNK_SIZE)
+    first = next(chunks, b'')
+    if not first:
+        return
+    if verbose:
+        print("Response Body:")
+    sys.stdout.flush()
+
+    chunks = itertools.chain([first], chunks)
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        pretty_print_chunks(chunks, sys.stdout.write, response.encoding or 'utf-8')
     else:
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+    sys.stdout.flush()
+
+    
+def get_transport(min_pool_size=0):
+    """
+    Returns the transport shared by all requests.
+    It is created again if the pool is smaller than min_pool_size.
+    """
+    global transport
+    if transport is None or transport.pool_size < min_pool_size:
+        from transport import Transport
+        if transport is not None:
+            transport.close()
+        transport = Transport(config, min_pool_size)
+    return transport
+
+
+def get_auth_token_key(end_point):
+    """
+    Gets the cache key of the authentication token.
+    """
+    return get_token_key(end_point, config['auth_uri'], config['auth_body_file'])
+
+
+def load_auth_token(end_point):
+    """
+    Loads the cached authentication token if it is not expired.
+    Tokens of this process are kept in memory.
+    """
+    if not config['auth_uri'] or not config['auth_body_file']:
         return None
 
+    key = get_auth_token_key(end_point)
+    if key in auth_tokens:
+        token, expiry = auth_tokens[key]
+        if expiry - EXPIRY_MARGIN > time.time():
+            return token
 
-def request_auth(end_point):
+    cache_path = config.get('auth_token_cache')
+    if not cache_path:
+        return None
+    return load_token(cache_path, key)
+
+
+def save_auth_token(end_point, token, response):
+    """
+    Caches the authentication token until it is expired.
+    """
+    expiry_value = None
+    if config.get('auth_token_expiry_title'):
+        expiry_value = response.headers.get(config['auth_token_expiry_title'])
+    ttl = config.get('auth_token_ttl') or DEFAULT_AUTH_TOKEN_TTL
+    expiry = get_expiry(token, ttl, expiry_value)
+
+    key = get_auth_token_key(end_point)
+    auth_tokens[key] = (token, expiry)
+    cache_path = config.get('auth_token_cache')
+    if cache_path:
+        save_token(cache_path, key, token, expiry)
+
+
+def request_auth(end_point, refresh=False):
     """
     Authenticates user and password.
+    The token is cached, and refresh removes the cached token.
+    Raises RuntimeError if it failed, so runs of many requests can go on.
     """
     path = config['auth_body_file']
 
     if not config['auth_uri'] or not path:
         return None
+
+    if refresh:
+        auth_tokens.pop(get_auth_token_key(end_point), None)
+        if config.get('auth_token_cache'):
+            remove_token(config['auth_token_cache'], get_auth_token_key(end_point))
     
     with open(config['auth_body_file'], 'r') as handle:
         body = json.load(handle)
     
+    from requests.exceptions import ConnectionError, Timeout
     headers = {'Content-Type': 'application/json'}
     try:
-        r = requests.post(url=end_point + config['auth_uri'],
-                          headers=headers, json=body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Authentication Error: ")
-        print(e)
-        sys.exit(1)
+        r = get_transport().request('POST', url=end_point + config['auth_uri'],
+                                    name='auth', headers=headers, json=body)
+    except (ConnectionError, Timeout) as e:
+        raise RuntimeError("Authentication Error! %s" % (e))
     
     if config['auth_token_title'] in r.headers:
-        return r.headers[config['auth_token_title']]
+        token = r.headers[config['auth_token_title']]
     elif 'X-Auth-Token' in r.headers:
-        return r.headers['X-Auth-Token']
+        token = r.headers['X-Auth-Token']
     elif 'X-Subject-Token' in r.headers:
-        return r.headers['X-Subject-Token']
+        token = r.headers['X-Subject-Token']
     else:
-        print('Authentication failed.')
-        print_response(r, True)
-        sys.exit(1)
+        raise RuntimeError("Authentication failed! status: %d, body: %s" % (r.status_code, r.text))
+
+    save_auth_token(end_point, token, r)
+    return token
 
     
-def request_post(uri, headers, body_file):
+def set_content_type(method, headers, body_file):
     """
-    Requests POST uri.
+    Sets Content-Type of the request body file.
     """
-    body = None
-    if body_file:
-        with open(body_file, 'r') as handle:
-            body = json.load(handle)
+    if method == 'PATCH':
+        if body_file.endswith('.json') or body_file.endswith('.JSON'):
+            headers['Content-Type'] = 'application/json-patch+json'
+        elif body_file.endswith('.xml') or body_file.endswith('.XML'):
+            headers['Content-Type'] = 'application/xml'
+        else:
+            headers.setdefault('Content-Type', 'application/json')
+    elif method == 'DELETE':
+        if body_file.endswith('.json') or body_file.endswith('.JSON'):
+            headers['Content-Type'] = 'application/json'
+        elif body_file.endswith('.xml') or body_file.endswith('.XML'):
+            headers['Content-Type'] = 'application/xml'
+        else:
+            headers.setdefault('Content-Type', 'application/json')
+    else:
         headers['Content-Type'] = 'application/json'
-        print("Request Body:\n" + json.dumps(body, indent=2))
-    
-    try:        
-        r = requests.post(url=uri, headers=headers, json=body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling POST Error: ")
-        print(e)
-        sys.exit(1)
+
+
+def request_body_file(method, uri, headers, body_file, stream=False):
+    """
+    Requests uri with the body file.
+    A large file is sent from the disk by chunks. If there are variables, they are
+    substituted while it is sent by the chunked transfer encoding.
+    """
+    if not body_file:
+        return get_transport().request(method, url=uri, headers=headers, stream=stream)
+
+    set_content_type(method, headers, body_file)
+    plans = get_request_plans()
+    body = plans.get_body(body_file)
+    if body is not None:
+        return get_transport().request(method, url=uri, headers=headers, data=body,
+                                       stream=stream)
+    if plans.variables.values:
+        return get_transport().request(method, url=uri, headers=headers,
+                                       data=plans.iter_body(body_file), stream=stream)
+    with open(body_file, 'rb') as handle:
+        return get_transport().request(method, url=uri, headers=headers, data=handle,
+                                       stream=stream)
+
+
+def request_multipart(method, uri, headers, multipart_title, multipart_file,
+                      print_body=True, stream=False):
+    """
+    Requests uri as multipart.
+    The file is sent from the disk by chunks and the upload speed is printed.
+    """
+    with MultipartFile(multipart_title, multipart_file) as body:
+        headers['Content-Type'] = body.get_content_type()
+        r = get_transport().request(method, url=uri, headers=headers, data=body,
+                                    stream=stream)
+    if print_body:
+        elapsed = body.get_elapsed()
+        print("Uploaded %d bytes in %.3f s (%.1f KB/s)"
+              % (len(body), elapsed, len(body) / 1024.0 / elapsed if elapsed > 0 else 0))
     return r
+
+
+def request_post(uri, headers, body_file, print_body=True, stream=False):
+    """
+    Requests POST uri.
+    """
+    if body_file and print_body:
+        print("Request Body:")
+        body = get_request_plans().get_body(body_file)
+        if body is not None:
+            pretty_print_chunks([body], sys.stdout.write)
+        else:
+            pretty_print_chunks(get_request_plans().iter_body(body_file, STREAM_CHUNK_SIZE),
+                                sys.stdout.write)
     
-def request_post_multipart(uri, headers, multipart_title, multipart_file):
+    return request_body_file('POST', uri, headers, body_file, stream)
+    
+def request_post_multipart(uri, headers, multipart_title, multipart_file,
+                           print_body=True, stream=False):
     """
     Requests POST uri as multipart.
     """
-    try:
-        if multipart_file != '':
-            f = open(multipart_file, "rb")
-        else:
-            f = None
-        multipart_body = { multipart_title : (multipart_file, f, "application/x-binary") }
-        r = requests.post(url=uri, headers=headers, files=multipart_body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling POST Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+    return request_multipart('POST', uri, headers, multipart_title, multipart_file,
+                             print_body, stream)
 
-def request_get(uri, headers):
+def request_get(uri, headers, stream=False):
     """
     Requests GET uri.
     """
-    try:
-        r = requests.get(url=uri, headers=headers, verify=False, cert=get_cert()) 
-    except ConnectionError as e:
-        print("Calling GET Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+    return get_transport().request('GET', url=uri, headers=headers, stream=stream)
 
     
-def request_put(uri, headers, body_file):
+def request_put(uri, headers, body_file, stream=False):
     """
     Requests PUT uri.
     """
-    body = None
-    if body_file:
-        with open(body_file, 'r') as handle:
-            body = json.load(handle)
-        headers['Content-Type'] = 'application/json'
-        
-    try:
-        r = requests.put(url=uri, headers=headers, json=body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling PUT Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+    return request_body_file('PUT', uri, headers, body_file, stream)
 
-def request_put_multipart(uri, headers, multipart_title, multipart_file):
+def request_put_multipart(uri, headers, multipart_title, multipart_file,
+                          print_body=True, stream=False):
     """
     Requests PUT uri as multipart.
     """
-    try:
-        if multipart_file != '':
-            f = open(multipart_file, "rb")
-        else:
-            f = None
-        multipart_body = { multipart_title : (multipart_file, f, "application/x-binary") }
-        r = requests.put(url=uri, headers=headers, files=multipart_body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling PUT Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+    return request_multipart('PUT', uri, headers, multipart_title, multipart_file,
+                             print_body, stream)
 
 
-def request_patch(uri, headers, body_file):
+def request_patch(uri, headers, body_file, stream=False):
     """
     Requests PATCH uri.
     """
-    body = None
-    if body_file:
-        with open(body_file, 'r') as handle:
-            body = json.load(handle)
-            
-        if body_file.endswith('.json') or body_file.endswith('.JSON'):
-            headers['Content-Type'] = 'application/json-patch+json'
-        elif body_file.endswith('.xml') or body_file.endswith('.XML'):
-            headers['Content-Type'] = 'application/xml'
-        
-    try:
-        r = requests.patch(url=uri, headers=headers, json=body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling PATCH Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+    return request_body_file('PATCH', uri, headers, body_file, stream)
 
-def request_patch_multipart(uri, headers, multipart_title, multipart_file):
+def request_patch_multipart(uri, headers, multipart_title, multipart_file,
+                            print_body=True, stream=False):
     """
     Requests PATCH uri as multipart.
     """
-    try:
-        if multipart_file != '':
-            f = open(multipart_file, "rb")
-        else:
-            f = None
-        multipart_body = { multipart_title : (multipart_file, f, "application/x-binary") }
-        r = requests.patch(url=uri, headers=headers, files=multipart_body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling PATCH Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+    return request_multipart('PATCH', uri, headers, multipart_title, multipart_file,
+                             print_body, stream)
 
 
 
-def request_delete(uri, headers, body_file):
+def request_delete(uri, headers, body_file, stream=False):
     """
     Requests DELETE uri.
     """
-    body = None
-    if body_file:
-        with open(body_file, 'r') as handle:
-            body = json.load(handle)
-            
-        if body_file.endswith('.json') or body_file.endswith('.JSON'):
-            headers['Content-Type'] = 'application/json'
-        elif body_file.endswith('.xml') or body_file.endswith('.XML'):
-            headers['Content-Type'] = 'application/xml'
+    return request_body_file('DELETE', uri, headers, body_file, stream)
 
-    try:
-        r = requests.delete(url=uri, headers=headers, json=body, verify=False, cert=get_cert())
-    except ConnectionError as e:
-        print("Calling DELETE Error: ")
-        print(e)
-        sys.exit(1)
-    return r
+
+def send_request(method, uri, headers, body_file, multipart, print_body=True, stream=False):
+    """
+    Requests uri by the method.
+    Connection errors and timeouts are raised to the caller.
+    If stream is set, the response body is not read yet.
+    """
+    if method == 'GET':
+        return request_get(uri, headers, stream)
+    elif method == 'POST':
+        if body_file and multipart:
+            return request_post_multipart(uri, headers, multipart, body_file, print_body, stream)
+        return request_post(uri, headers, body_file, print_body, stream)
+    elif method == 'DELETE':
+        return request_delete(uri, headers, body_file, stream)
+    elif method == 'PUT':
+        if body_file and multipart:
+            return request_put_multipart(uri, headers, multipart, body_file, print_body, stream)
+        return request_put(uri, headers, body_file, stream)
+    elif method == 'PATCH':
+        if body_file and multipart:
+            return request_patch_multipart(uri, headers, multipart, body_file, print_body, stream)
+        return request_patch(uri, headers, body_file, stream)
+    else:
+        raise ValueError("The method is not supported! method: %s" % (method))
 
 
-def request(postman, parameters, multipart, verbose):
+def get_request_plans():
     """
-    Requests Postman item.
+    Gets request plans compiled by the configuration.
+    They are compiled again if the configuration is loaded again.
     """
-    end_point = config['end_point']
-    
-    param_index = 0
-    index = int(parameters[param_index])
-    param_index += 1
+    global request_plans
+    if request_plans is None or request_plans.config is not config:
+        from plan import RequestPlans
+        request_plans = RequestPlans(config)
+    return request_plans
 
-    api = postman.get_api(index)
-    uri = api.get_uri().replace(config['end_point_var'], end_point)
-    uri = re.sub(r'\?.*', '', uri)
-    
-    # Replaces variables by configuration.
-    if 'path_vars' in config and config['path_vars']:
-        path_vars = json.loads(config['path_vars'])
-        if path_vars:
-            for key in path_vars:
-                uri = re.sub(key, path_vars[key], uri, 1)
-
-    # Replaces path variables.
-    while len(parameters) > param_index and uri.find('{') >= 0:
-        uri = re.sub(r'{[^/]*}', parameters[param_index], uri, 1)
-        param_index += 1
-    
-    # Query parameters
-    if len(parameters) > param_index and parameters[param_index].find('=') > 0:
-        uri += '?' + parameters[param_index]
-        param_index += 1
 
-    # Authentication
-    token = None
+def resolve_request(postman, parameters):
+    """
+    Resolves the request plan of the API, URI, and request body file by parameters.
+    The plan is compiled once for each API, so resolving it again takes little time.
+    """
+    plan = get_request_plans().get_plan(postman, parameters[0])
+    uri, body_file = plan.resolve(parameters[1:])
+    return plan, uri, body_file
+
+
+def get_request_token(uri):
+    """
+    Gets the authentication token to request the URI.
+    Returns the token and whether it was cached.
+    """
+    end_point = config['end_point']
 
     if config['auth_token_value']:
-        token = config['auth_token_value']
+        return config['auth_token_value'], False
     elif config['auth_uri'] and not uri.startswith(end_point + config['auth_uri']):
-        token = request_auth(end_point)
+        token = load_auth_token(end_point)
+        if token:
+            return token, True
+        return request_auth(end_point), False
+    return None, False
+
+
+def send_api_request(api, uri, headers, body_file, multipart, cached_token,
+                     print_body=True, stream=False):
+    """
+    Requests the API.
+    Retries once with a new token if the cached token was rejected.
+    """
+    r = send_request(api.get_method(), uri, headers, body_file, multipart, print_body, stream)
+
+    if r.status_code == 401 and cached_token:
+        r.close()
+        token = request_auth(config['end_point'], True)
+        headers[config['auth_token_title']] = token
+        # The body was printed by the first request.
+        r = send_request(api.get_method(), uri, headers, body_file, multipart, False, stream)
+    return r
+
+
+def get_response_cache():
+    """
+    Returns the on-disk cache of GET responses.
+    """
+    from http_cache import ResponseCache
+    path = config.get('response_cache_dir') or DEFAULT_RESPONSE_CACHE_DIR
+    size = float(config.get('response_cache_size') or DEFAULT_RESPONSE_CACHE_SIZE)
+    return ResponseCache(path, int(size * 1024 * 1024))
+
+
+def send_cached_get(api, uri, headers, cached_token):
+    """
+    Requests GET with the response cache.
+    A fresh cached response is used without requesting,
+    and a stale one is revalidated by ETag or Last-Modified.
+    Returns the response and the cache state, None, 'HIT', or 'REVALIDATED'.
+    """
+    from http_cache import get_cache_key
+    cache = get_response_cache()
+
+    # The token is changed by time, so the user is identified by the credentials.
+    key_headers = {key: headers[key] for key in headers
+                   if key != config['auth_token_title']}
+    if config['auth_token_value']:
+        key_headers[config['auth_token_title']] = config['auth_token_value']
+    elif config['auth_uri'] and config['auth_body_file']:
+        key_headers['auth'] = get_auth_token_key(config['end_point'])
+    key = get_cache_key(uri, key_headers)
+
+    entry = cache.lookup(key)
+    if entry is not None and entry.is_fresh():
+        return entry.to_response(uri), 'HIT'
+    if entry is not None:
+        headers.update(entry.get_validators())
+
+    r = send_api_request(api, uri, headers, None, None, cached_token, False)
+    if r.status_code == 304 and entry is not None:
+        cache.refresh(entry, r)
+        return entry.to_response(uri), 'REVALIDATED'
+    cache.store(key, r)
+    return r, None
+
+
+def request(postman, parameters, multipart, verbose, stream=False, output=None,
+            use_cache=False, record=None):
+    """
+    Requests Postman item.
+    If record is set, the request and the response are appended to the archive file.
+    """
+    api, uri, body_file = resolve_request(postman, parameters)
+    # A bad assertions file fails before the request.
+    validator = get_validator(postman, parameters[0])
+
+    # Authentication
+    try:
+        token, cached_token = get_request_token(uri)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
     
     headers = api.get_headers()
     if token:
@@ -383,52 +661,571 @@ def request(postman, parameters, multipart, verbose):
         for key in headers:
             print("%s: %s" % (key, headers[key]))
 
-    if api.get_method() == 'GET':
-        r = request_get(uri, headers)
-    elif api.get_method() == 'POST':
-        if len(parameters) > param_index:
-            if multipart:
-                r = request_post_multipart(uri, headers, multipart, parameters[param_index])
-            else:
-                r = request_post(uri, headers, parameters[param_index])
-            param_index += 1
+    from requests.exceptions import ConnectionError, Timeout
+    cache_state = None
+    start = time.perf_counter()
+    try:
+        if use_cache and api.get_method() == 'GET':
+            r, cache_state = send_cached_get(api, uri, headers, cached_token)
+        else:
+            r = send_api_request(api, uri, headers, body_file, multipart, cached_token,
+                                 stream=stream or output is not None)
+    except (ConnectionError, Timeout) as e:
+        print("Calling %s Error: " % (api.get_method()))
+        print(e)
+        sys.exit(1)
+    except RuntimeError as e:
+        # The rejected token failed to be refreshed.
+        print(e)
+        sys.exit(1)
+    # A cached response is not a latency of the API.
+    if cache_state != 'HIT':
+        record_latency(postman, parameters[0], time.perf_counter() - start)
+    
+    print_response(r, verbose, stream, output, cache_state)
+    # The streamed body is not kept to record.
+    if record and not stream and output is None:
+        record_response(record, api, uri, r)
+
+    if validator is not None:
+        # The streamed body is not kept to check.
+        get_body = None
+        if not stream and output is None:
+            get_body = r.json
+        failures = validator.check(r.status_code, r.headers, get_body)
+        print_assertions(failures)
+        if failures:
+            sys.exit(1)
+
+
+def record_response(archive_path, api, uri, response):
+    """
+    Appends the request and the response to the archive with the API template.
+    """
+    from archive import append_record, get_target
+    append_record(archive_path, api.get_method(), get_target(uri), api.get_route(),
+                  response.status_code, response.headers, response.content)
+
+
+def run_mock(postman, port, archive_path=None, latency=None, workers=1):
+    """
+    Serves the APIs as a mock server until it is interrupted.
+    """
+    from mock import build_router, parse_latency, serve_mock
+    from postman import load_examples
+    # Routes are the same as recorded ones by request plans.
+    router = build_router(postman, load_examples(config['postman_file']),
+                          config['end_point_var'], get_request_plans().variables.values,
+                          archive_path, config.get('auth_uri'), config.get('auth_token_title'))
+    serve_mock(router, '127.0.0.1', port, parse_latency(latency), workers)
+
+
+def get_assertion_rules():
+    """
+    Gets assertions of APIs. The assertions file and Postman tests are loaded once.
+    If the file is not valid, the error is printed and exits, so it is loaded
+    by the main thread before requests are sent.
+    """
+    global assertion_rules
+    if assertion_rules is None:
+        from assertions import load_rules
+        try:
+            assertion_rules = load_rules(config.get('assertions_file'),
+                                         config.get('postman_tests') is True)
+        except (OSError, ValueError) as e:
+            print(e)
+            sys.exit(1)
+    return assertion_rules
+
+
+def get_validator(postman, api_id):
+    """
+    Gets the compiled assertions of the API, or None if it has no assertions.
+    """
+    index = postman.find_index(api_id)
+    return get_assertion_rules().get_validator(postman.get_id(index), postman.get_api(index))
+
+
+def print_assertions(failures):
+    """
+    Prints failed assertions to the standard error.
+    """
+    if not failures:
+        sys.stderr.write("Assertions: PASSED\n")
+        return
+    sys.stderr.write("Assertions: FAILED %d\n" % (len(failures)))
+    for failure in failures:
+        sys.stderr.write("  %s\n" % (failure))
+
+
+def prepare_request_body(method, headers, body_file, multipart):
+    """
+    Reads the request body file once to send it many times.
+    Returns keyword arguments of the request, and sets Content-Type in headers.
+    """
+    if not body_file or method == 'GET':
+        return {}
+
+    if multipart:
+        with open(body_file, 'rb') as handle:
+            content = handle.read()
+        return {'files': {multipart: (body_file, content, "application/x-binary")}}
+
+    set_content_type(method, headers, body_file)
+    content = get_request_plans().get_body(body_file)
+    if content is None:
+        content = b''.join(get_request_plans().iter_body(body_file))
+    return {'data': content}
+
+
+def make_token_refresh(headers, cached_token):
+    """
+    Makes a function to refresh the token in headers shared by concurrent workers.
+    The cached token is refreshed only once. The function returns whether it was refreshed.
+    """
+    lock = threading.Lock()
+    state = {'cached_token': cached_token}
+
+    def refresh():
+        with lock:
+            if not state['cached_token']:
+                return False
+            headers[config['auth_token_title']] = request_auth(config['end_point'], True)
+            state['cached_token'] = False
+            return True
+    return refresh
+
+
+def run_load(postman, parameters, multipart, count, concurrency, duration, schedule=None,
+             processes=1):
+    """
+    Requests the API repeatedly by concurrent workers.
+    With the schedule, requests are sent at its rate regardless of responses.
+    The request is resolved and the body is read only once.
+    With processes, the request, the token and the body are shared by forked processes,
+    and each process sends its share by its own connections.
+    """
+    api, uri, body_file = resolve_request(postman, parameters)
+    method = api.get_method()
+    validator = get_validator(postman, parameters[0])
+    token, cached_token = get_request_token(uri)
+    headers = api.get_headers()
+    if token:
+        headers[config['auth_token_title']] = token
+    body = prepare_request_body(method, headers, body_file, multipart)
+    refresh = make_token_refresh(headers, cached_token)
+
+    def make_send(pool_size):
+        http = get_transport(pool_size)
+
+        def send():
+            r = http.request(method, uri, headers=headers, **body)
+            r.content
+            if r.status_code == 401:
+                refresh()
+            if validator is None:
+                return r.status_code
+            return r.status_code, [name for name, failure
+                                   in validator.iter_failures(r.status_code, r.headers, r.json)]
+        return send
+
+    print("%s %s" % (method, uri))
+    if processes <= 1:
+        if schedule:
+            result = run_open_loop(make_send(concurrency), schedule, concurrency, count)
         else:
-            r = request_post(uri, headers, None)
-    elif api.get_method() == 'DELETE':
-        if len(parameters) > param_index:
-            r = request_delete(uri, headers, parameters[param_index])
-            param_index += 1
+            result = run_closed_loop(make_send(concurrency), count, concurrency, duration)
+        result.retries = get_transport().get_retry_stats()
+        record_latencies(postman, parameters[0], result.histogram)
+        return result
+
+    start = time.perf_counter() + PROCESS_START_DELAY
+
+    def run(index, report):
+        global transport
+        # Connections of the parent are not shared.
+        transport = None
+        share = max(split_count(concurrency, processes, index), 1)
+        send = make_send(share)
+        if schedule:
+            result = run_open_loop(send, schedule, share, count, start, (index, processes),
+                                   report)
         else:
-            r = request_delete(uri, headers, None)
-    elif api.get_method() == 'PUT':
-        if len(parameters) > param_index:
-            if multipart:
-                r = request_put_multipart(uri, headers, multipart, parameters[param_index])
-            else:
-                r = request_put(uri, headers, parameters[param_index])
-            param_index += 1
+            share_count = split_count(count, processes, index) if count else None
+            result = run_closed_loop(send, share_count, share, duration, report)
+        result.retries = get_transport().get_retry_stats()
+        return result
+
+    result = run_processes(run, processes, print_progress)
+    record_latencies(postman, parameters[0], result.histogram)
+    return result
+
+
+def parse_batch_line(postman, line):
+    """
+    Parses a batch line to parameters and the multipart title.
+    A line is command line parameters, or JSON list of them,
+    or JSON object with "parameters" and optional "multipart".
+    The first parameter can be an API name.
+    """
+    multipart = None
+    parameters = None
+    if line.startswith('{'):
+        item = json.loads(line)
+        parameters = item['parameters']
+        multipart = item.get('multipart')
+    elif line.startswith('['):
+        # An API name can also start with '['.
+        try:
+            parameters = json.loads(line)
+        except ValueError:
+            pass
+    if parameters is None:
+        parameters = shlex.split(line)
+
+    parameters = [str(parameter) for parameter in parameters]
+    if not parameters:
+        raise ValueError("No API is specified.")
+
+    # The API is an index, a API ID of merged collections, or a name.
+    index = postman.find_index(parameters[0])
+    if index == -1 and parameters[0].isdigit():
+        raise ValueError("The index is not FOUND! Total: %s" % (postman.count_apis()))
+    if index == -1:
+        index = find_index_by_name(postman, parameters[0])
+        if index == -1:
+            raise ValueError("API is not found! name: %s" % (parameters[0]))
+    parameters[0] = str(index)
+    return parameters, multipart
+
+
+def get_response_body(response):
+    """
+    Gets the response body as JSON if possible, otherwise as text.
+    """
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        try:
+            return response.json()
+        except ValueError:
+            pass
+    return response.text
+
+
+def execute_request(postman, parameters, multipart, timing=False, record=None):
+    """
+    Requests the API without printing.
+    Returns the result with the response, or with the error if it failed.
+    If timing is set, timings of the authentication and the API are added to the result.
+    If record is set, the request and the response are appended to the archive file.
+    """
+    api, uri, body_file = resolve_request(postman, parameters)
+    result = {'index': postman.get_id(postman.find_index(parameters[0])), 'method': api.get_method(), 'uri': uri}
+
+    if timing:
+        from timing import start_recording, stop_recording
+        start_recording()
+    try:
+        send_request_result(api, uri, body_file, multipart, result)
+    finally:
+        if timing:
+            result['timing'] = [t.to_dict() for t in stop_recording()]
+    if record and 'response' in result:
+        record_response(record, api, uri, result['response'])
+    if 'status' in result:
+        record_latency(postman, parameters[0], result['elapsed_ms'] / 1000.0)
+    from assertions import check_response
+    check_response(get_validator(postman, parameters[0]), result.get('response'), result)
+    return result
+
+
+def send_request_result(api, uri, body_file, multipart, result):
+    """
+    Requests the API and sets the status and the response to the result.
+    A failed authentication is set as the error of the result.
+    """
+    try:
+        token, cached_token = get_request_token(uri)
+    except RuntimeError as e:
+        result['error'] = str(e)
+        return result
+    headers = api.get_headers()
+    if token:
+        headers[config['auth_token_title']] = token
+
+    from requests.exceptions import RequestException
+    start = time.perf_counter()
+    try:
+        r = send_api_request(api, uri, headers, body_file, multipart, cached_token, False)
+        r.content
+    except (RequestException, RuntimeError) as e:
+        result['error'] = str(e)
+        return result
+    finally:
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    result['status'] = r.status_code
+    result['response'] = r
+    return result
+
+
+def run_batch(postman, batch_file, multipart, timing=False, record=None):
+    """
+    Requests APIs of all lines in the batch file.
+    Each result is printed as a JSON line. Returns count of failed lines.
+    """
+    from assertions import is_failed
+    get_assertion_rules()
+    failures = 0
+    with open(batch_file, 'r') as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            result = {'line': line_number}
+            try:
+                parameters, line_multipart = parse_batch_line(postman, line)
+                result['parameters'] = parameters
+                result.update(execute_request(postman, parameters,
+                                              line_multipart or multipart, timing, record))
+                response = result.pop('response', None)
+                if response is not None and 'body' not in result:
+                    result['body'] = get_response_body(response)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                result['error'] = str(e)
+            if is_failed(result):
+                failures += 1
+
+            print(json.dumps(result), flush=True)
+    return failures
+
+
+def run_data(postman, parameters, data_file, concurrency, output=None, resume=False):
+    """
+    Requests the API for each row of the CSV or JSON lines data file.
+    Rows are read one by one and requested by concurrent workers with one token.
+    Results are written as JSON lines in the row order, so a run can be resumed
+    after the last written row. Returns the number of rows and failed rows.
+    """
+    from assertions import check_response
+    from data_run import find_last_row, read_rows, run_rows, RequestTemplate
+
+    api, uri, body_file = resolve_request(postman, parameters)
+    method = api.get_method()
+    validator = get_validator(postman, parameters[0])
+    token, cached_token = get_request_token(uri)
+    headers = api.get_headers()
+    if token:
+        headers[config['auth_token_title']] = token
+
+    body_template = None
+    if body_file:
+        body = get_request_plans().get_body(body_file)
+        if body is None:
+            body = b''.join(get_request_plans().iter_body(body_file))
+        body_template = body.decode('utf-8')
+        set_content_type(method, headers, body_file)
+    template = RequestTemplate(uri, body_template)
+    http = get_transport(concurrency)
+    refresh = make_token_refresh(headers, cached_token)
+    title = config['auth_token_title']
+
+    def send(row):
+        row_uri, body = template.render(row)
+        data = None
+        if body is not None:
+            data = body.encode('utf-8')
+        start = time.perf_counter()
+        for attempt in range(2):
+            request_headers = dict(headers)
+            if data is not None:
+                request_headers.setdefault('Content-Type', 'application/json')
+            r = http.request(method, row_uri, headers=request_headers, data=data)
+            r.content
+            # Retries once if the token was rejected and refreshed.
+            if r.status_code != 401 or attempt == 1:
+                break
+            refresh()
+            if headers.get(title) == request_headers.get(title):
+                break
+        elapsed = time.perf_counter() - start
+        record_latency(postman, parameters[0], elapsed)
+        result = {'method': method, 'uri': row_uri, 'status': r.status_code,
+                  'elapsed_ms': round(elapsed * 1000, 3)}
+        check_response(validator, r, result)
+        if 'body' not in result:
+            result['body'] = get_response_body(r)
+        return result
+
+    last_row = 0
+    if resume and output:
+        last_row = find_last_row(output)
+    rows = (row for row in read_rows(data_file) if row[0] > last_row)
+
+    handle = sys.stdout
+    if output:
+        handle = open(output, 'a' if resume else 'w')
+    try:
+        def write(result):
+            handle.write(json.dumps(result) + "\n")
+            handle.flush()
+        return run_rows(rows, send, write, concurrency)
+    finally:
+        if output:
+            handle.close()
+
+
+def find_folder_indexes(postman, folder_name):
+    """
+    Finds API indexes in the folder. The case is insensitive.
+    """
+    folder_name = folder_name.lower()
+    return [i for i, api in enumerate(postman)
+            if (api.get_folder_name() or '').lower() == folder_name]
+
+
+def run_apis(postman, indexes, concurrency, parallel_all=False, timing=False):
+    """
+    Requests APIs in the order of indexes.
+    Consecutive idempotent APIs are requested concurrently,
+    and other APIs are requested one by one unless parallel_all is set.
+    Returns results in the order of indexes.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    get_assertion_rules()
+    results = [None] * len(indexes)
+
+    def run(position):
+        index = indexes[position]
+        try:
+            result = execute_request(postman, [str(index)], None, timing)
+            result.pop('response', None)
+            result.pop('body', None)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            result = {'index': postman.get_id(index),
+                      'method': postman.get_api(index).get_method(),
+                      'error': str(e)}
+        result['name'] = postman.get_api(index).get_name()
+        results[position] = result
+
+    # Authenticates once before requesting concurrently.
+    if indexes:
+        api, uri, body_file = resolve_request(postman, [str(indexes[0])])
+        try:
+            get_request_token(uri)
+        except RuntimeError:
+            # Each API records the error of its authentication.
+            pass
+    get_transport(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        group = []
+        for position, index in enumerate(indexes):
+            if parallel_all or postman.get_api(index).get_method() in IDEMPOTENT_METHODS:
+                group.append(position)
+                continue
+            list(executor.map(run, group))
+            group = []
+            run(position)
+        list(executor.map(run, group))
+    return results
+
+
+def print_run_results(results, elapsed):
+    """
+    Prints a summary table of run results.
+    """
+    from assertions import is_failed
+    print("%5s  %-6s  %6s  %10s  %s" % ('ID', 'Method', 'Status', 'Time(ms)', 'Name'))
+    failures = 0
+    for result in results:
+        if 'error' in result:
+            status = 'ERROR'
         else:
-            r = request_put(uri, headers, None)
-    elif api.get_method() == 'PATCH':
-        if len(parameters) > param_index:
-            if multipart:
-                r = request_patch_multipart(uri, headers, multipart, parameters[param_index])
-            else:
-                r = request_patch(uri, headers, parameters[param_index])
-            param_index += 1
+            status = result['status']
+        if is_failed(result):
+            failures += 1
+        print("%5s  %-6s  %6s  %10.3f  %s" % (result['index'], result['method'], status,
+                                             result.get('elapsed_ms', 0), result['name']))
+        if 'error' in result:
+            print("       %s" % (result['error']))
+        for failure in result.get('assertions', ()):
+            print("       Assertion failed: %s" % (failure))
+    print("APIs: %d, Failed: %d, Wall Time: %.3f s" % (len(results), failures, elapsed))
+
+    timings = [timing for result in results for timing in result.get('timing', ())
+               if timing['name'] == 'api']
+    if timings:
+        print_timing_summary(timings)
+    return failures
+
+
+def print_timing_summary(timings):
+    """
+    Prints the mean of each phase of timings.
+    Connection phases are averaged over new connections only.
+    """
+    from timing import PHASES
+    values = []
+    for phase in PHASES:
+        samples = [timing[phase + '_ms'] for timing in timings
+                   if timing[phase + '_ms'] is not None]
+        if samples:
+            values.append("%s %.3f ms (%d)" % (phase.upper(), sum(samples) / len(samples),
+                                               len(samples)))
         else:
-            r = request_patch(uri, headers, None)
-    
-    print_response(r, verbose)
+            values.append("%s -" % phase.upper())
+    print("Timing Mean: %s" % ', '.join(values))
+
+
+def run_folder(postman, folder_name, concurrency, parallel_all, timing=False):
+    """
+    Requests all APIs in the folder, or in the collection if folder_name is None.
+    Returns count of failed APIs.
+    """
+    if folder_name is None:
+        indexes = list(range(postman.count_apis()))
+    else:
+        indexes = find_folder_indexes(postman, folder_name)
+        if not indexes:
+            print("Folder is not found! folder: %s" % (folder_name))
+            sys.exit(1)
+
+    start = time.perf_counter()
+    results = run_apis(postman, indexes, concurrency, parallel_all, timing)
+    return print_run_results(results, time.perf_counter() - start)
 
 
-def request_root(verbose):
+def request_root(verbose, stream=False, output=None):
     """
     Calls root uri.
     """
+    from requests.exceptions import ConnectionError, Timeout
     print("%s %s" % ("GET", config['end_point'] + "/"))
-    r = request_get(config['end_point'] + "/", None)
-    print_response(r, verbose);
+    try:
+        r = request_get(config['end_point'] + "/", None, stream or output is not None)
+    except (ConnectionError, Timeout) as e:
+        print("Calling GET Error: ")
+        print(e)
+        sys.exit(1)
+    print_response(r, verbose, stream, output);
+
+
+def load_config(path):
+    """
+    Loads the configuration file.
+    Parsed configuration is cached next to the file to not parse YAML every time.
+    """
+    key = get_catalog_key(path)
+    cache_path = path + CONFIG_CACHE_SUFFIX
+    loaded = load_file(cache_path, key)
+    if loaded is not None:
+        return loaded
+
+    import yaml
+    with open(path) as f:
+        loaded = yaml.load(f, Loader=yaml.FullLoader)
+    save_file(cache_path, key, loaded)
+    return loaded
 
 
 def export_request_sample(postman, index):
@@ -438,28 +1235,143 @@ def export_request_sample(postman, index):
     api = postman.get_api(index)
     print(api.get_request_body_sample())
 
-if __name__ == '__main__':
-    # Main
-    args = parser.parse_args()
-    
-    # Reads configuration.
-    config_path = 'config.yaml'
-    if args.config:
-        config_path = args.config
-        
-    with open(config_path) as f:
-        config = yaml.load(f, Loader=yaml.FullLoader)
-    
-    # Reads postman file.
-    postman = create_postman(config['postman_file']) 
-    
+def print_timings(output_format):
+    """
+    Prints recorded timings to the standard error as text or JSON lines.
+    """
+    from timing import stop_recording
+    for timing in stop_recording():
+        if output_format == 'json':
+            sys.stderr.write(json.dumps(timing.to_dict()) + "\n")
+        else:
+            sys.stderr.write("Timing: %s\n" % timing.format())
+
+
+def get_baseline_key(postman, api_id):
+    """
+    Gets the baseline key of the API by the collection, folder, and API names.
+    """
+    from baseline import get_api_key
+    index = postman.find_index(api_id)
+    api = postman.get_api(index)
+    return get_api_key(postman.get_collection_name(index), api.get_folder_name(), api.get_name())
+
+
+def record_latency(postman, api_id, seconds):
+    """
+    Records a latency of the API if the baseline is used.
+    """
+    if latency_samples is not None:
+        latency_samples.record(get_baseline_key(postman, api_id), seconds)
+
+
+def record_latencies(postman, api_id, histogram):
+    """
+    Records latencies of a load test of the API if the baseline is used.
+    """
+    if latency_samples is not None:
+        latency_samples.merge(get_baseline_key(postman, api_id), histogram)
+
+
+def run_baseline_command(args, postman):
+    """
+    Runs the command collecting latencies of APIs,
+    and saves them as the baseline or compares them with it.
+    Exits with 1 if any API regressed or the command failed.
+    """
+    global latency_samples
+    from baseline import compare_baseline, load_baseline, print_comparisons, save_baseline, \
+        LatencySamples, DEFAULT_BASELINE_FILE, DEFAULT_THRESHOLD
+
+    path = args.baseline_file or config.get('baseline_file') or DEFAULT_BASELINE_FILE
+    threshold = float(config.get('baseline_threshold') or DEFAULT_THRESHOLD)
+    baseline = None
+    if args.baseline == 'compare':
+        try:
+            baseline = load_baseline(path)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+
+    latency_samples = LatencySamples()
+    failed = None
+    try:
+        run_timed_command(args, postman)
+    except SystemExit as e:
+        if e.code:
+            failed = e
+    finally:
+        samples, latency_samples = latency_samples, None
+
+    if args.baseline == 'save':
+        # Latencies of a failed command are not a baseline.
+        if failed is not None:
+            sys.stderr.write("Baseline is not saved, because the command failed.\n")
+            raise failed
+        save_baseline(path, samples)
+        sys.stderr.write("Baseline: %d APIs saved to %s\n" % (len(samples.histograms), path))
+        return
+    regressed = print_comparisons(compare_baseline(baseline, samples, threshold))
+    if failed is not None:
+        raise failed
+    if regressed > 0:
+        sys.exit(1)
+
+
+def run_command(args, postman):
+    """
+    Runs the command of the arguments.
+    With --baseline, latencies of APIs are saved or compared after it.
+    Retries and hedged requests are printed to the standard error after it.
+    Load tests print them in their results.
+    """
+    if transport is not None:
+        transport.reset_retry_stats()
+    try:
+        if args.baseline:
+            run_baseline_command(args, postman)
+        else:
+            run_timed_command(args, postman)
+    finally:
+        if transport is not None and not (args.load or args.duration or args.rate or args.stages):
+            from retry import format_retry_stats
+            retries = format_retry_stats(transport.get_retry_stats())
+            if retries:
+                sys.stderr.write(retries + "\n")
+
+
+def run_timed_command(args, postman):
+    """
+    Runs the command of the arguments.
+    Timings of a single request are printed after it if --timing is set.
+    Batch and run modes add timings to each result.
+    """
+    if not args.timing or args.batch or args.data or args.run_folder or args.run_all:
+        dispatch_command(args, postman)
+        return
+
+    from timing import start_recording
+    start_recording()
+    try:
+        dispatch_command(args, postman)
+    finally:
+        print_timings(args.timing_format)
+
+
+def dispatch_command(args, postman):
+    """
+    Dispatches the command of the arguments.
+    """
+    use_cache = args.cache or config.get('response_cache') is True
+
     if args.name:
         find_by_name(postman, args.parameters[0])
     elif args.name_request:
         index = find_index_by_name(postman, args.parameters[0])
         if index != -1:
             args.parameters[0] = index
-            request(postman, args.parameters, args.multipart, args.verbose)
+            request(postman, args.parameters, args.multipart, args.verbose,
+                    args.stream, args.output, use_cache, args.record)
         else:
             print("API is not found!")
             sys.exit(1)
@@ -478,9 +1390,156 @@ if __name__ == '__main__':
         print_all_apis(postman)
     elif args.export:
         export_request_sample(postman, args.parameters[0])
+    elif args.mock is not None:
+        try:
+            run_mock(postman, args.mock, args.replay, args.mock_latency, args.mock_workers)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
     elif args.root:
-        request_root(args.verbose)
+        request_root(args.verbose, args.stream, args.output)
+    elif args.load or args.duration or args.rate or args.stages:
+        schedule = None
+        concurrency = args.concurrency or 1
+        if args.rate or args.stages:
+            try:
+                schedule = make_schedule(parse_stages(args.stages) if args.stages else None,
+                                         args.rate, args.duration)
+            except ValueError as e:
+                print(e)
+                sys.exit(1)
+            concurrency = args.concurrency or DEFAULT_OPEN_LOOP_CONCURRENCY
+        processes = args.processes or os.cpu_count() or 1
+        if processes > 1 and not can_fork():
+            sys.stderr.write("Processes can't be forked on this platform. "
+                             "The load test runs in one process.\n")
+            processes = 1
+        if args.concurrency is None and schedule is None:
+            concurrency = processes
+        try:
+            result = run_load(postman, args.parameters, args.multipart,
+                              args.load, concurrency, args.duration, schedule, processes)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        print_load_result(result)
+        if result.assertion_failures > 0:
+            sys.exit(1)
+    elif args.run_folder or args.run_all:
+        if run_folder(postman, args.run_folder, args.concurrency or DEFAULT_RUN_CONCURRENCY,
+                      args.parallel_all, args.timing) > 0:
+            sys.exit(1)
+    elif args.data:
+        if args.resume and not args.output:
+            print("The --resume option needs the --output file.")
+            sys.exit(1)
+        start = time.perf_counter()
+        try:
+            rows, failures = run_data(postman, args.parameters, args.data,
+                                      args.concurrency or DEFAULT_RUN_CONCURRENCY,
+                                      args.output, args.resume)
+        except ValueError as e:
+            print("Invalid data file! %s" % (e))
+            sys.exit(1)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        sys.stderr.write("Rows: %d, Failed: %d, Elapsed: %.3f s\n"
+                         % (rows, failures, time.perf_counter() - start))
+        if failures > 0:
+            sys.exit(1)
+    elif args.batch:
+        if run_batch(postman, args.batch, args.multipart, args.timing, args.record) > 0:
+            sys.exit(1)
     elif len(args.parameters) == 0:
         parser.print_help(sys.stderr)
     else:
-        request(postman, args.parameters, args.multipart, args.verbose)
+        request(postman, args.parameters, args.multipart, args.verbose,
+                args.stream, args.output, use_cache, args.record)
+
+
+# Loaded state of the daemon.
+daemon_state = {}
+
+
+def load_daemon_postman(config_path, rebuild_cache=False):
+    """
+    Loads the configuration and the Postman file of the daemon again if they are changed.
+    """
+    global config, transport, assertion_rules, request_plans
+    # The assertions file and the environment file are loaded again by each command.
+    assertion_rules = None
+    request_plans = None
+    config_key = get_catalog_key(config_path)
+    if daemon_state.get('config_key') != config_key:
+        config = load_config(config_path)
+        if transport is not None:
+            transport.close()
+            transport = None
+        auth_tokens.clear()
+        daemon_state['config_key'] = config_key
+        daemon_state['postman_key'] = None
+
+    postman_key = get_postman_key(config['postman_file'])
+    if daemon_state['postman_key'] != postman_key or rebuild_cache:
+        daemon_state['postman'] = load_postman(config['postman_file'],
+                                               config.get('postman_cache', True) is not False,
+                                               rebuild_cache)
+        daemon_state['postman_key'] = postman_key
+    return daemon_state['postman']
+
+
+def run_daemon(config_path):
+    """
+    Runs commands forwarded by clients until it is interrupted.
+    """
+    import daemon
+    config_path = os.path.abspath(config_path)
+    load_daemon_postman(config_path)
+
+    def handle(argv):
+        args = parser.parse_args(argv)
+        postman = load_daemon_postman(config_path, args.rebuild_cache)
+        run_command(args, postman)
+
+    try:
+        daemon.serve(daemon.get_socket_path(config_path), handle)
+    except FileExistsError as e:
+        print(e)
+        sys.exit(1)
+
+
+def main(argv):
+    """
+    Runs the command in the daemon if it is running or in this process.
+    """
+    global config
+    args = parser.parse_args(argv)
+
+    # Reads configuration.
+    config_path = 'config.yaml'
+    if args.config:
+        config_path = args.config
+
+    if args.daemon:
+        run_daemon(config_path)
+        return
+
+    # The mock server runs in this process.
+    if not args.no_daemon and args.mock is None:
+        from daemon import forward, get_socket_path
+        status = forward(get_socket_path(config_path), argv)
+        if status is not None:
+            sys.exit(status)
+
+    config = load_config(config_path)
+
+    # Reads postman files.
+    postman = load_postman(config['postman_file'],
+                           config.get('postman_cache', True) is not False,
+                           args.rebuild_cache)
+    run_command(args, postman)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,214 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from bisect import bisect_left, bisect_right
+import re
+
+from catalog import load_file, save_file
+
+# Increase it when the index layout is changed.
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_SUFFIX = '.index'
+
+FIELD_NAME = 'name'
+FIELD_URI = 'uri'
+FIELD_FOLDER = 'folder'
+FIELD_BODY = 'body'
+ALL_FIELDS = (FIELD_NAME, FIELD_URI, FIELD_FOLDER, FIELD_BODY)
+
+# Higher weight is ranked first.
+FIELD_WEIGHTS = {FIELD_NAME: 8, FIELD_URI: 4, FIELD_FOLDER: 2, FIELD_BODY: 1}
+# A prefix matched token is scored as this ratio of an exact matched token.
+PREFIX_RATIO = 0.5
+# A token having the term in the middle is scored as this ratio of an exact matched token.
+INFIX_RATIO = 0.25
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+BODY_KEY_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:')
+REGEX_CHARS_PATTERN = re.compile(r'[\\^$.|?*+()\[\]{}]')
+
+
+def tokenize(text):
+    """
+    Splits a text to lower case words.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def get_field_texts(api, end_point_var=''):
+    """
+    Gets texts of the API by search fields.
+    """
+    uri = api.get_uri()
+    if end_point_var:
+        uri = uri.replace(end_point_var, '')
+    return {FIELD_NAME: api.get_name(),
+            FIELD_URI: uri,
+            FIELD_FOLDER: api.get_folder_name() or '',
+            FIELD_BODY: api.get_request_body_sample() or ''}
+
+
+def build_postings(apis, end_point_var=''):
+    """
+    Builds postings of API indexes by tokens for each field.
+    Only keys of the body sample are indexed, and the end point variable is not.
+    """
+    postings = {}
+    for field in ALL_FIELDS:
+        postings[field] = {}
+
+    for index, api in enumerate(apis):
+        texts = get_field_texts(api, end_point_var)
+        texts[FIELD_BODY] = ' '.join(BODY_KEY_PATTERN.findall(texts[FIELD_BODY]))
+        for field in ALL_FIELDS:
+            for token in set(tokenize(texts[field])):
+                postings[field].setdefault(token, []).append(index)
+    return postings
+
+
+class SearchIndex:
+    """
+    Inverted index of APIs.
+    """
+    postings = None
+    tokens = None
+    texts = None
+    starts = None
+    end_point_var = ''
+    def __init__(self, postings, end_point_var=''):
+        self.postings = postings
+        self.end_point_var = end_point_var
+        # Sorted tokens to find prefix matched tokens.
+        self.tokens = {}
+        # Tokens joined by lines and their offsets to find a part of tokens at once.
+        self.texts = {}
+        self.starts = {}
+        for field in postings:
+            tokens = self.tokens[field] = sorted(postings[field])
+            self.texts[field] = '\n'.join(tokens)
+            starts = self.starts[field] = []
+            offset = 0
+            for token in tokens:
+                starts.append(offset)
+                offset += len(token) + 1
+
+    def find_tokens(self, field, term):
+        """
+        Finds tokens having the term with their score ratios.
+        Tokens starting with the term are found by the sorted tokens, and tokens having it
+        in the middle by the joined tokens, so a part of a word is found like a regex search.
+        """
+        tokens = self.tokens[field]
+        i = bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            yield tokens[i], 1.0 if tokens[i] == term else PREFIX_RATIO
+            i += 1
+
+        text = self.texts[field]
+        starts = self.starts[field]
+        position = text.find(term)
+        while position != -1:
+            i = bisect_right(starts, position) - 1
+            if starts[i] != position:
+                yield tokens[i], INFIX_RATIO
+            if i + 1 == len(starts):
+                break
+            position = text.find(term, starts[i + 1])
+
+    def search(self, key, fields=ALL_FIELDS):
+        """
+        Searches API indexes having all words of the key.
+        Returns the indexes ordered by the score and the index.
+        """
+        scores = None
+        for term in tokenize(key):
+            term_scores = {}
+            for field in fields:
+                weight = FIELD_WEIGHTS[field]
+                field_scores = {}
+                for token, ratio in self.find_tokens(field, term):
+                    score = weight * ratio
+                    for index in self.postings[field][token]:
+                        if field_scores.get(index, 0) < score:
+                            field_scores[index] = score
+                for index, score in field_scores.items():
+                    term_scores[index] = term_scores.get(index, 0) + score
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {index: scores[index] + score
+                          for index, score in term_scores.items()
+                          if index in scores}
+            if not scores:
+                return []
+
+        if not scores:
+            return []
+        return sorted(scores, key=lambda index: (-scores[index], index))
+
+
+def get_search_index(postman, end_point_var=''):
+    """
+    Gets the search index of the Postman.
+    It is built once for the end point variable and saved next to the Postman file
+    if the catalog is used.
+    """
+    index = postman.search_index
+    if index is not None and index.end_point_var == end_point_var:
+        return index
+
+    postings = None
+    if postman.catalog_key is not None:
+        path = postman.path + SEARCH_INDEX_SUFFIX
+        key = postman.catalog_key + (SEARCH_INDEX_VERSION, end_point_var)
+        postings = load_file(path, key)
+
+    if postings is None:
+        postings = build_postings(postman, end_point_var)
+        if postman.catalog_key is not None:
+            save_file(path, key, postings)
+
+    postman.search_index = SearchIndex(postings, end_point_var)
+    return postman.search_index
+
+
+def regex_search(postman, key, fields=ALL_FIELDS, end_point_var=''):
+    """
+    Searches API indexes matched with the regular expression.
+    Returns the indexes in the index order.
+    """
+    pattern = re.compile(key, re.IGNORECASE)
+    indexes = []
+    for index, api in enumerate(postman):
+        texts = get_field_texts(api, end_point_var)
+        for field in fields:
+            if pattern.search(texts[field]):
+                indexes.append(index)
+                break
+    return indexes
+
+
+def search_apis(postman, key, fields=ALL_FIELDS, end_point_var=''):
+    """
+    Searches API indexes by the key.
+    Plain words are searched by the index with ranking.
+    A regular expression, or words not found by the index, are searched
+    by the regular expression.
+    """
+    if not REGEX_CHARS_PATTERN.search(key):
+        indexes = get_search_index(postman, end_point_var).search(key, fields)
+        if indexes:
+            return indexes
+    return regex_search(postman, key, fields, end_point_var)
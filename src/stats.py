@@ -0,0 +1,132 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Significant bits kept in a bucket. 7 bits is less than 1% error.
+SIGNIFICANT_BITS = 7
+
+PERCENTILES = (50, 90, 99)
+
+
+def get_bucket(value):
+    """
+    Gets the lower bound and the width of the bucket having the value.
+    """
+    shift = max(value.bit_length() - SIGNIFICANT_BITS, 0)
+    return (value >> shift) << shift, 1 << shift
+
+
+class Histogram:
+    """
+    Latency histogram with log-linear buckets.
+    Values are recorded as integer microseconds.
+    Histograms can be merged, so they can be recorded separately.
+    """
+    counts = None
+    count = 0
+    total = 0
+    min = None
+    max = None
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        """
+        Records a latency in seconds.
+        """
+        value = max(int(seconds * 1000000), 0)
+        lower, width = get_bucket(value)
+        self.counts[lower] = self.counts.get(lower, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Adds all values of the other histogram.
+        """
+        for lower, count in other.counts.items():
+            self.counts[lower] = self.counts.get(lower, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def get_percentile(self, percentile):
+        """
+        Gets the latency in seconds at the percentile.
+        """
+        if self.count == 0:
+            return None
+        rank = max(percentile * self.count / 100.0, 1)
+        seen = 0
+        for lower in sorted(self.counts):
+            seen += self.counts[lower]
+            if seen >= rank:
+                lower, width = get_bucket(lower)
+                value = min(max(lower + (width - 1) // 2, self.min), self.max)
+                return value / 1000000.0
+        return self.max / 1000000.0
+
+    def get_mean(self):
+        """
+        Gets the mean latency in seconds.
+        """
+        if self.count == 0:
+            return None
+        return self.total / self.count / 1000000.0
+
+    def to_dict(self):
+        """
+        Converts to a JSON serializable dictionary.
+        """
+        return {'counts': [[lower, count] for lower, count in sorted(self.counts.items())],
+                'count': self.count, 'total': self.total,
+                'min': self.min, 'max': self.max}
+
+    def summarize(self):
+        """
+        Summarizes latencies in milliseconds.
+        """
+        summary = {'count': self.count}
+        if self.count == 0:
+            return summary
+        summary['min'] = self.min / 1000.0
+        summary['mean'] = round(self.get_mean() * 1000, 3)
+        for percentile in PERCENTILES:
+            summary['p%d' % (percentile)] = self.get_percentile(percentile) * 1000
+        summary['max'] = self.max / 1000.0
+        return summary
+
+
+def histogram_from_dict(data):
+    """
+    Creates a histogram from the dictionary made by to_dict().
+    """
+    histogram = Histogram()
+    for lower, count in data['counts']:
+        histogram.counts[lower] = count
+    histogram.count = data['count']
+    histogram.total = data['total']
+    histogram.min = data['min']
+    histogram.max = data['max']
+    return histogram
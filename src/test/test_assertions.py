@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import assertions
+from api import ApiRecord
+
+class TestAssertions(unittest.TestCase):
+    def test_Validator_Response_Failures(self):
+        validator = assertions.Validator({
+            'status': [200, '3xx'],
+            'headers': {'Content-Type': {'regex': '^application/json'},
+                        'X-Request-Id': {'exists': True}},
+            'json': {'$.user.name': 'kim', '$.items[1]': 2, 'user.id': {'regex': r'^\d+$'}},
+            'schema': {'type': 'object', 'required': ['user'],
+                       'properties': {'items': {'type': 'array', 'items': {'type': 'integer'}},
+                                      'user': {'type': 'object',
+                                               'properties': {'name': {'minLength': 2}}}}}})
+        headers = {'content-type': 'application/json', 'x-request-id': '1'}
+        body = {'user': {'id': '12', 'name': 'kim'}, 'items': [1, 2]}
+        self.assertEqual([], validator.check(302, headers, lambda: body))
+
+        body = {'user': {'id': 'a', 'name': 'k'}, 'items': [1, 'b']}
+        self.assertEqual(['status: 500 is not expected',
+                          'header X-Request-Id: expected to exist',
+                          'json $.user.name: expected "kim", found "k"',
+                          'json $.items[1]: expected 2, found "b"',
+                          'json user.id: "a" doesn\'t match ^\\d+$',
+                          'schema: $.items[1] is not integer'],
+                         validator.check(500, {'content-type': 'application/json'}, lambda: body))
+        # The body isn't checked without it.
+        self.assertEqual([], validator.check(200, headers))
+
+    def test_Validator_NoStatus_Below400(self):
+        validator = assertions.Validator({'json': {'id': 1}})
+        def get_body():
+            raise ValueError()
+        self.assertEqual(['status: 404 is not expected', 'body: not JSON'],
+                         validator.check(404, {}, get_body))
+        with self.assertRaises(ValueError):
+            assertions.Validator({'schema': {'$ref': '#/definitions/user'}})
+
+    def test_parse_postman_tests_Script_Spec(self):
+        script = '\n'.join([
+            'pm.test("OK", function () { pm.response.to.have.status(201); });',
+            'pm.response.to.have.header("Location");',
+            "pm.response.to.have.header('Content-Type', 'application/json');",
+            'var jsonData = pm.response.json();',
+            'pm.expect(jsonData.user.name).to.eql("kim");',
+            'pm.expect(pm.response.json().items[0]).to.equal(1);',
+            'pm.environment.set("id", jsonData.id);'])
+        self.assertEqual({'status': 201,
+                          'headers': {'Location': {'exists': True},
+                                      'Content-Type': 'application/json'},
+                          'json': {'$.user.name': 'kim', '$.items[0]': 1}},
+                         assertions.parse_postman_tests(script))
+        self.assertIsNone(assertions.parse_postman_tests('pm.environment.set("a", 1);'))
+
+    def test_load_rules_File_ValidatorByIdNameDefault(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'assertions.json')
+        with open(os.path.join(tmp_dir, 'user.json'), 'w') as handle:
+            json.dump({'required': ['id']}, handle)
+        with open(path, 'w') as handle:
+            json.dump({'3': {'status': 204}, 'Read User': {'schema': 'user.json'},
+                       '*': {'status': '2xx'}}, handle)
+
+        def make_api(name, spec=None):
+            return ApiRecord((name, 'Users', 'GET', '/users', (), '', spec))
+
+        for _ in range(2):
+            rules = assertions.load_rules(path, True)
+            self.assertTrue(os.path.exists(path + '.cache'))
+            read_user = rules.get_validator(1, make_api('Read User'))
+            self.assertEqual(['schema: $.id is required'],
+                             read_user.check(200, {}, lambda: {}))
+            self.assertIs(read_user, rules.get_validator(1, make_api('Read User')))
+            self.assertEqual(['status: 200 is not expected'],
+                             rules.get_validator(3, make_api('Delete User')).check(200, {}))
+            self.assertEqual(['status: 200 is not expected'],
+                             rules.get_validator(4, make_api('Create', {'status': 201}))
+                             .check(200, {}))
+            self.assertEqual([], rules.get_validator(5, make_api('List')).check(200, {}))
+        self.assertIsNone(assertions.load_rules().get_validator(0, make_api('List')))
+
+    def test_load_rules_BadFile_ValueError(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'assertions.yaml')
+        for text in ('just text', '"3": [1, 2]', '"3": {statuss: 200}',
+                     '"3": {schema: {patternProperties: {"^a": {type: string}}}}',
+                     '"3": {json: {"$.id": {regex: "("}}}', '"3": {status: [200'):
+            with open(path, 'w') as handle:
+                handle.write(text)
+            with self.assertRaises(ValueError) as context:
+                assertions.load_rules(path)
+            self.assertIn(path, str(context.exception))
+            self.assertFalse(os.path.exists(path + '.cache'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import base64
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import auth_cache
+import postman
+import rtr
+from benchmark.stub_server import StubServer, AUTH_URI, AUTH_TOKEN_TITLE
+from benchmark.synthetic import write_collection
+
+class TestAuthCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'auth_token.cache')
+
+    def test_get_expiry_Jwt_ExpUsed(self):
+        payload = base64.urlsafe_b64encode(
+            json.dumps({'exp': 2000000000}).encode()).decode().rstrip('=')
+        token = 'eyJhbGciOiJIUzI1NiJ9.%s.sig' % (payload)
+        self.assertEqual(2000000000, auth_cache.get_expiry(token, 600))
+
+    def test_get_expiry_Header_Parsed(self):
+        expiry = auth_cache.get_expiry('token', 600, '2030-01-01T00:00:00Z')
+        self.assertEqual(1893456000, expiry)
+
+    def test_load_token_Saved_Loaded(self):
+        auth_cache.save_token(self.path, 'key', 'token', time.time() + 600)
+        self.assertEqual('token', auth_cache.load_token(self.path, 'key'))
+        self.assertIsNone(auth_cache.load_token(self.path, 'other'))
+
+    def test_load_token_Expired_None(self):
+        auth_cache.save_token(self.path, 'key', 'token', time.time() + 1)
+        self.assertIsNone(auth_cache.load_token(self.path, 'key'))
+
+    def test_remove_token_Removed(self):
+        auth_cache.save_token(self.path, 'key', 'token', time.time() + 600)
+        auth_cache.remove_token(self.path, 'key')
+        self.assertIsNone(auth_cache.load_token(self.path, 'key'))
+
+    def test_request_CachedTokenRejected_RefreshedOnce(self):
+        server = StubServer().start()
+        self.addCleanup(server.stop)
+        counts = {'auth': 0, 'api': 0}
+        issue_token, is_valid = server.issue_token, server.is_valid
+        def count_issue_token():
+            counts['auth'] += 1
+            return issue_token()
+        def count_is_valid(token):
+            counts['api'] += 1
+            return is_valid(token)
+        server.issue_token, server.is_valid = count_issue_token, count_is_valid
+
+        path = os.path.join(self.tmp_dir, 'stub.json')
+        write_collection(path, 2, [('Stub', 'Create', 'POST', '{{domain}}/fixed/0', '')])
+        auth_path = os.path.join(self.tmp_dir, 'auth.json')
+        body_path = os.path.join(self.tmp_dir, 'body.json')
+        for file_path in (auth_path, body_path):
+            with open(file_path, 'w') as handle:
+                json.dump({'name': 'sample'}, handle)
+        rtr.config = {'end_point': server.get_end_point(), 'end_point_var': '{{domain}}',
+                      'auth_uri': AUTH_URI, 'auth_body_file': auth_path,
+                      'auth_token_value': None, 'auth_token_title': AUTH_TOKEN_TITLE,
+                      'path_vars': None, 'auth_token_cache': self.path}
+        rtr.transport = None
+        rtr.auth_tokens.clear()
+        self.addCleanup(rtr.auth_tokens.clear)
+        auth_cache.save_token(self.path, rtr.get_auth_token_key(server.get_end_point()),
+                              'stale', time.time() + 600)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                rtr.request(postman.create_postman(path, False), ['0', body_path], None, False)
+            finally:
+                rtr.transport.close()
+                rtr.transport = None
+        self.assertEqual({'auth': 1, 'api': 2}, counts)
+        self.assertEqual(1, output.getvalue().count('Request Body:'))
+        self.assertIn('"method": "POST"', output.getvalue())
+        self.assertEqual('token0', auth_cache.load_token(
+            self.path, rtr.get_auth_token_key(server.get_end_point())))
+
+    def test_run_batch_AuthFailed_ErrorPerLine(self):
+        server = StubServer().start()
+        self.addCleanup(server.stop)
+        path = os.path.join(self.tmp_dir, 'stub.json')
+        write_collection(path, 2, [('Stub', 'Read', 'GET', '{{domain}}/fixed/0', '')])
+        auth_path = os.path.join(self.tmp_dir, 'auth.json')
+        with open(auth_path, 'w') as handle:
+            json.dump({'name': 'sample'}, handle)
+        batch_path = os.path.join(self.tmp_dir, 'batch.txt')
+        with open(batch_path, 'w') as handle:
+            handle.write('0\n0\n')
+        # The stub server rejects the request without a token.
+        rtr.config = {'end_point': server.get_end_point(), 'end_point_var': '{{domain}}',
+                      'auth_uri': '/denied', 'auth_body_file': auth_path,
+                      'auth_token_value': None, 'auth_token_title': AUTH_TOKEN_TITLE,
+                      'path_vars': None}
+        rtr.transport = None
+        rtr.assertion_rules = None
+        rtr.auth_tokens.clear()
+        self.addCleanup(rtr.auth_tokens.clear)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                failures = rtr.run_batch(postman.create_postman(path, False), batch_path, None)
+            finally:
+                rtr.transport.close()
+                rtr.transport = None
+        self.assertEqual(2, failures)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([1, 2], [result['line'] for result in results])
+        for result in results:
+            self.assertIn('Authentication failed! status: 401', result['error'])
+
+if __name__ == '__main__':
+    unittest.main()
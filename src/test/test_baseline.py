@@ -0,0 +1,85 @@
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import baseline
+from stats import Histogram
+
+class TestBaseline(unittest.TestCase):
+    def make_histogram(self, seed, scale, count=500):
+        generator = random.Random(seed)
+        histogram = Histogram()
+        for i in range(count):
+            histogram.record(generator.lognormvariate(0, 0.3) * scale)
+        return histogram
+
+    def test_compare_latency_Shifted_Regressed(self):
+        saved = self.make_histogram(1, 0.010)
+        same = baseline.compare_latency(saved, self.make_histogram(2, 0.010))
+        self.assertFalse(same['regressed'])
+        self.assertGreater(same['p50_p_value'], baseline.SIGNIFICANCE)
+
+        slower = baseline.compare_latency(saved, self.make_histogram(3, 0.015))
+        self.assertTrue(slower['regressed'])
+        self.assertGreater(slower['p50_change'], 40)
+
+        # Only the tail is slower.
+        tail = self.make_histogram(4, 0.010)
+        for i in range(30):
+            tail.record(0.100)
+        tail_result = baseline.compare_latency(saved, tail)
+        self.assertLess(tail_result['p99_p_value'], baseline.SIGNIFICANCE)
+        self.assertTrue(tail_result['regressed'])
+
+    def test_compare_latency_SingleRequest_ComparedWithP99(self):
+        saved = self.make_histogram(1, 0.010)
+        single = Histogram()
+        single.record(0.012)
+        self.assertFalse(baseline.compare_latency(saved, single)['regressed'])
+        single = Histogram()
+        single.record(0.050)
+        self.assertTrue(baseline.compare_latency(saved, single)['regressed'])
+
+    def test_save_baseline_OtherApis_Kept(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'baseline.json')
+        self.assertEqual({}, baseline.load_baseline(path))
+
+        samples = baseline.LatencySamples()
+        samples.record('c/f/Read', 0.010)
+        samples.merge('c/f/List', self.make_histogram(1, 0.010, 10))
+        baseline.save_baseline(path, samples)
+        samples = baseline.LatencySamples()
+        samples.record('c/f/Read', 0.020)
+        baseline.save_baseline(path, samples)
+
+        loaded = baseline.load_baseline(path)
+        self.assertEqual(['c/f/List', 'c/f/Read'], sorted(loaded))
+        self.assertEqual(10, loaded['c/f/List'].count)
+        self.assertAlmostEqual(0.020, loaded['c/f/Read'].get_percentile(50), delta=0.0002)
+        comparisons = baseline.compare_baseline(loaded, samples)
+        self.assertEqual('c/f/Read', comparisons[0][0])
+        self.assertFalse(comparisons[0][1]['regressed'])
+
+    def test_save_baseline_BrokenFile_Replaced(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'baseline.json')
+        with open(path, 'w') as handle:
+            handle.write('{"version": 1, "apis": {"c/f/Re')
+
+        samples = baseline.LatencySamples()
+        samples.record('c/f/Read', 0.010)
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            baseline.save_baseline(path, samples)
+        self.assertIn(path, stderr.getvalue())
+        self.assertEqual(['c/f/Read'], list(baseline.load_baseline(path)))
+        with open(path + '.bad') as handle:
+            self.assertEqual('{"version": 1, "apis": {"c/f/Re', handle.read())
+
+if __name__ == '__main__':
+    unittest.main()
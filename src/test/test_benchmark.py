@@ -0,0 +1,45 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from benchmark import synthetic
+from benchmark.stub_server import StubServer, AUTH_URI, AUTH_TOKEN_TITLE
+import postman
+
+class TestBenchmark(unittest.TestCase):
+    def test_write_collection_V1V2_SameApis(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        apis = synthetic.make_apis(23)
+
+        for version in (1, 2):
+            path = os.path.join(directory, 'v%d.json' % version)
+            synthetic.write_collection(path, version, apis)
+            loaded = postman.create_postman(path, False)
+            self.assertEqual(23, len(loaded))
+            loaded_apis = sorted((api.get_folder_name(), api.get_name(), api.get_method(),
+                                  api.get_uri(), api.get_request_body_sample())
+                                 for api in loaded)
+            self.assertEqual(sorted(apis), loaded_apis)
+
+    def test_StubServer_Token_Authorized(self):
+        server = StubServer().start()
+        self.addCleanup(server.stop)
+        end_point = server.get_end_point()
+
+        with self.assertRaises(HTTPError) as context:
+            urlopen(end_point + '/fixed/0')
+        self.assertEqual(401, context.exception.code)
+
+        with urlopen(Request(end_point + AUTH_URI, b'{}', method='POST')) as response:
+            token = response.headers[AUTH_TOKEN_TITLE]
+        with urlopen(Request(end_point + '/large/2', headers={AUTH_TOKEN_TITLE: token})) as response:
+            body = response.read()
+        self.assertLessEqual(abs(len(body) - 2048), 100)
+        self.assertIsInstance(json.loads(body), list)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+import daemon
+
+def handle(argv):
+    print("argv: %s" % ' '.join(argv))
+    sys.stderr.write("cwd: %s\n" % os.getcwd())
+    if argv[0] == 'fail':
+        sys.exit(3)
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.socket_path = daemon.get_socket_path(os.path.join(self.directory, 'config.yaml'))
+
+    def start_server(self):
+        server = daemon.create_server(self.socket_path, handle)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(os.chdir, self.cwd)
+
+    def test_forward_Running_OutputForwarded(self):
+        self.start_server()
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        status = daemon.forward(self.socket_path, ['-n', 'server'], stdout, stderr)
+        self.assertEqual(0, status)
+        self.assertEqual(b"argv: -n server\n", stdout.getvalue())
+        self.assertEqual(("cwd: %s\n" % os.getcwd()).encode(), stderr.getvalue())
+
+        status = daemon.forward(self.socket_path, ['fail'], io.BytesIO(), io.BytesIO())
+        self.assertEqual(3, status)
+
+    def test_handle_connection_ClientDirectory_Restored(self):
+        server_sock, client_sock = socket.socketpair()
+        self.addCleanup(server_sock.close)
+        self.addCleanup(client_sock.close)
+        command = {'argv': ['-l'], 'cwd': self.directory}
+        daemon.write_frame(client_sock, daemon.CHANNEL_REQUEST, json.dumps(command).encode())
+        daemon.handle_connection(server_sock, handle)
+        self.assertEqual(self.cwd, os.getcwd())
+
+        server_sock.close()
+        frames = []
+        reader = client_sock.makefile('rb')
+        channel, payload = daemon.read_frame(reader)
+        while channel is not None:
+            frames.append((channel, payload))
+            channel, payload = daemon.read_frame(reader)
+        cwd = "cwd: %s\n" % os.path.realpath(self.directory)
+        self.assertIn((daemon.CHANNEL_STDERR, cwd.encode()), frames)
+        self.assertEqual((daemon.CHANNEL_EXIT, b'0'), frames[-1])
+
+    def test_forward_NotRunning_None(self):
+        self.assertIsNone(daemon.forward(self.socket_path, ['-l']))
+        self.assertFalse(daemon.is_running(self.socket_path))
+
+    def test_create_server_Running_Error(self):
+        self.start_server()
+        self.assertTrue(daemon.is_running(self.socket_path))
+        with self.assertRaises(FileExistsError):
+            daemon.create_server(self.socket_path, handle)
+
+if __name__ == '__main__':
+    unittest.main()
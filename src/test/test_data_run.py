@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import data_run
+
+class TestDataRun(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as handle:
+            handle.write(text)
+        return path
+
+    def test_RequestTemplate_Row_Rendered(self):
+        template = data_run.RequestTemplate('http://host/v1/{{TENANT}}/users/{user_id}?fixed=1',
+                                            '{"name": "{{name}}", "age": {{age}}}')
+        uri, body = template.render({'user_id': 'a b', 'name': 'kim', 'age': 30,
+                                     'query': 'detail=true'})
+        self.assertEqual('http://host/v1/{{TENANT}}/users/a%20b?fixed=1&detail=true', uri)
+        self.assertEqual('{"name": "kim", "age": 30}', body)
+
+        uri, body = template.render({'TENANT': 't1', 'body': {'name': 'lee'}})
+        self.assertEqual('http://host/v1/t1/users/{user_id}?fixed=1', uri)
+        self.assertEqual('{"name": "lee"}', body)
+        self.assertIsNone(data_run.RequestTemplate('http://host/v1').render({})[1])
+
+    def test_read_rows_CsvJsonl_SameRows(self):
+        csv_path = self.write('rows.csv', 'user_id,query\n1,a=1\n2,\n')
+        jsonl_path = self.write('rows.jsonl', '{"user_id": "1", "query": "a=1"}\n\n'
+                                              '{"user_id": "2", "query": ""}\n')
+        expected = [(1, {'user_id': '1', 'query': 'a=1'}), (2, {'user_id': '2', 'query': ''})]
+        self.assertEqual(expected, list(data_run.read_rows(csv_path)))
+        self.assertEqual(expected, list(data_run.read_rows(jsonl_path)))
+
+    def test_run_rows_Concurrent_OrderedAndBounded(self):
+        lock = threading.Lock()
+        state = {'running': 0, 'max': 0}
+        def send(row):
+            with lock:
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+            time.sleep(0.001 * (row['value'] % 3))
+            with lock:
+                state['running'] -= 1
+            if row['value'] % 10 == 0:
+                raise ValueError('failed')
+            return {'status': 200 if row['value'] % 7 else 500}
+
+        results = []
+        rows = ((i, {'value': i}) for i in range(1, 51))
+        count, failures = data_run.run_rows(rows, send, results.append, 4)
+        self.assertEqual(50, count)
+        self.assertEqual(12, failures)
+        self.assertEqual(list(range(1, 51)), [result['row'] for result in results])
+        self.assertEqual('failed', results[9]['error'])
+        self.assertLessEqual(state['max'], 4)
+
+    def test_find_last_row_PartialLine_Truncated(self):
+        path = self.write('results.jsonl', '{"row": 1}\n{"row": 2}\n{"ro')
+        self.assertEqual(2, data_run.find_last_row(path))
+        with open(path) as handle:
+            self.assertEqual('{"row": 1}\n{"row": 2}\n', handle.read())
+        self.assertEqual(0, data_run.find_last_row(os.path.join(self.tmp_dir, 'none')))
+
+if __name__ == '__main__':
+    unittest.main()
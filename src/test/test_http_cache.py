@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+import http_cache
+
+def make_response(content, headers):
+    r = Response()
+    r.status_code = 200
+    r.headers = CaseInsensitiveDict(headers)
+    r._content = content
+    return r
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_lookup_Stored_Validators(self):
+        cache = http_cache.ResponseCache(self.path, 1024 * 1024)
+        key = http_cache.get_cache_key('http://host/a', {'Accept': 'application/json'})
+        self.assertTrue(cache.store(key, make_response(b'body', {'ETag': '"1"'})))
+
+        entry = cache.lookup(key)
+        self.assertFalse(entry.is_fresh())
+        self.assertEqual({'If-None-Match': '"1"'}, entry.get_validators())
+        self.assertEqual(b'body', entry.to_response('http://host/a').content)
+
+    def test_store_MaxAge_Fresh(self):
+        cache = http_cache.ResponseCache(self.path, 1024 * 1024)
+        cache.store('key', make_response(b'body', {'Cache-Control': 'public, max-age=60'}))
+        self.assertTrue(cache.lookup('key').is_fresh())
+
+    def test_store_NoStoreOrNoValidator_NotStored(self):
+        cache = http_cache.ResponseCache(self.path, 1024 * 1024)
+        self.assertFalse(cache.store('a', make_response(b'body', {'Cache-Control': 'no-store', 'ETag': '"1"'})))
+        self.assertFalse(cache.store('b', make_response(b'body', {})))
+        self.assertIsNone(cache.lookup('a'))
+
+    def test_evict_OverSize_LeastRecentlyUsedRemoved(self):
+        cache = http_cache.ResponseCache(self.path, 2500)
+        for key in ('a', 'b'):
+            cache.store(key, make_response(b'x' * 1000, {'ETag': '"1"'}))
+            os.utime(cache.get_paths(key)[0], (time.time() - 100, time.time() - 100))
+        cache.lookup('a')
+        cache.store('c', make_response(b'x' * 1000, {'ETag': '"1"'}))
+        self.assertIsNotNone(cache.lookup('a'))
+        self.assertIsNone(cache.lookup('b'))
+        self.assertIsNotNone(cache.lookup('c'))
+
+if __name__ == '__main__':
+    unittest.main()
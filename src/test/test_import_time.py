@@ -0,0 +1,53 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = os.path.join(SRC_DIR, 'test')
+
+# Modules of the HTTP stack and YAML never imported by offline commands.
+HEAVY_MODULES = ('requests', 'urllib3', 'yaml', 'http.client', 'charset_normalizer', 'chardet')
+# Microseconds to import all modules of rtr.py except the interpreter start up.
+IMPORT_BUDGET = 100000
+STARTUP_MODULES = ('site', 'encodings', '_frozen_importlib_external', 'zipimport')
+
+class TestImportTime(unittest.TestCase):
+    def run_importtime(self, config_path, *parameters):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', os.path.join(SRC_DIR, 'rtr.py'),
+             '-c', config_path] + list(parameters),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=SRC_DIR,
+            universal_newlines=True, check=True)
+        modules = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_time, cumulative, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (len(name) - len(name.lstrip()), int(cumulative))
+        return modules
+
+    def test_offline_commands_HttpStackNotImported(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        postman_path = os.path.join(tmp_dir, 'postman.json')
+        shutil.copy(os.path.join(TEST_DIR, 'postman.json'), postman_path)
+        config_path = os.path.join(tmp_dir, 'config.yaml')
+        with open(config_path, 'w') as handle:
+            handle.write('end_point: http://127.0.0.1\npostman_file: %s\n'
+                         'end_point_var: "{{domain}}"\n' % (postman_path))
+
+        # The first run builds caches.
+        self.run_importtime(config_path, '-l')
+        for parameters in (['-l'], ['-n', 'server'], ['-a', 'image'], ['-e', '0']):
+            modules = self.run_importtime(config_path, *parameters)
+            for name in HEAVY_MODULES:
+                self.assertNotIn(name, modules, parameters)
+            total = sum(cumulative for name, (depth, cumulative) in modules.items()
+                        if depth == 1 and name not in STARTUP_MODULES)
+            self.assertLess(total, IMPORT_BUDGET, parameters)
+
+if __name__ == '__main__':
+    unittest.main()
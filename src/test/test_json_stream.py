@@ -0,0 +1,56 @@
+import io
+import json
+import unittest
+import json_stream
+
+class TestJsonStream(unittest.TestCase):
+    def test_pretty_print_chunks_AnyChunkSize_SameAsDumps(self):
+        documents = [
+            {"a": [1, 2, {"b": "x\"y,}", "c": []}], "d": {}, "e": None, "f": -1.5e10},
+            {"a": {"b": [1, {"c": "d\\\\"}], "e": {}}, "f": [[], {}]},
+            [], {}, [[[]]], "text", 12345
+        ]
+        for document in documents:
+            expected = json.dumps(document, indent=2) + '\n'
+            for raw in (json.dumps(document), json.dumps(document, indent=4),
+                        json.dumps(document, separators=(',', ':'))):
+                data = raw.encode('utf-8')
+                for size in (1, 2, 3, 7, 100):
+                    output = []
+                    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+                    json_stream.pretty_print_chunks(chunks, output.append)
+                    self.assertEqual(expected, ''.join(output))
+
+    def test_pretty_print_chunks_Utf8Split_Decoded(self):
+        data = json.dumps({"name": "한글"}, ensure_ascii=False).encode('utf-8')
+        output = []
+        json_stream.pretty_print_chunks([data[i:i + 1] for i in range(len(data))],
+                                        output.append)
+        self.assertEqual('{\n  "name": "한글"\n}\n', ''.join(output))
+
+    def test_JsonReader_AnyReadSize_SelectedValues(self):
+        document = {"a": [1, {"b": "x\"]}"}], "n": -12.5e3, "t": True,
+                    "k\"ey": {"c": [[], {}]}, "s": "long" * 100, "z": 123456}
+        text = json.dumps(document)
+        for read_size in (1, 3, 64, 100000):
+            reader = json_stream.JsonReader(io.StringIO(text), read_size)
+            values = {}
+            for key in reader.iter_object():
+                if key == 'a':
+                    values[key] = [reader.read_value() for _ in reader.iter_array()]
+                elif key in ('n', 'k"ey', 'z'):
+                    values[key] = reader.read_value()
+                else:
+                    reader.skip_value()
+            self.assertEqual({"a": document["a"], "n": -12.5e3, "k\"ey": document["k\"ey"],
+                              "z": 123456}, values)
+            self.assertEqual('', reader.peek())
+
+    def test_JsonReader_Invalid_Error(self):
+        reader = json_stream.JsonReader(io.StringIO('{"a": 1 "b": 2}'), 4)
+        with self.assertRaises(ValueError):
+            for key in reader.iter_object():
+                reader.read_value()
+
+if __name__ == '__main__':
+    unittest.main()
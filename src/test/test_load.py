@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import load
+import stats
+
+class TestLoad(unittest.TestCase):
+    def test_Histogram_Percentiles_Within1Percent(self):
+        histogram = stats.Histogram()
+        for i in range(1, 10001):
+            histogram.record(i / 1000.0)
+        self.assertEqual(10000, histogram.count)
+        for percentile in (50, 90, 99):
+            expected = percentile / 10.0
+            self.assertAlmostEqual(expected, histogram.get_percentile(percentile),
+                                   delta=expected * 0.01)
+        self.assertEqual(10.0, histogram.get_percentile(100))
+
+    def test_Histogram_Merged_SameAsOne(self):
+        one = stats.Histogram()
+        first = stats.Histogram()
+        second = stats.Histogram()
+        for i in range(1, 1001):
+            one.record(i / 1000.0)
+            (first if i % 2 else second).record(i / 1000.0)
+        first.merge(stats.histogram_from_dict(second.to_dict()))
+        self.assertEqual(one.to_dict(), first.to_dict())
+
+    def test_run_closed_loop_Count_AllCounted(self):
+        lock = threading.Lock()
+        calls = []
+        def send():
+            with lock:
+                calls.append(1)
+                failed = len(calls) % 10 == 0
+            if failed:
+                raise ValueError()
+            return 200
+        result = load.run_closed_loop(send, 100, 4)
+        self.assertEqual(100, result.count_requests())
+        self.assertEqual({'ValueError': 10}, result.errors)
+        self.assertEqual({200: 90}, result.statuses)
+
+    def test_run_closed_loop_AssertionFailures_Counted(self):
+        def send():
+            return 500, ['status', 'json $.id']
+        result = load.run_closed_loop(send, 10, 2)
+        self.assertEqual(10, result.assertion_failures)
+        self.assertEqual({'status': 10, 'json $.id': 10}, result.to_dict()['assertions'])
+
+    def test_iter_arrivals_Stages_FixedTimeline(self):
+        schedule = load.make_schedule(load.parse_stages('2:100'), 50, 1)
+        self.assertEqual([(2.0, 0.0, 100.0), (1, 50, 50)], schedule)
+        arrivals = list(load.iter_arrivals(schedule))
+        self.assertEqual(150, len(arrivals))
+        self.assertEqual(0, arrivals[0])
+        self.assertAlmostEqual(2.0, arrivals[100], places=6)
+        self.assertAlmostEqual(2.02, arrivals[101], places=6)
+        self.assertEqual(arrivals, sorted(arrivals))
+        self.assertRaises(ValueError, load.make_schedule, None, 50, None)
+        self.assertRaises(ValueError, load.parse_stages, '2s:100')
+
+    def test_run_open_loop_Stalled_LatencyFromIntendedTime(self):
+        calls = []
+        def send():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.1)
+            return 200
+        result = load.run_open_loop(send, load.make_schedule(rate=100, duration=0.2), 1)
+        data = result.to_dict()
+        self.assertEqual(20, data['requests'] + data['dropped'])
+        self.assertGreater(data['late'], 5)
+        # Requests queued behind the stall are counted from their intended times.
+        self.assertGreater(data['latency_ms']['p90'], data['service_time_ms']['p90'] + 40)
+
+    def test_run_processes_Results_Merged(self):
+        def run(index, report):
+            def send():
+                return 200 if index == 0 else (500, ['status'])
+            return load.run_closed_loop(send, load.split_count(11, 2, index), 2, report=report)
+        result = load.run_processes(run, 2)
+        self.assertEqual({200: 6, 500: 5}, result.statuses)
+        self.assertEqual(11, result.histogram.count)
+        self.assertEqual({'status': 5}, result.assertions)
+
+        def fail(index, report):
+            raise ValueError('bad')
+        self.assertRaises(RuntimeError, load.run_processes, fail, 2)
+
+    def test_run_processes_NoFork_RuntimeError(self):
+        error = ValueError("cannot find context for 'fork'")
+        with mock.patch('multiprocessing.get_context', side_effect=error), \
+                mock.patch('multiprocessing.get_all_start_methods', return_value=['spawn']):
+            self.assertFalse(load.can_fork())
+            self.assertRaises(RuntimeError, load.run_processes, lambda index, report: None, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import os
+import re
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from urllib.request import urlopen
+import archive
+import mock
+from api import ApiRecord
+
+def make_api(method, uri):
+    return ApiRecord(('API', 'Folder', method, uri, (), '', None))
+
+class TestMock(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'recordings.archive')
+
+    def test_load_latest_records_Appended_LatestKept(self):
+        for body in (b'old', b'new'):
+            archive.append_record(self.path, 'GET', '/v1/users/1', 'GET /v1/users/{id}', 200,
+                                  {'Content-Type': 'text/plain', 'Content-Length': '3'}, body)
+        archive.append_record(self.path, 'GET', '/v1/users/2', 'GET /v1/users/{id}', 404, {}, b'')
+        # A partially written record is ignored.
+        with open(self.path, 'ab') as handle:
+            handle.write(archive.RECORD_HEADER.pack(2, 100) + b'{}' + b'partial')
+
+        uris, routes = archive.load_latest_records(self.path)
+        meta, body = uris['GET /v1/users/1']
+        self.assertEqual(b'new', body)
+        self.assertEqual([['Content-Type', 'text/plain']], meta['headers'])
+        self.assertEqual(404, routes['GET /v1/users/{id}'][0]['status'])
+        self.assertEqual(['GET /v1/users/1', 'GET /v1/users/2'], sorted(uris))
+        self.assertTrue(os.path.exists(self.path + '.index'))
+
+    def test_MockRouter_Request_MatchedByUriAndTemplate(self):
+        archive.append_record(self.path, 'GET', '/v1/users/1?detail=true', 'GET /v1/users/{id}',
+                              200, {}, b'recorded')
+        apis = [make_api('GET', '{{URL}}/v1/users/{id}'),
+                make_api('GET', '{{URL}}/v1/users/me'),
+                make_api('POST', '{{HOST}}/{{TENANT}}/servers?name=')]
+        examples = [None, (200, [('Content-Type', 'application/json')], '{"me": true}'), None]
+        router = mock.build_router(apis, examples, '{{URL}}', '{"{{HOST}}": "http://h:1/v2"}',
+                                   self.path, '/auth/tokens', 'X-Auth-Token')
+
+        self.assertEqual(b'recorded', router.match('GET', '/v1/users/1?detail=true')[1])
+        self.assertEqual(b'recorded', router.match('GET', '/v1/users/7')[1])
+        self.assertEqual(b'{"me": true}', router.match('GET', '/v1/users/me')[1])
+        self.assertEqual(b'{}', router.match('POST', '/v2/t1/servers')[1])
+        self.assertIn(b'X-Auth-Token: mock-token', router.match('POST', '/auth/tokens')[0])
+        self.assertIn(b' 404 ', router.match('DELETE', '/v1/users/7')[0])
+
+    def test_serve_Requests_KeepAliveAndLatency(self):
+        router = mock.MockRouter()
+        router.add_template('GET', '/v1/users/{id}', mock.make_response(200, [], 'user'))
+        sock = mock.create_socket('127.0.0.1', 0)
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        state = {}
+
+        async def serve():
+            server = await loop.create_server(
+                lambda: mock.MockProtocol(router, mock.parse_latency('1-2'),
+                                          mock.random.Random(0)), sock=sock)
+            state['stopping'] = asyncio.Event()
+            started.set()
+            async with server:
+                await state['stopping'].wait()
+        thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+        thread.start()
+        started.wait()
+        end_point = 'http://127.0.0.1:%d' % sock.getsockname()[1]
+
+        with urlopen(end_point + '/v1/users/3') as response:
+            self.assertEqual(b'user', response.read())
+
+        # Pipelined requests are responded in order, and request bodies are skipped.
+        client = socket.create_connection(sock.getsockname())
+        client.sendall(b'POST /v1/users/1 HTTP/1.1\r\nContent-Length: 4\r\n\r\nbody'
+                       b'GET /v1/users/1 HTTP/1.1\r\n\r\nGET /none HTTP/1.1\r\n'
+                       b'Connection: close\r\n\r\n')
+        data = b''
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        client.close()
+        self.assertEqual([b'404', b'200', b'404'], re.findall(rb'HTTP/1.1 (\d+)', data))
+        self.assertIn(b'\r\n\r\nuserHTTP/1.1 404 Not Found', data)
+        loop.call_soon_threadsafe(state['stopping'].set)
+        thread.join()
+        loop.close()
+
+    def test_serve_mock_CantFork_OneWorker(self):
+        self.addCleanup(signal.signal, signal.SIGTERM, signal.getsignal(signal.SIGTERM))
+        workers = []
+        def run_worker(sock, router, latency, index):
+            workers.append(index)
+        stderr = io.StringIO()
+        with patch.object(mock, 'can_fork', return_value=False), \
+                patch.object(mock, 'run_worker', run_worker), \
+                patch.object(mock.os, 'fork', side_effect=AssertionError('forked')), \
+                patch('sys.stderr', stderr):
+            mock.serve_mock(mock.MockRouter(), port=0, workers=3)
+        self.assertEqual([0], workers)
+        self.assertIn("can't be forked", stderr.getvalue())
+        self.assertIn('(1 workers)', stderr.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+import multipart
+
+class TestMultipart(unittest.TestCase):
+    def test_MultipartFile_Read_LengthMatched(self):
+        handle, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        content = os.urandom(200000)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(content)
+
+        with multipart.MultipartFile('file', path) as body:
+            data = b''.join(iter(lambda: body.read(7000), b''))
+            self.assertEqual(len(body), len(data))
+            self.assertIn(b'name="file"', data)
+            self.assertIn(b'\r\n\r\n' + content + b'\r\n--' + body.boundary.encode(), data)
+            self.assertTrue(data.endswith(('--%s--\r\n' % body.boundary).encode()))
+            self.assertIn(body.boundary, body.get_content_type())
+        self.assertTrue(body.handle.closed)
+
+    def test_MultipartFile_NoFile_Empty(self):
+        body = multipart.MultipartFile('file', '')
+        self.assertEqual(len(body), len(body.read()))
+
+if __name__ == '__main__':
+    unittest.main()
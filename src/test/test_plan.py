@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import plan
+from api import ApiRecord
+
+class Postman:
+    def __init__(self, apis):
+        self.apis = apis
+
+    def find_index(self, api_id):
+        return int(api_id)
+
+    def get_api(self, api_id):
+        return self.apis[int(api_id)]
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as handle:
+            handle.write(text)
+        return path
+
+    def make_config(self):
+        environment = self.write('env.json', json.dumps({'name': 'dev', 'values': [
+            {'key': 'tenant', 'value': 't1', 'enabled': True},
+            {'key': 'region', 'value': 'kr', 'enabled': True},
+            {'key': 'off', 'value': 'x', 'enabled': False}]}))
+        return {'end_point': 'http://host', 'end_point_var': '{{domain}}',
+                'path_vars': '{"{{region}}": "us"}', 'environment_file': environment}
+
+    def test_RequestPlan_Parameters_Resolved(self):
+        api = ApiRecord(('Read', 'Users', 'GET', '{{domain}}/v1/{{tenant}}/{{region}}/users/{id}?a=1',
+                         {'X-Tenant': '{{tenant}}', 'X-Off': '{{off}}'}, '', None))
+        request_plan = plan.RequestPlans(self.make_config()).get_plan(Postman([api]), '0')
+        self.assertEqual(('http://host/v1/t1/us/users/{id}', None), request_plan.resolve([]))
+        self.assertEqual(('http://host/v1/t1/us/users/a\\1?b=2', 'body.json'),
+                         request_plan.resolve(['a\\1', 'b=2', 'body.json']))
+        self.assertEqual(('http://host/v1/t1/us/users/7', 'body.json'),
+                         request_plan.resolve(['7', 'body.json']))
+        self.assertEqual({'X-Tenant': 't1', 'X-Off': '{{off}}'}, request_plan.get_headers())
+        self.assertEqual('GET /v1/t1/us/users/{id}', request_plan.get_route())
+
+    def test_RequestPlans_get_plan_IdTypes_CachedOnce(self):
+        api = ApiRecord(('Read', 'Users', 'GET', '{{domain}}/users', {}, '', None))
+        plans = plan.RequestPlans(self.make_config())
+        postman = Postman([api])
+        self.assertIs(plans.get_plan(postman, '0'), plans.get_plan(postman, 0))
+        self.assertEqual([0], list(plans.plans))
+
+    def test_RequestPlans_Body_SubstitutedOnce(self):
+        plans = plan.RequestPlans(self.make_config())
+        path = self.write('body.json', '{"tenant": "{{tenant}}", "name": "{{name}}"}')
+        body = plans.get_body(path)
+        self.assertEqual(b'{"tenant": "t1", "name": "{{name}}"}', body)
+        self.assertIs(body, plans.get_body(path))
+
+        plan.BODY_SIZE_LIMIT, limit = 10, plan.BODY_SIZE_LIMIT
+        self.addCleanup(setattr, plan, 'BODY_SIZE_LIMIT', limit)
+        self.assertIsNone(plans.get_body(self.write('large.json', '{"a": "0123456789"}')))
+
+    def test_RequestPlans_LargeBody_SubstitutedByChunks(self):
+        plans = plan.RequestPlans(self.make_config())
+        text = '{"tenant": "{{tenant}}", "region": "{{region}}", "name": "{{name}}", "t": "{{t"}'
+        path = self.write('large.json', text * 5)
+        expected = plans.get_body(path)
+        self.assertNotIn(b'{{tenant}}', expected)
+
+        plan.BODY_SIZE_LIMIT, limit = 10, plan.BODY_SIZE_LIMIT
+        self.addCleanup(setattr, plan, 'BODY_SIZE_LIMIT', limit)
+        path = self.write('larger.json', text * 5)
+        self.assertIsNone(plans.get_body(path))
+        # Placeholders are split between chunks of every size.
+        for chunk_size in range(1, 12):
+            self.assertEqual(expected, b''.join(plans.iter_body(path, chunk_size)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import postman
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class TestPostman(unittest.TestCase):
+    def test_create_postman_V2_Flattened(self):
+        pm = postman.create_postman(os.path.join(TEST_DIR, 'postman.json'))
+        self.assertEqual(71, pm.count_apis())
+        self.assertEqual(pm.count_apis(), len(list(pm)))
+        self.assertEqual('[Token] Create', pm.get_api(0).get_name())
+        self.assertEqual('Identity', pm.get_api(0).get_folder_name())
+        self.assertIs(pm.get_api(70), list(pm)[70])
+
+    def test_create_postman_V1_FolderResolved(self):
+        root_json = {
+            'folders': [{'id': 'f1', 'name': 'Users'}],
+            'requests': [
+                {'name': 'List User', 'method': 'GET', 'folder': 'f1',
+                 'url': '{{domain}}/v1/users', 'rawModeData': ''},
+                {'name': 'Root', 'method': 'GET',
+                 'url': '{{domain}}/', 'rawModeData': ''}
+            ]
+        }
+        pm = postman.PostmanV1(root_json)
+        self.assertEqual(2, pm.count_apis())
+        self.assertEqual('Users', pm.get_api(0).get_folder_name())
+        self.assertEqual('', pm.get_api(1).get_folder_name())
+
+    def test_read_root_json_V2_ResponsesDropped(self):
+        request = {'method': 'GET', 'header': [], 'url': {'raw': '{{domain}}/v1/users'}}
+        root_json = {
+            'info': {'name': 'Users'},
+            'item': [{'name': 'Users', 'description': 'Folder',
+                      'item': [{'name': 'List User', 'request': request,
+                                'event': [{'listen': 'test', 'script': {'exec': ['']}}],
+                                'response': [{'name': 'OK', 'body': '[]' * 1000}]}]}]
+        }
+        read = postman.read_root_json(io.StringIO(json.dumps(root_json)))
+        # Events are kept for Postman tests.
+        self.assertEqual({'item': [{'name': 'Users',
+                                    'item': [{'name': 'List User', 'request': request,
+                                              'event': root_json['item'][0]['item'][0]['event']}]}]},
+                         read)
+
+        pm = postman.PostmanV2(read)
+        self.assertFalse(hasattr(pm, 'root_json'))
+        self.assertFalse(hasattr(pm.get_api(0), '__dict__'))
+        self.assertEqual('{{domain}}/v1/users', pm.get_api(0).get_uri())
+
+    def test_get_api_OutOfRange_Exit(self):
+        pm = postman.PostmanV1({'requests': []})
+        with self.assertRaises(SystemExit):
+            pm.get_api(0)
+
+    def test_create_postman_Catalog_SameApis(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'postman.json')
+        shutil.copy(os.path.join(TEST_DIR, 'postman.json'), path)
+
+        loaded = postman.create_postman(path)
+        self.assertTrue(os.path.exists(path + '.cache'))
+        cached = postman.create_postman(path)
+        self.assertIsInstance(cached, postman.PostmanCatalog)
+        self.assertEqual(loaded.count_apis(), cached.count_apis())
+        for a, b in zip(loaded, cached):
+            self.assertEqual(a.get_name(), b.get_name())
+            self.assertEqual(a.get_folder_name(), b.get_folder_name())
+            self.assertEqual(a.get_method(), b.get_method())
+            self.assertEqual(a.get_uri(), b.get_uri())
+            self.assertEqual(a.get_headers(), b.get_headers())
+            self.assertEqual(a.get_request_body_sample(),
+                             b.get_request_body_sample())
+
+        # Changed Postman file invalidates the catalog.
+        os.utime(path, ns=(0, 0))
+        self.assertNotIsInstance(postman.create_postman(path),
+                                 postman.PostmanCatalog)
+
+    def test_load_postman_Glob_Merged(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        for name in ('compute', 'network'):
+            shutil.copy(os.path.join(TEST_DIR, 'postman.json'),
+                        os.path.join(tmp_dir, name + '.postman.json'))
+        pattern = os.path.join(tmp_dir, '*.json')
+        single = postman.create_postman(os.path.join(TEST_DIR, 'postman.json'), False)
+        count = single.count_apis()
+
+        group = postman.load_postman(pattern)
+        self.assertIsInstance(group, postman.PostmanGroup)
+        self.assertEqual(count * 2, group.count_apis())
+        self.assertEqual('compute:0', group.get_id(0))
+        self.assertEqual('network:1', group.get_id(count + 1))
+        self.assertEqual(count + 1, group.find_index('network:1'))
+        self.assertEqual(count, group.find_index(count))
+        self.assertEqual(-1, group.find_index('network:%d' % count))
+        self.assertEqual(-1, group.find_index('storage:0'))
+        self.assertEqual(single.get_api(1).get_uri(), group.get_api('network:1').get_uri())
+
+        # Only the changed collection is parsed again.
+        network_catalog = os.path.join(tmp_dir, 'network.postman.json.cache')
+        os.utime(network_catalog, ns=(0, 0))
+        os.utime(os.path.join(tmp_dir, 'compute.postman.json'), ns=(0, 0))
+        group = postman.load_postman([pattern])
+        self.assertEqual(count * 2, group.count_apis())
+        self.assertEqual(0, os.stat(network_catalog).st_mtime_ns)
+        self.assertIsInstance(postman.load_postman(pattern), postman.PostmanGroup)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+import retry
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class TestRetry(unittest.TestCase):
+    def test_parse_retry_after_SecondsOrDate_Parsed(self):
+        self.assertEqual(5.0, retry.parse_retry_after(' 5 '))
+        self.assertEqual(10.0, retry.parse_retry_after('Thu, 01 Jan 1970 00:00:20 GMT', 10))
+        self.assertEqual(0.0, retry.parse_retry_after('Thu, 01 Jan 1970 00:00:20 GMT', 30))
+        self.assertIsNone(retry.parse_retry_after('soon'))
+        self.assertIsNone(retry.parse_retry_after(None))
+
+    def test_RetryPolicy_call_Unavailable_Retried(self):
+        policy = retry.RetryPolicy((ConnectionError,), attempts=3, backoff=0.001)
+        responses = [Response(503, {'Retry-After': '0'}), Response(200)]
+        sent = []
+        def send():
+            sent.append(1)
+            if len(sent) == 1:
+                raise ConnectionError()
+            return responses[len(sent) - 2]
+        response = policy.call('GET', 'GET /a', send, lambda: None)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(responses[0].closed)
+        counts = policy.stats.to_dict()
+        self.assertEqual(1, counts['retried_requests'])
+        self.assertEqual({'ConnectionError': 1, '503': 1}, counts['retries'])
+
+        # POST is not retried, and a long Retry-After is returned.
+        self.assertEqual(503, policy.call('POST', 'POST /a', lambda: Response(503), lambda: None)
+                         .status_code)
+        response = policy.call('GET', 'GET /a', lambda: Response(503, {'Retry-After': '60'}),
+                               lambda: None)
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(2, sum(policy.stats.to_dict()['retries'].values()))
+        self.assertIn('1 requests retried 2 times', retry.format_retry_stats(policy.stats.to_dict()))
+
+    def test_RetryPolicy_call_SlowFirst_HedgeWins(self):
+        policy = retry.RetryPolicy((ConnectionError,), hedge=True, hedge_delay=0.01)
+        self.addCleanup(policy.close)
+        released = threading.Event()
+        self.addCleanup(released.set)
+        responses = [Response(200), Response(200)]
+        sent = []
+        def send():
+            sent.append(1)
+            if len(sent) == 1:
+                released.wait(5)
+                return responses[0]
+            return responses[1]
+        start = time.perf_counter()
+        self.assertIs(responses[1], policy.call('GET', 'GET /a', send, lambda: None))
+        self.assertLess(time.perf_counter() - start, 1)
+        # The first request is still running, so the saving is not known yet.
+        self.assertEqual('Hedges: 1 sent, 1 won', retry.format_retry_stats(policy.stats.to_dict()))
+        released.set()
+        policy.close()
+        policy.executor.shutdown(wait=True)
+        self.assertTrue(responses[0].closed)
+        counts = policy.stats.to_dict()
+        self.assertEqual((1, 1, 1), (counts['hedges'], counts['hedges_won'],
+                                     counts['hedges_measured']))
+        self.assertGreater(counts['hedge_saved_ms'], 0)
+        self.assertIn('ms saved on average', retry.format_retry_stats(counts))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
 import unittest
 import rtr
 import api
+import postman
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
 class TestRtr(unittest.TestCase):
     def test_print_api_Api_Print(self):
@@ -41,5 +45,23 @@ class TestRtr(unittest.TestCase):
         self.assertTrue(api_obj != None)
         rtr.print_api(10, api_obj)
 
+    def test_parse_batch_line_Formats_Parsed(self):
+        rtr.config = {'end_point_var': ''}
+        pm = postman.create_postman(os.path.join(TEST_DIR, 'postman.json'), False)
+        self.assertEqual((['4', '77', 'a=b c'], None),
+                         rtr.parse_batch_line(pm, "4 77 'a=b c'"))
+        self.assertEqual((['4', '77'], None),
+                         rtr.parse_batch_line(pm, '["4", 77]'))
+        self.assertEqual((['4', '77'], 'file'),
+                         rtr.parse_batch_line(pm, '{"parameters": ["[Tenant] Detail", "77"], "multipart": "file"}'))
+        with self.assertRaises(ValueError):
+            rtr.parse_batch_line(pm, '1000')
+
+    def test_find_folder_indexes_CaseInsensitive(self):
+        pm = postman.create_postman(os.path.join(TEST_DIR, 'postman.json'), False)
+        indexes = rtr.find_folder_indexes(pm, 'identity')
+        self.assertEqual(list(range(0, 10)), indexes)
+        self.assertEqual([], rtr.find_folder_indexes(pm, 'nothing'))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+import unittest
+import postman
+import search
+from api import ApiRecord
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class Apis(list):
+    search_index = None
+    catalog_key = None
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.postman = postman.create_postman(
+            os.path.join(TEST_DIR, 'postman.json'), False)
+
+    def test_search_apis_Words_Ranked(self):
+        indexes = search.search_apis(self.postman, 'server list')
+        self.assertTrue(indexes)
+        self.assertEqual('[Server] List',
+                         self.postman.get_api(indexes[0]).get_name())
+
+    def test_search_apis_Prefix_Matched(self):
+        indexes = search.search_apis(self.postman, 'serv', (search.FIELD_NAME,))
+        self.assertTrue(indexes)
+        for i in indexes:
+            self.assertIn('serv', self.postman.get_api(i).get_name().lower())
+
+    def test_search_apis_PartOfWord_Matched(self):
+        apis = Apis([ApiRecord(('Image Management', 'Images', 'GET', '{{domain}}/v2/a', {}, '', None)),
+                     ApiRecord(('List Image', 'Images', 'GET', '{{domain}}/v2/images', {}, '', None)),
+                     ApiRecord(('List Servers', 'Servers', 'GET', '{{domain}}/v2/servers', {}, '', None))])
+        # 'mage' is the prefix of 'management', and a part of 'image'.
+        self.assertEqual([0, 1], search.search_apis(apis, 'mage', (search.FIELD_NAME,)))
+        self.assertEqual(search.regex_search(apis, 'mage'), sorted(search.search_apis(apis, 'mage')))
+
+    def test_search_apis_EndPointVar_NotIndexed(self):
+        apis = Apis([ApiRecord(('Read', 'Domains', 'GET', '{{domain}}/v2/a', {}, '', None)),
+                     ApiRecord(('List Domains', 'Domains', 'GET', '{{domain}}/v2/domains', {}, '', None))])
+        self.assertEqual([1], search.search_apis(apis, 'domain', (search.FIELD_URI,), '{{domain}}'))
+        self.assertEqual([0, 1], search.search_apis(apis, 'domain', (search.FIELD_URI,)))
+
+    def test_search_apis_Regex_SameAsScan(self):
+        indexes = search.search_apis(self.postman, 'List$', (search.FIELD_NAME,))
+        expected = [i for i, api in enumerate(self.postman)
+                    if api.get_name().endswith('List')]
+        self.assertEqual(expected, indexes)
+
+    def test_search_apis_BodyKey_Found(self):
+        indexes = search.search_apis(self.postman, 'passwordcredentials',
+                                     (search.FIELD_BODY,))
+        self.assertIn(0, indexes)
+
+if __name__ == '__main__':
+    unittest.main()
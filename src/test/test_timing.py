@@ -0,0 +1,79 @@
+import socket
+import unittest
+from unittest import mock
+import timing
+import transport
+from benchmark.stub_server import StubServer, AUTH_URI, AUTH_TOKEN_TITLE
+
+class TestTiming(unittest.TestCase):
+    def setUp(self):
+        server = StubServer().start()
+        self.addCleanup(server.stop)
+        self.end_point = server.get_end_point()
+        self.transport = transport.Transport({})
+        self.addCleanup(self.transport.close)
+
+    def test_Transport_Recording_PhasesRecorded(self):
+        timings = timing.start_recording()
+        r = self.transport.request('POST', self.end_point + AUTH_URI, name='auth')
+        headers = {AUTH_TOKEN_TITLE: r.headers[AUTH_TOKEN_TITLE]}
+        self.transport.request('GET', self.end_point + '/large/4', headers=headers)
+        r = self.transport.request('GET', self.end_point + '/large/4', headers=headers,
+                                   stream=True)
+        r.content
+        self.assertIs(timings, timing.stop_recording())
+
+        auth, api, streamed = [t.to_dict() for t in timings]
+        self.assertEqual('auth', auth['name'])
+        self.assertFalse(auth['reused'])
+        for phase in ('dns_ms', 'connect_ms', 'ttfb_ms', 'download_ms', 'total_ms'):
+            self.assertGreaterEqual(auth[phase], 0)
+        self.assertIsNone(auth['tls_ms'])
+
+        self.assertEqual('api', api['name'])
+        self.assertEqual(200, api['status'])
+        self.assertTrue(api['reused'])
+        self.assertIsNone(api['connect_ms'])
+        self.assertGreater(api['bytes'], 4000)
+        self.assertEqual(api['bytes'], streamed['bytes'])
+        self.assertGreaterEqual(streamed['download_ms'], 0)
+
+    def test_Transport_FirstAddressRefused_NextConnected(self):
+        getaddrinfo = socket.getaddrinfo
+        def resolve(host, port, *args, **kwargs):
+            if host != 'localhost':
+                return getaddrinfo(host, port, *args, **kwargs)
+            # The server listens only on 127.0.0.1, so 127.0.0.2 refuses.
+            return (getaddrinfo('127.0.0.2', port, socket.AF_INET, socket.SOCK_STREAM)
+                    + getaddrinfo('127.0.0.1', port, socket.AF_INET, socket.SOCK_STREAM))
+        end_point = self.end_point.replace('127.0.0.1', 'localhost')
+        timings = timing.start_recording()
+        self.addCleanup(timing.stop_recording)
+        with mock.patch('socket.getaddrinfo', resolve):
+            r = self.transport.request('POST', end_point + AUTH_URI, name='auth')
+        self.assertEqual(201, r.status_code)
+        self.assertGreaterEqual(timings[0].to_dict()['connect_ms'], 0)
+
+    def test_Transport_Hedged_Recorded(self):
+        hedged = transport.Transport({'hedge': True, 'hedge_delay_ms': 5})
+        self.addCleanup(hedged.close)
+        r = hedged.request('POST', self.end_point + AUTH_URI)
+        headers = {AUTH_TOKEN_TITLE: r.headers[AUTH_TOKEN_TITLE]}
+        timings = timing.start_recording()
+        self.addCleanup(timing.stop_recording)
+        r = hedged.request('GET', self.end_point + '/fixed/50', headers=headers)
+        self.assertEqual(200, r.status_code)
+        self.assertEqual(1, hedged.get_retry_stats()['hedges'])
+        # Both the first and the hedged requests are recorded by the calling thread.
+        self.assertIs(timings, timing.get_recording())
+        self.assertEqual(2, len(timings))
+        self.assertIn(200, [t.status for t in timings])
+        self.assertTrue(all(t.name == 'api' for t in timings))
+
+    def test_Transport_NotRecording_NoTiming(self):
+        self.transport.request('POST', self.end_point + AUTH_URI)
+        self.assertIsNone(timing.get_recording())
+        self.assertEqual([], timing.stop_recording())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+import transport
+
+class TestTransport(unittest.TestCase):
+    def test_Transport_Defaults(self):
+        t = transport.Transport({'crt_file': None, 'key_file': None})
+        self.assertEqual((transport.DEFAULT_CONNECT_TIMEOUT,
+                          transport.DEFAULT_READ_TIMEOUT), t.timeout)
+        self.assertFalse(t.session.verify)
+        self.assertIsNone(t.session.cert)
+        self.assertIsNone(t.retry_policy)
+
+    def test_Transport_Configured(self):
+        t = transport.Transport({'crt_file': 'a.crt', 'key_file': 'a.key',
+                                 'connect_timeout': 1, 'read_timeout': 2,
+                                 'keep_alive': False})
+        self.assertEqual((1.0, 2.0), t.timeout)
+        self.assertEqual(('a.crt', 'a.key'), t.session.cert)
+        self.assertEqual('close', t.session.headers['Connection'])
+
+if __name__ == '__main__':
+    unittest.main()
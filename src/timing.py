@@ -0,0 +1,259 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import threading
+import time
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download')
+
+# Timings recorded by the current thread, and the timing of the current request.
+local = threading.local()
+
+
+def start_recording():
+    """
+    Records timings of requests of the current thread.
+    Returns the list which timings are appended to.
+    """
+    local.timings = []
+    return local.timings
+
+
+def stop_recording():
+    """
+    Stops recording and returns the recorded timings.
+    Timings of streamed responses are finished with received bytes.
+    """
+    timings = get_recording() or []
+    local.timings = None
+    for timing in timings:
+        if timing.total is None and timing.raw is not None:
+            timing.finish(timing.raw.tell())
+        timing.raw = None
+    return timings
+
+
+def get_recording():
+    """
+    Gets the list of recording timings, or None if it is not recording.
+    """
+    return getattr(local, 'timings', None)
+
+
+def set_recording(timings):
+    """
+    Records timings of the current thread to the list, or stops recording if it is None.
+    Returns the previous list. A request sent by another thread for the recording thread
+    is recorded to its list by this.
+    """
+    previous = get_recording()
+    local.timings = timings
+    return previous
+
+
+def get_current():
+    """
+    Gets the timing of the request sent by the current thread.
+    """
+    return getattr(local, 'current', None)
+
+
+def begin(name, method, url):
+    """
+    Begins the timing of a request if the current thread is recording.
+    """
+    timings = get_recording()
+    if timings is None:
+        return None
+    timing = RequestTiming(name, method, url)
+    timings.append(timing)
+    local.current = timing
+    return timing
+
+
+def end(timing, response, stream):
+    """
+    Ends the timing of a request when the response headers are received.
+    The timing of a streamed response is finished by stop_recording().
+    """
+    local.current = None
+    if response is None:
+        return
+    timing.status = response.status_code
+    if stream:
+        timing.raw = response.raw
+    else:
+        timing.finish(response.raw.tell())
+
+
+def to_ms(seconds):
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 3)
+
+
+class RequestTiming:
+    """
+    Phases of a request in seconds.
+    Connection phases are None if a pooled connection is reused.
+      dns: Resolving the host name.
+      connect: TCP connection.
+      tls: TLS handshake.
+      ttfb: From the request is sent to the response headers are received.
+      download: From the response headers to the end of the body.
+    """
+    def __init__(self, name, method, url):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.status = None
+        self.dns = None
+        self.connect = None
+        self.tls = None
+        self.ttfb = None
+        self.download = None
+        self.size = 0
+        self.start = time.perf_counter()
+        self.sent = None
+        self.received = None
+        self.total = None
+        # The raw response being streamed.
+        self.raw = None
+
+    def is_reused(self):
+        return self.connect is None
+
+    def finish(self, size):
+        """
+        Finishes the timing when the body is received.
+        """
+        end = time.perf_counter()
+        self.size = size
+        self.total = end - self.start
+        if self.received is not None:
+            self.download = end - self.received
+
+    def to_dict(self):
+        data = {'name': self.name, 'method': self.method, 'url': self.url,
+                'status': self.status, 'reused': self.is_reused()}
+        for phase in PHASES:
+            data[phase + '_ms'] = to_ms(getattr(self, phase))
+        data['total_ms'] = to_ms(self.total)
+        data['bytes'] = self.size
+        return data
+
+    def format(self):
+        """
+        Formats the timing as a line.
+        """
+        values = []
+        for phase in PHASES:
+            value = getattr(self, phase)
+            if value is None:
+                values.append('%s -' % phase.upper())
+            else:
+                values.append('%s %.3f ms' % (phase.upper(), value * 1000))
+        if self.total is None:
+            # The request was still running. Ex: The hedged request which lost
+            values.append('Total -')
+        else:
+            values.append('Total %.3f ms' % (self.total * 1000))
+        values.append('%d bytes' % self.size)
+        if self.is_reused():
+            values.append('reused connection')
+        return "%s: %s %s %s\n  %s" % (self.name, self.method, self.url, self.status,
+                                       ', '.join(values))
+
+
+class TimedConnection:
+    """
+    Records connection phases and the time to the first byte to the current timing.
+    """
+    def _new_conn(self):
+        timing = get_current()
+        if timing is None:
+            return super()._new_conn()
+
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(),
+                                           socket.SOCK_STREAM)
+        except OSError:
+            # The error is raised by urllib3 again.
+            return super()._new_conn()
+        timing.dns = time.perf_counter() - start
+
+        # Connects to resolved addresses in order not to resolve the host again.
+        # The next address is tried if one fails, like urllib3 does. Ex: IPv6 and IPv4
+        dns_host = self._dns_host
+        start = time.perf_counter()
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address[4][0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError:
+                    # NewConnectionError is also caught.
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+        timing.connect = time.perf_counter() - start
+        return sock
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        timing = get_current()
+        if timing is not None:
+            timing.sent = time.perf_counter()
+
+    def getresponse(self):
+        response = super().getresponse()
+        timing = get_current()
+        if timing is not None:
+            timing.received = time.perf_counter()
+            if timing.sent is not None:
+                timing.ttfb = timing.received - timing.sent
+        return response
+
+
+class TimedHTTPConnection(TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        timing = get_current()
+        if timing is not None and timing.connect is not None:
+            timing.tls = time.perf_counter() - start - timing.dns - timing.connect
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
@@ -0,0 +1,156 @@
+# Copyright 2020 Jung Bong-Hwa
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from retry import load_retry_policy, RetryStats
+from timing import begin, end, get_recording, set_recording, POOL_CLASSES
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+
+def get_cert(config):
+    """
+    Returns CRT file if HTTPS is used.
+    """
+    if config.get('crt_file') and config.get('key_file'):
+        return (config['crt_file'], config['key_file'])
+    else:
+        return None
+
+
+def get_rewind(data):
+    """
+    Gets a function to send the request body again, or None if it can't be sent again.
+    """
+    if data is None or isinstance(data, (bytes, str)):
+        return lambda: None
+    if hasattr(data, 'seek') and hasattr(data, 'tell'):
+        position = data.tell()
+        return lambda: data.seek(position)
+    return None
+
+
+def get_config_value(config, key, default):
+    """
+    Gets the configuration value or the default if it is not seted.
+    """
+    value = config.get(key)
+    if value is None or value == '':
+        return default
+    return value
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter whose connections record timings of requests.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = POOL_CLASSES
+
+
+class Transport:
+    """
+    HTTP transport sharing pooled connections by all requests.
+    """
+    session = None
+    timeout = None
+    pool_size = 0
+    # None if requests are neither retried nor hedged.
+    retry_policy = None
+    def __init__(self, config, min_pool_size=0):
+        pool_size = int(get_config_value(config, 'pool_size', DEFAULT_POOL_SIZE))
+        pool_size = max(pool_size, min_pool_size)
+        self.pool_size = pool_size
+        self.timeout = (
+            float(get_config_value(config, 'connect_timeout', DEFAULT_CONNECT_TIMEOUT)),
+            float(get_config_value(config, 'read_timeout', DEFAULT_READ_TIMEOUT)))
+
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.verify = False
+        self.session.cert = get_cert(config)
+        if get_config_value(config, 'keep_alive', True) is False:
+            self.session.headers['Connection'] = 'close'
+        self.retry_policy = load_retry_policy(
+            config, (requests.exceptions.ConnectionError, requests.exceptions.Timeout), pool_size)
+
+    def request(self, method, url, name='api', **kwargs):
+        """
+        Requests by the shared session.
+        Failed requests are retried and slow GET requests are hedged by the retry policy.
+        The timing is recorded by the name if the thread is recording.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if self.retry_policy is None:
+            return self.send(method, url, name, **kwargs)
+
+        timings = get_recording()
+
+        def send():
+            # Hedged requests are sent by other threads, and recorded to timings of this thread.
+            previous = set_recording(timings)
+            try:
+                return self.send(method, url, name, **kwargs)
+            finally:
+                set_recording(previous)
+
+        data = kwargs.get('data')
+        return self.retry_policy.call(
+            method, '%s %s' % (method, url.split('?')[0]), send, get_rewind(data),
+            data is None or isinstance(data, (bytes, str)))
+
+    def send(self, method, url, name='api', **kwargs):
+        """
+        Sends a request once.
+        """
+        timing = begin(name, method, url)
+        if timing is None:
+            return self.session.request(method, url, **kwargs)
+
+        response = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+        finally:
+            end(timing, response, kwargs.get('stream', False))
+        return response
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        """
+        if self.retry_policy is not None:
+            self.retry_policy.close()
+        self.session.close()
+
+    def reset_retry_stats(self):
+        """
+        Starts counting retries and hedged requests again. Latencies to hedge are kept.
+        """
+        if self.retry_policy is not None:
+            self.retry_policy.stats = RetryStats()
+
+    def get_retry_stats(self):
+        """
+        Gets counts of retries and hedged requests, or None if there is no retry policy.
+        """
+        if self.retry_policy is None:
+            return None
+        return self.retry_policy.stats.to_dict()